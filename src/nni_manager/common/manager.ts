@@ -35,6 +35,10 @@ interface ExperimentParams {
     trainingServicePlatform: string;
     multiPhase?: boolean;
     multiThread?: boolean;
+    asyncMode?: boolean;
+    executorWorkers?: number;
+    maxQueueDelays?: number[];
+    ipcTrace?: string;
     tuner?: {
         className: string;
         builtinTunerName?: string;
@@ -43,6 +47,11 @@ interface ExperimentParams {
         classFileName?: string;
         checkpointDir: string;
         gpuNum?: number;
+        importData?: string;
+        prefetchSize?: number;
+        prefetchStaleness?: number;
+        stateSpillPath?: string;
+        configCache?: string;
     };
     assessor?: {
         className: string;
@@ -52,6 +61,7 @@ interface ExperimentParams {
         classFileName?: string;
         checkpointDir: string;
         gpuNum?: number;
+        processNum?: number;
     };
     advisor?: {
         className: string;
@@ -128,6 +128,48 @@ function randomSelect<T>(a: T[]): T {
     // tslint:disable-next-line:insecure-random
     return a[Math.floor(Math.random() * a.length)];
 }
+/**
+ * Split the text of a JSON array into the texts of its elements without parsing them,
+ * so that they are passed on exactly as serialized, e.g. 1.0 stays a float and NaN is kept
+ * @param text a JSON array
+ * @returns the text of each element
+ */
+function splitJsonArray(text: string): string[] {
+    const items: string[] = [];
+    let depth: number = 0;
+    let inString: boolean = false;
+    let start: number = 0;
+    for (let i: number = 0; i < text.length; i++) {
+        const char: string = text[i];
+        if (inString) {
+            if (char === '\\') {
+                i++;
+            } else if (char === '"') {
+                inString = false;
+            }
+            continue;
+        }
+        if (char === '"') {
+            inString = true;
+        } else if (char === '[' || char === '{') {
+            depth++;
+            if (depth === 1) {
+                start = i + 1;
+            }
+        } else if (char === ']' || char === '}') {
+            depth--;
+            if (depth === 0 && text.slice(start, i).trim() !== '') {
+                items.push(text.slice(start, i).trim());
+            }
+        } else if (char === ',' && depth === 1) {
+            items.push(text.slice(start, i).trim());
+            start = i + 1;
+        }
+    }
+
+    return items;
+}
+
 function parseArg(names: string[]): string {
     if (process.argv.length >= 4) {
         for (let i: number = 2; i < process.argv.length - 1; i++) {
@@ -164,9 +206,11 @@ function parseArg(names: string[]): string {
  *
  * @param assessor: similiar as tuner
  * @param advisor: similar as tuner
+ * @param dispatcherOptions: asyncMode, executorWorkers, maxQueueDelays and ipcTrace of the experiment
  *
  */
-function getMsgDispatcherCommand(tuner: any, assessor: any, advisor: any, multiPhase: boolean = false, multiThread: boolean = false): string {
+function getMsgDispatcherCommand(tuner: any, assessor: any, advisor: any, multiPhase: boolean = false, multiThread: boolean = false,
+                                 dispatcherOptions: any = {}): string {
     if ((tuner || assessor) && advisor) {
         throw new Error('Error: specify both tuner/assessor and advisor is not allowed');
     }
@@ -183,6 +227,19 @@ function getMsgDispatcherCommand(tuner: any, assessor: any, advisor: any, multiP
         command += ' --multi_thread';
     }
 
+    if (dispatcherOptions.asyncMode) {
+        command += ' --async_mode';
+    }
+    if (dispatcherOptions.executorWorkers !== undefined) {
+        command += ` --executor_workers ${dispatcherOptions.executorWorkers}`;
+    }
+    if (dispatcherOptions.maxQueueDelays !== undefined) {
+        command += ` --max_queue_delays ${dispatcherOptions.maxQueueDelays.join(' ')}`;
+    }
+    if (dispatcherOptions.ipcTrace !== undefined && dispatcherOptions.ipcTrace.length > 0) {
+        command += ` --ipc_trace ${dispatcherOptions.ipcTrace}`;
+    }
+
     if (advisor) {
         command += ` --advisor_class_name ${advisor.className}`;
         if (advisor.classArgs !== undefined) {
@@ -205,6 +262,21 @@ function getMsgDispatcherCommand(tuner: any, assessor: any, advisor: any, multiP
         if (tuner.classFileName !== undefined && tuner.classFileName.length > 1) {
             command += ` --tuner_class_filename ${tuner.classFileName}`;
         }
+        if (tuner.importData !== undefined && tuner.importData.length > 0) {
+            command += ` --import_data ${tuner.importData}`;
+        }
+        if (tuner.prefetchSize !== undefined) {
+            command += ` --prefetch_size ${tuner.prefetchSize}`;
+        }
+        if (tuner.prefetchStaleness !== undefined) {
+            command += ` --prefetch_staleness ${tuner.prefetchStaleness}`;
+        }
+        if (tuner.stateSpillPath !== undefined && tuner.stateSpillPath.length > 0) {
+            command += ` --state_spill_path ${tuner.stateSpillPath}`;
+        }
+        if (tuner.configCache !== undefined) {
+            command += ` --config_cache ${tuner.configCache}`;
+        }
 
         if (assessor !== undefined && assessor.className !== undefined) {
             command += ` --assessor_class_name ${assessor.className}`;
@@ -217,6 +289,9 @@ function getMsgDispatcherCommand(tuner: any, assessor: any, advisor: any, multiP
             if (assessor.classFileName !== undefined && assessor.classFileName.length > 1) {
                 command += ` --assessor_class_filename ${assessor.classFileName}`;
             }
+            if (assessor.processNum !== undefined) {
+                command += ` --assessor_processes ${assessor.processNum}`;
+            }
         }
     }
 
@@ -346,4 +421,4 @@ function countFilesRecursively(directory: string, timeoutMilliSeconds?: number):
 
 export {countFilesRecursively, getRemoteTmpDir, generateParamFileName, getMsgDispatcherCommand, getCheckpointDir,
     getLogDir, getExperimentRootDir, getJobCancelStatus, getDefaultDatabaseDir, getIPV4Address, 
-    mkDirP, delay, prepareUnitTest, parseArg, cleanupUnitTest, uniqueString, randomSelect };
+    mkDirP, delay, prepareUnitTest, parseArg, cleanupUnitTest, uniqueString, randomSelect, splitJsonArray };
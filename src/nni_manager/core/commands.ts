@@ -28,6 +28,7 @@ const TERMINATE = 'TE';
 
 const INITIALIZED = 'ID';
 const NEW_TRIAL_JOB = 'TR';
+const NEW_TRIAL_JOB_BATCH = 'TB';
 const SEND_TRIAL_JOB_PARAMETER = 'SP';
 const NO_MORE_TRIAL_JOBS = 'NO';
 const KILL_TRIAL_JOB = 'KI';
@@ -42,6 +43,7 @@ const TUNER_COMMANDS: Set<string> = new Set([
 
     INITIALIZED,
     NEW_TRIAL_JOB,
+    NEW_TRIAL_JOB_BATCH,
     SEND_TRIAL_JOB_PARAMETER,
     NO_MORE_TRIAL_JOBS
 ]);
@@ -65,6 +67,7 @@ export {
     TERMINATE,
     INITIALIZED,
     NEW_TRIAL_JOB,
+    NEW_TRIAL_JOB_BATCH,
     NO_MORE_TRIAL_JOBS,
     KILL_TRIAL_JOB,
     TUNER_COMMANDS,
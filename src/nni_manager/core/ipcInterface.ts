@@ -22,7 +22,10 @@
 import * as assert from 'assert';
 import { ChildProcess } from 'child_process';
 import { EventEmitter } from 'events';
+import * as fs from 'fs';
+import * as net from 'net';
 import { Readable, Writable } from 'stream';
+import * as zlib from 'zlib';
 import { NNIError } from '../common/errors';
 import { getLogger, Logger } from '../common/log';
 import * as CommandType from './commands';
@@ -30,65 +33,146 @@ import * as CommandType from './commands';
 const ipcOutgoingFd: number = 3;
 const ipcIncomingFd: number = 4;
 
+/**
+ * Highest frame format supported by NNI manager.
+ * Version 1: 2 bytes command type, 6 ASCII digits content length, content.
+ * Version 2: 2 bytes command type, 1 byte version, 1 byte flags, 4 bytes big-endian content length, content.
+ * The third byte of a version 1 header is always an ASCII digit, so both formats can be decoded side by side.
+ */
+const ipcVersion: number = 2;
+const frameHeaderLength: number = 8;
+const flagCompressed: number = 0x01;
+const flagMoreChunks: number = 0x02;
+const chunkSize: number = 1 << 20;
+const compressThreshold: number = 1 << 16;
+
 /**
  * Encode a command
  * @param commandType a command type defined in 'core/commands'
  * @param content payload of the command
+ * @param version frame format version, version 2 is used when the content is too long for version 1
  * @returns binary command data
  */
-function encodeCommand(commandType: string, content: string): Buffer {
-    const contentBuffer: Buffer = Buffer.from(content);
-    if (contentBuffer.length >= 1_000_000) {
-        throw new RangeError('Command too long');
+function encodeCommand(commandType: string, content: string, version: number = 1): Buffer {
+    let contentBuffer: Buffer = Buffer.from(content);
+    // a payload too long for version 1, e.g. Initialize with a large search space sent before the version is
+    // negotiated, is sent in version 2 frames, which the dispatcher can always decode
+    if (version < 2 && contentBuffer.length < 1_000_000) {
+        const contentLengthBuffer: Buffer = Buffer.from(contentBuffer.length.toString().padStart(6, '0'));
+
+        return Buffer.concat([Buffer.from(commandType), contentLengthBuffer, contentBuffer]);
+    }
+
+    let flags: number = 0;
+    if (contentBuffer.length > compressThreshold) {
+        contentBuffer = zlib.deflateSync(contentBuffer);
+        flags |= flagCompressed;
     }
-    const contentLengthBuffer: Buffer = Buffer.from(contentBuffer.length.toString().padStart(6, '0'));
+    const frames: Buffer[] = [];
+    let offset: number = 0;
+    do {
+        const chunk: Buffer = contentBuffer.slice(offset, offset + chunkSize);
+        offset += chunkSize;
+        const header: Buffer = Buffer.alloc(frameHeaderLength);
+        header.write(commandType, 0, 2);
+        header.writeUInt8(2, 2);
+        header.writeUInt8(offset < contentBuffer.length ? flags | flagMoreChunks : flags, 3);
+        header.writeUInt32BE(chunk.length, 4);
+        frames.push(header, chunk);
+    } while (offset < contentBuffer.length);
 
-    return Buffer.concat([Buffer.from(commandType), contentLengthBuffer, contentBuffer]);
+    return Buffer.concat(frames);
 }
 
 /**
- * Decode a command
+ * Decode a frame
  * @param Buffer binary incoming data
- * @returns a tuple of (success, commandType, content, remain)
- *          success: true if the buffer contains at least one complete command; otherwise false
- *          remain: remaining data after the first command
+ * @returns a tuple of (success, commandType, flags, content, remain)
+ *          success: true if the buffer contains at least one complete frame; otherwise false
+ *          flags: frame flags, always 0 for version 1 frames
+ *          remain: remaining data after the first frame
  */
-function decodeCommand(data: Buffer): [boolean, string, string, Buffer] {
-    if (data.length < 8) {
-        return [false, '', '', data];
+function decodeCommand(data: Buffer): [boolean, string, number, Buffer, Buffer] {
+    if (data.length < frameHeaderLength) {
+        return [false, '', 0, data, data];
     }
     const commandType: string = data.slice(0, 2).toString();
-    const contentLength: number = parseInt(data.slice(2, 8).toString(), 10);
-    if (data.length < contentLength + 8) {
-        return [false, '', '', data];
+    let flags: number = 0;
+    let contentLength: number;
+    if (data[2] >= 0x30 && data[2] <= 0x39) {
+        contentLength = parseInt(data.slice(2, frameHeaderLength).toString(), 10);
+    } else {
+        if (data.readUInt8(2) !== 2) {
+            throw new RangeError(`Unsupported IPC frame version: ${data.readUInt8(2)}`);
+        }
+        flags = data.readUInt8(3);
+        contentLength = data.readUInt32BE(4);
+    }
+    if (data.length < contentLength + frameHeaderLength) {
+        return [false, '', 0, data, data];
     }
-    const content: string = data.slice(8, contentLength + 8).toString();
-    const remain: Buffer = data.slice(contentLength + 8);
+    const content: Buffer = data.slice(frameHeaderLength, contentLength + frameHeaderLength);
+    const remain: Buffer = data.slice(contentLength + frameHeaderLength);
 
-    return [true, commandType, content, remain];
+    return [true, commandType, flags, content, remain];
 }
 
 class IpcInterface {
     private acceptCommandTypes: Set<string>;
-    private outgoingStream: Writable;
-    private incomingStream: Readable;
+    private outgoingStream: Writable | undefined;
+    private incomingStream: Readable | undefined;
     private eventEmitter: EventEmitter;
     private readBuffer: Buffer;
+    private pendingChunks: Buffer[];
+    private pendingCommands: [string, string][];
+    private protocolVersion: number;
     private logger: Logger = getLogger();
 
     /**
      * Construct a IPC proxy
-     * @param proc the process to wrap
+     * @param proc the process to wrap, or undefined if the streams are attached later
      * @param acceptCommandTypes set of accepted commands for this process
      */
-    constructor(proc: ChildProcess, acceptCommandTypes: Set<string>) {
+    constructor(proc: ChildProcess | undefined, acceptCommandTypes: Set<string>) {
         this.acceptCommandTypes = acceptCommandTypes;
-        this.outgoingStream = <Writable>proc.stdio[ipcOutgoingFd];
-        this.incomingStream = <Readable>proc.stdio[ipcIncomingFd];
         this.eventEmitter = new EventEmitter();
         this.readBuffer = Buffer.alloc(0);
+        this.pendingChunks = [];
+        this.pendingCommands = [];
+        this.protocolVersion = 1;
+
+        if (proc !== undefined) {
+            this.attach(<Readable>proc.stdio[ipcIncomingFd], <Writable>proc.stdio[ipcOutgoingFd]);
+        }
+    }
+
+    /**
+     * Exchange commands through new streams, e.g. when the dispatcher connects to the socket again after a restart.
+     * Commands sent while no stream is attached are sent now.
+     * @param incomingStream stream of commands from the process
+     * @param outgoingStream stream of commands to the process
+     */
+    public attach(incomingStream: Readable, outgoingStream: Writable): void {
+        const reconnected: boolean = this.incomingStream !== undefined;
+        this.incomingStream = incomingStream;
+        this.outgoingStream = outgoingStream;
+        this.readBuffer = Buffer.alloc(0);
+        this.pendingChunks = [];
+        this.protocolVersion = 1;
+        incomingStream.on('data', (data: Buffer) => {
+            if (this.incomingStream === incomingStream) {
+                this.receive(data);
+            }
+        });
 
-        this.incomingStream.on('data', (data: Buffer) => { this.receive(data); });
+        const pendingCommands: [string, string][] = this.pendingCommands;
+        this.pendingCommands = [];
+        for (const [commandType, content] of pendingCommands) {
+            this.sendCommand(commandType, content);
+        }
+        if (reconnected) {
+            this.eventEmitter.emit('reconnect');
+        }
     }
 
     /**
@@ -99,9 +183,14 @@ class IpcInterface {
     public sendCommand(commandType: string, content: string = ''): void {
         this.logger.debug(`ipcInterface command type: [${commandType}], content:[${content}]`);
         assert.ok(this.acceptCommandTypes.has(commandType));
+        if (this.outgoingStream === undefined) {
+            this.pendingCommands.push([commandType, content]);
+
+            return;
+        }
 
         try {
-            const data: Buffer = encodeCommand(commandType, content);
+            const data: Buffer = encodeCommand(commandType, content, this.protocolVersion);
             if (!this.outgoingStream.write(data)) {
                 this.logger.error('Commands jammed in buffer!');
             }
@@ -118,6 +207,14 @@ class IpcInterface {
         this.eventEmitter.on('command', listener);
     }
 
+    /**
+     * Add a listener invoked when the dispatcher connects again, which has lost the state of previous connection
+     * @param listener the listener callback
+     */
+    public onReconnect(listener: () => void): void {
+        this.eventEmitter.on('reconnect', listener);
+    }
+
     /**
      * Deal with incoming data from process
      * Invoke listeners for each complete command received, save incomplete command to buffer
@@ -126,13 +223,42 @@ class IpcInterface {
     private receive(data: Buffer): void {
         this.readBuffer = Buffer.concat([this.readBuffer, data]);
         while (this.readBuffer.length > 0) {
-            const [success, commandType, content, remain] = decodeCommand(this.readBuffer);
+            const [success, commandType, flags, chunk, remain] = decodeCommand(this.readBuffer);
             if (!success) {
                 break;
             }
+            this.readBuffer = remain;
+            this.pendingChunks.push(chunk);
+            if ((flags & flagMoreChunks) !== 0) {
+                continue;
+            }
+            let contentBuffer: Buffer = Buffer.concat(this.pendingChunks);
+            this.pendingChunks = [];
+            if ((flags & flagCompressed) !== 0) {
+                contentBuffer = zlib.inflateSync(contentBuffer);
+            }
+            const content: string = contentBuffer.toString();
             assert.ok(this.acceptCommandTypes.has(commandType));
+            if (commandType === CommandType.INITIALIZED) {
+                this.negotiateVersion(content);
+            }
             this.eventEmitter.emit('command', commandType, content);
-            this.readBuffer = remain;
+        }
+    }
+
+    /**
+     * Upgrade outgoing frame format according to the version announced by Initialized command.
+     * Dispatchers which do not announce a version keep using version 1 frames.
+     * @param content payload of Initialized command
+     */
+    private negotiateVersion(content: string): void {
+        if (content === '') {
+            return;
+        }
+        const peerVersion: number | undefined = JSON.parse(content).ipc_version;
+        if (peerVersion !== undefined) {
+            this.protocolVersion = Math.min(ipcVersion, peerVersion);
+            this.logger.info(`IPC frame version negotiated: ${this.protocolVersion}`);
         }
     }
 }
@@ -145,4 +271,34 @@ function createDispatcherInterface(process: ChildProcess): IpcInterface {
     return new IpcInterface(process, new Set([...CommandType.TUNER_COMMANDS, ...CommandType.ASSESSOR_COMMANDS]));
 }
 
-export { IpcInterface, createDispatcherInterface };
+/**
+ * Create IPC proxy for a tuner process started separately, which connects to a socket
+ * @param address 'unix:///path/to/socket' or 'tcp://host:port', see NNI_DISPATCHER_ADDRESS in nni.transport
+ */
+function createDispatcherSocketInterface(address: string): IpcInterface {
+    const dispatcher: IpcInterface =
+        new IpcInterface(undefined, new Set([...CommandType.TUNER_COMMANDS, ...CommandType.ASSESSOR_COMMANDS]));
+    const log: Logger = getLogger();
+    const server: net.Server = net.createServer((socket: net.Socket) => {
+        log.info(`Dispatcher connected to ${address}`);
+        socket.setNoDelay(true);
+        socket.on('error', (err: Error) => { log.warning(`Dispatcher connection error: ${err.message}`); });
+        dispatcher.attach(socket, socket);
+    });
+    if (address.startsWith('unix://')) {
+        const path: string = address.slice('unix://'.length);
+        if (fs.existsSync(path)) {
+            fs.unlinkSync(path);  // left by previous run
+        }
+        server.listen(path);
+    } else if (address.startsWith('tcp://')) {
+        const separator: number = address.lastIndexOf(':');
+        server.listen(Number(address.slice(separator + 1)), address.slice('tcp://'.length, separator));
+    } else {
+        throw new RangeError(`Unsupported dispatcher address: ${address}`);
+    }
+
+    return dispatcher;
+}
+
+export { IpcInterface, createDispatcherInterface, createDispatcherSocketInterface };
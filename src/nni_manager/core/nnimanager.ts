@@ -35,12 +35,12 @@ import {
 import {
     TrainingService, TrialJobApplicationForm, TrialJobDetail, TrialJobMetric, TrialJobStatus
 } from '../common/trainingService';
-import { delay , getLogDir, getCheckpointDir, getMsgDispatcherCommand, mkDirP} from '../common/utils';
+import { delay , getLogDir, getCheckpointDir, getMsgDispatcherCommand, mkDirP, splitJsonArray } from '../common/utils';
 import {
-    ADD_CUSTOMIZED_TRIAL_JOB, INITIALIZE, INITIALIZED, KILL_TRIAL_JOB, NEW_TRIAL_JOB, NO_MORE_TRIAL_JOBS,
+    ADD_CUSTOMIZED_TRIAL_JOB, INITIALIZE, INITIALIZED, KILL_TRIAL_JOB, NEW_TRIAL_JOB, NEW_TRIAL_JOB_BATCH, NO_MORE_TRIAL_JOBS,
     REPORT_METRIC_DATA, REQUEST_TRIAL_JOBS, SEND_TRIAL_JOB_PARAMETER, TERMINATE, TRIAL_END, UPDATE_SEARCH_SPACE
 } from './commands';
-import { createDispatcherInterface, IpcInterface } from './ipcInterface';
+import { createDispatcherInterface, createDispatcherSocketInterface, IpcInterface } from './ipcInterface';
 
 /**
  * NNIManager
@@ -128,7 +128,7 @@ class NNIManager implements Manager {
         }
 
         const dispatcherCommand: string = getMsgDispatcherCommand(expParams.tuner, expParams.assessor, expParams.advisor,
-                                                                expParams.multiPhase, expParams.multiThread);
+                                                                expParams.multiPhase, expParams.multiThread, expParams);
         this.log.debug(`dispatcher command: ${dispatcherCommand}`);
         const checkpointDir: string = await this.createCheckpointDir();
         this.setupTuner(
@@ -161,7 +161,7 @@ class NNIManager implements Manager {
         }
 
         const dispatcherCommand: string = getMsgDispatcherCommand(expParams.tuner, expParams.assessor, expParams.advisor,
-                                                                expParams.multiPhase, expParams.multiThread);
+                                                                expParams.multiPhase, expParams.multiThread, expParams);
         this.log.debug(`dispatcher command: ${dispatcherCommand}`);
         const checkpointDir: string = await this.createCheckpointDir();
         this.setupTuner(
@@ -253,6 +253,19 @@ class NNIManager implements Manager {
         if (this.dispatcher !== undefined) {
             return;
         }
+        const dispatcherAddress: string | undefined = process.env.NNI_DISPATCHER_ADDRESS;
+        if (dispatcherAddress !== undefined && dispatcherAddress !== '') {
+            // the tuner runs on another machine or on dedicated cores, started by user
+            this.log.info(`Waiting for tuner to connect to ${dispatcherAddress}, start it with: ` +
+                `NNI_MODE=${mode} NNI_CHECKPOINT_DIRECTORY=${dataDirectory} NNI_DISPATCHER_ADDRESS=${dispatcherAddress} ${command}`);
+            const dispatcher: IpcInterface = createDispatcherSocketInterface(dispatcherAddress);
+            dispatcher.onReconnect(() => {
+                dispatcher.sendCommand(INITIALIZE, this.experimentProfile.params.searchSpace);
+            });
+            this.dispatcher = dispatcher;
+
+            return;
+        }
         const stdio: (string | NodeJS.WriteStream)[] = ['ignore', process.stdout, process.stderr, 'pipe', 'pipe'];
         let newCwd: string;
         if (cwd === undefined || cwd === '') {
@@ -317,14 +330,16 @@ class NNIManager implements Manager {
         let tunerAlive: boolean = true;
         // gracefully terminate tuner and assessor here, wait at most 30 seconds.
         for (let i: number = 0; i < 30; i++) {
-            if (!tunerAlive) { break; }
+            if (!tunerAlive || this.dispatcherPid === 0) { break; }
             try {
                 await cpp.exec(`kill -0 ${this.dispatcherPid}`);
             } catch (error) { tunerAlive = false; }
             await delay(1000);
         }
         try {
-            await cpp.exec(`kill ${this.dispatcherPid}`);
+            if (this.dispatcherPid > 0) {
+                await cpp.exec(`kill ${this.dispatcherPid}`);
+            }
         } catch (error) {
             // this.tunerPid does not exist, do nothing here
         }
@@ -596,15 +611,24 @@ class NNIManager implements Manager {
         this.log.info(`Command from tuner: ${commandType}, ${content}`);
         switch (commandType) {
             case INITIALIZED:
-                // Tuner is intialized, search space is set, request tuner to generate hyper parameters
-                this.requestTrialJobs(this.experimentProfile.params.trialConcurrency);
+                // Tuner is intialized, search space is set, request tuner to generate hyper parameters.
+                // A tuner reconnecting through NNI_DISPATCHER_ADDRESS is initialized again,
+                // so only the slots which are neither running nor waiting for a trial are requested
+                this.requestTrialJobs(this.experimentProfile.params.trialConcurrency -
+                    this.trialJobs.size - this.waitingTrials.length);
                 break;
             case NEW_TRIAL_JOB:
+            case NEW_TRIAL_JOB_BATCH:
                 if (this.status.status === 'NO_MORE_TRIAL') {
                     this.log.warning('It is not supposed to receive more trials after NO_MORE_TRIAL is set');
                     this.status.status = 'EXPERIMENT_RUNNING';
                 }
-                this.waitingTrials.push(content);
+                if (commandType === NEW_TRIAL_JOB) {
+                    this.waitingTrials.push(content);
+                } else {
+                    // the payloads are not parsed again, trials get them as the tuner serialized them
+                    this.waitingTrials.push(...splitJsonArray(content));
+                }
                 break;
             case SEND_TRIAL_JOB_PARAMETER:
                 const tunerCommand: any = JSON.parse(content);
@@ -15,6 +15,8 @@
 # DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
+import struct
+import zlib
 
 _in_file = open(3, 'rb')
 _out_file = open(4, 'wb')
@@ -30,10 +32,21 @@ def send(command, data):
 
 def receive():
     header = _in_file.read(8)
-    l = int(header[2:])
     command = header[:2].decode('utf8')
-    data = _in_file.read(l).decode('utf8')
-    return command, data
+    if header[2:3].isdigit():
+        return command, _in_file.read(int(header[2:])).decode('utf8')
+    # version 2 frames: 1 byte version, 1 byte flags, 4 bytes length, continued while flags has 0x02
+    chunks = []
+    while True:
+        _, _, flags, length = struct.unpack('>2sBBI', header)
+        chunks.append(_in_file.read(length))
+        if not flags & 0x02:
+            break
+        header = _in_file.read(8)
+    data = b''.join(chunks)
+    if flags & 0x01:
+        data = zlib.decompress(data)
+    return command, data.decode('utf8')
 
 
 print(receive())
@@ -45,3 +58,6 @@ print(receive())
 send('KI', 'hello')
 
 send('KI', '世界')
+
+command, data = receive()
+print((command, len(data)))
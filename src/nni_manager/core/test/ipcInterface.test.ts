@@ -29,7 +29,6 @@ import { createDispatcherInterface, IpcInterface } from '../ipcInterface';
 let sentCommands: {[key: string]: string}[] = [];
 const receivedCommands: {[key: string]: string}[] = [];
 
-let commandTooLong: Error | undefined;
 let rejectCommandType: Error | undefined;
 
 function runProcess(): Promise<Error | null> {
@@ -63,12 +62,8 @@ function runProcess(): Promise<Error | null> {
     // Command #2: ok
     dispatcher.sendCommand('ME', '123');
 
-    // Command #3: too long
-    try {
-        dispatcher.sendCommand('ME', 'x'.repeat(1_000_000));
-    } catch (error) {
-        commandTooLong = error;
-    }
+    // Command #3: too long for version 1 frames, sent in version 2 frames
+    dispatcher.sendCommand('ME', 'x'.repeat(1_000_000));
 
     // Command #4: FE is not tuner/assessor command, test the exception type of send non-valid command 
     try {
@@ -91,9 +86,9 @@ describe('core/protocol', (): void => {
         cleanupUnitTest();
     });
 
-    it('should have sent 2 successful commands', (): void => {
-        assert.equal(sentCommands.length, 3);
-        assert.equal(sentCommands[2], '');
+    it('should have sent 3 successful commands', (): void => {
+        assert.equal(sentCommands.length, 4);
+        assert.equal(sentCommands[3], '');
     });
 
     it('sendCommand() should work without content', (): void => {
@@ -104,9 +99,8 @@ describe('core/protocol', (): void => {
         assert.equal(sentCommands[1], '(\'ME\', \'123\')');
     });
 
-    it('sendCommand() should throw on too long command', (): void => {
-        assert.equal((<Error>commandTooLong).name, 'RangeError');
-        assert.equal((<Error>commandTooLong).message, 'Command too long');
+    it('sendCommand() should send too long command in version 2 frames', (): void => {
+        assert.equal(sentCommands[2], '(\'ME\', 1000000)');
     });
 
     it('sendCommand() should throw on wrong command type', (): void => {
@@ -26,7 +26,7 @@ import * as component from '../../common/component';
 import { Database, DataStore } from '../../common/datastore';
 import { Manager } from '../../common/manager';
 import { TrainingService } from '../../common/trainingService';
-import { cleanupUnitTest, prepareUnitTest } from '../../common/utils';
+import { cleanupUnitTest, getMsgDispatcherCommand, prepareUnitTest, splitJsonArray } from '../../common/utils';
 import { NNIDataStore } from '../nniDataStore';
 import { NNIManager } from '../nnimanager';
 import { SqlDB } from '../sqlDatabase';
@@ -156,3 +156,28 @@ describe('Unit test for nnimanager', function () {
         })
     })
 })
+
+describe('Unit test for splitJsonArray', () => {
+    it('keeps the text of each trial job of a batch', () => {
+        const batch: string = '[{"parameter_id": 0, "parameters": {"lr": 1.0, "s": "a,]\\"}["}}, ' +
+            '{"parameter_id": 1, "parameters": {"x": NaN, "y": 12345678901234567890, "z": [1, 2]}}]';
+        expect(splitJsonArray(batch)).to.deep.equal([
+            '{"parameter_id": 0, "parameters": {"lr": 1.0, "s": "a,]\\"}["}}',
+            '{"parameter_id": 1, "parameters": {"x": NaN, "y": 12345678901234567890, "z": [1, 2]}}'
+        ]);
+        expect(splitJsonArray('[]')).to.deep.equal([]);
+    })
+})
+
+describe('Unit test for getMsgDispatcherCommand', () => {
+    it('passes dispatcher options of the experiment to the dispatcher', () => {
+        const command: string = getMsgDispatcherCommand(
+            { className: 'TPE', prefetchSize: 4, prefetchStaleness: 2, stateSpillPath: '/tmp/spill.db', configCache: 'reuse' },
+            { className: 'Medianstop', processNum: 2 }, undefined, false, true,
+            { asyncMode: true, executorWorkers: 8, maxQueueDelays: [0, 1, 10.5], ipcTrace: '/tmp/trace' });
+        expect(command).to.equal('python3 -m nni --multi_thread --async_mode --executor_workers 8 ' +
+            '--max_queue_delays 0 1 10.5 --ipc_trace /tmp/trace --tuner_class_name TPE --prefetch_size 4 ' +
+            '--prefetch_staleness 2 --state_spill_path /tmp/spill.db --config_cache reuse ' +
+            '--assessor_class_name Medianstop --assessor_processes 2');
+    })
+})
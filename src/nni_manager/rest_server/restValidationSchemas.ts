@@ -99,6 +99,10 @@ export namespace ValidationSchemas {
             maxExecDuration: joi.number().min(0).required(),
             multiPhase: joi.boolean(),
             multiThread: joi.boolean(),
+            asyncMode: joi.boolean(),
+            executorWorkers: joi.number().min(1),
+            maxQueueDelays: joi.array().items(joi.number().min(0)).length(3),
+            ipcTrace: joi.string(),
             advisor: joi.object({
                 builtinAdvisorName: joi.string().valid('Hyperband'),
                 codeDir: joi.string(),
@@ -115,7 +119,12 @@ export namespace ValidationSchemas {
                 className: joi.string(),
                 classArgs: joi.any(),
                 gpuNum: joi.number().min(0),
-                checkpointDir: joi.string()
+                checkpointDir: joi.string(),
+                importData: joi.string(),
+                prefetchSize: joi.number().min(0),
+                prefetchStaleness: joi.number().min(0),
+                stateSpillPath: joi.string(),
+                configCache: joi.string().valid('off', 'reuse', 'resample')
             }),
             assessor: joi.object({
                 builtinAssessorName: joi.string().valid('Medianstop'),
@@ -124,7 +133,8 @@ export namespace ValidationSchemas {
                 className: joi.string(),
                 classArgs: joi.any(),
                 gpuNum: joi.number().min(0),
-                checkpointDir: joi.string()
+                checkpointDir: joi.string(),
+                processNum: joi.number().min(0)
             }),
             clusterMetaData: joi.array().items(joi.object({
                 key: joi.string(),
@@ -0,0 +1,72 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+Measure the cost of encoding and decoding typical dispatcher and trial messages with each codec.
+Usage: python benchmarks/codec_benchmark.py [--number N]
+'''
+
+import argparse
+import timeit
+
+import numpy as np
+
+from nni import codec
+
+_messages = {
+    'metric': {
+        'parameter_id': 42, 'trial_job_id': 'Ab3xZ', 'type': 'PERIODICAL', 'sequence': 17, 'value': 0.9312
+    },
+    'parameters': {
+        'parameter_id': 42, 'parameter_source': 'algorithm',
+        'parameters': {'learning_rate': 0.0012, 'batch_size': 64, 'optimizer': 'adam', 'dropout': 0.25,
+                       'conv_size': 5, 'hidden_size': 1024, 'layers': [64, 128, 256]}
+    },
+    'search_space': {
+        'param_%d' % i: {'_type': 'choice', '_value': list(range(10))} for i in range(50)
+    },
+    'numpy_metric': {
+        'parameter_id': 42, 'trial_job_id': 'Ab3xZ', 'type': 'FINAL', 'sequence': 0, 'value': np.int64(93)
+    }
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=2000, help='Number of iterations per measurement')
+    args = parser.parse_args()
+
+    print('%-14s %-12s %14s %14s' % ('message', 'codec', 'dumps (us)', 'loads (us)'))
+    for name, message in _messages.items():
+        for codec_name in ('json_tricks', 'auto', 'json'):
+            codec.set_codec(codec_name)
+            try:
+                string = codec.dumps(message)
+            except TypeError:
+                print('%-14s %-12s %14s %14s' % (name, codec_name, 'unsupported', '-'))
+                continue
+            dumps_cost = timeit.timeit(lambda: codec.dumps(message), number=args.number) / args.number
+            loads_cost = timeit.timeit(lambda: codec.loads(string), number=args.number) / args.number
+            print('%-14s %-12s %14.2f %14.2f' % (name, codec_name, dumps_cost * 1e6, loads_cost * 1e6))
+    codec.set_codec('auto')
+
+
+if __name__ == '__main__':
+    main()
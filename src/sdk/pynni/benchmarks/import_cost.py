@@ -0,0 +1,94 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+Report the import cost of the dispatcher and of every builtin tuner, assessor and advisor.
+Every module is imported in a fresh interpreter after nni.__main__, as the dispatcher process does,
+and the packages pulled in are ranked by their cumulative import time from python -X importtime.
+Usage: python benchmarks/import_cost.py [--top N]
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from nni.constants import ModuleName, AdvisorModuleName
+
+_marker = 'nni-import-cost-marker'
+
+
+def measure(modules, baseline):
+    '''
+    Measure the cost of importing modules after the baseline modules.
+    Returns a tuple of seconds and a dict from top-level package name to cumulative seconds,
+    or a tuple of None and the error message if the modules cannot be imported.
+    '''
+    code = 'import sys, importlib\n'
+    code += ''.join('importlib.import_module("%s")\n' % module for module in baseline)
+    code += 'sys.stderr.write("%s\\n")\n' % _marker
+    code += ''.join('importlib.import_module("%s")\n' % module for module in modules)
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    lines = process.stderr.splitlines()
+    if process.returncode != 0:
+        return None, lines[-1] if lines else 'exit code %d' % process.returncode
+    lines = lines[lines.index(_marker) + 1:]
+
+    packages = defaultdict(float)
+    total = 0
+    for line in lines:
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        seconds = int(cumulative) / 1e6
+        indent = len(name) - len(name.lstrip())
+        name = name.strip()
+        # nested imports are reported before their parent, the outermost one includes the others
+        packages[name.split('.')[0]] = max(packages[name.split('.')[0]], seconds)
+        if indent == 1:
+            total += seconds
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--top', type=int, default=4, help='Number of heaviest packages to show for each builtin')
+    args = parser.parse_args()
+
+    # the dispatcher process imports nni.__main__, then the builtins and the dispatcher on demand
+    measurements = [('(dispatcher)', ['nni.__main__', 'nni.msg_dispatcher'], [])]
+    for name, module in sorted(ModuleName.items()) + sorted(AdvisorModuleName.items()):
+        measurements.append((name, [module], ['nni.__main__']))
+    print('%-14s %10s  %s' % ('builtin', 'ms', 'heaviest packages (ms)'))
+    for name, modules, baseline in measurements:
+        seconds, packages = measure(modules, baseline)
+        if seconds is None:
+            print('%-14s %10s  %s' % (name, 'error', packages))
+            continue
+        heaviest = sorted(packages.items(), key=lambda item: -item[1])[:args.top]
+        print('%-14s %10.1f  %s' % (name, seconds * 1000,
+                                    ', '.join('%s %.1f' % (package, cost * 1000) for package, cost in heaviest)))
+
+
+if __name__ == '__main__':
+    main()
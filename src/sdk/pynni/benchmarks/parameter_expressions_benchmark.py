@@ -0,0 +1,68 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+'''
+Measure the cost per sample of each parameter expression, sampled one at a time and in batches.
+Usage: python benchmarks/parameter_expressions_benchmark.py [--samples N]
+'''
+
+import argparse
+import timeit
+
+import numpy as np
+
+from nni import parameter_expressions
+
+_values = {
+    'choice': [[16, 32, 64, 128]],
+    'randint': [10],
+    'uniform': [0, 1],
+    'quniform': [0, 10, 0.5],
+    'loguniform': [1e-5, 1e-1],
+    'qloguniform': [1, 1000, 10],
+    'normal': [0, 1],
+    'qnormal': [0, 1, 0.1],
+    'lognormal': [0, 1],
+    'qlognormal': [0, 1, 0.1]
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=1000000, help='Number of samples per measurement')
+    args = parser.parse_args()
+
+    random_state = np.random.RandomState()
+    sizes = (1, 1000, 100000)
+    print('%-12s%18s' % ('expression', 'scalar (ns)') + ''.join('%18s' % ('size=%d (ns)' % size) for size in sizes))
+    for _type, _value in _values.items():
+        expression = parameter_expressions.EXPRESSIONS[_type]
+        call_args = _value + [random_state]
+        number = max(args.samples // 100, 1)
+        cost = timeit.timeit(lambda: expression(*call_args), number=number) / number
+        costs = [cost]
+        for size in sizes:
+            number = max(args.samples // size, 1)
+            cost = timeit.timeit(lambda: expression(*call_args, size=size), number=number) / number
+            costs.append(cost / size)
+        print('%-12s' % _type + ''.join('%18.1f' % (cost * 1e9) for cost in costs))
+
+
+if __name__ == '__main__':
+    main()
@@ -28,11 +28,11 @@ import json
 import importlib
 
 from .constants import ModuleName, ClassName, ClassArgs, AdvisorModuleName, AdvisorClassName
-from nni.common import enable_multi_thread
-from nni.msg_dispatcher import MsgDispatcher
-from nni.multi_phase.multi_phase_dispatcher import MultiPhaseMsgDispatcher
+from nni.common import init_dispatcher_logger, enable_multi_thread, enable_async_mode, set_executor_workers, \
+    set_max_queue_delays, env_args
+from nni.profiler import install_profiler
+from nni.protocol import start_trace, stop_trace
 logger = logging.getLogger('nni.main')
-logger.debug('START')
 
 def augment_classargs(input_class_args, classname):
     if classname in ClassArgs:
@@ -79,8 +79,8 @@ def create_customized_class_instance(class_dir, class_filename, classname, jsons
         instance = class_constructor()
     return instance
 
-def parse_args():
-    parser = argparse.ArgumentParser(description='parse command line parameters.')
+def add_dispatcher_arguments(parser):
+    '''add the arguments used by create_dispatcher() to an argparse parser'''
     parser.add_argument('--advisor_class_name', type=str, required=False,
                         help='Advisor class name, the class must be a subclass of nni.MsgDispatcherBase')
     parser.add_argument('--advisor_class_filename', type=str, required=False,
@@ -107,22 +107,42 @@ def parse_args():
                         help='Assessor directory')
     parser.add_argument('--assessor_class_filename', type=str, required=False,
                         help='Assessor class file path')
-
+    parser.add_argument('--assessor_processes', type=int, default=0,
+                        help='Run assessor in this many worker processes, 0 to run it in dispatcher process')
+    parser.add_argument('--prefetch_size', type=int, default=0,
+                        help='Generate up to this many parameters in advance while dispatcher is idle, 0 to disable')
+    parser.add_argument('--prefetch_staleness', type=int, default=0,
+                        help='Number of final results a prefetched parameter may miss before it is regenerated')
+    parser.add_argument('--state_spill_path', type=str, required=False,
+                        help='Keep parameters of finished trials in a database at this path instead of dropping them')
+    parser.add_argument('--config_cache', choices=['off', 'reuse', 'resample'], default='off',
+                        help='Reuse the final result of, or resample, parameters the tuner proposes again')
+    parser.add_argument('--import_data', type=str, required=False,
+                        help='Database or exported results of a previous experiment to warm-start the tuner with')
     parser.add_argument('--multi_phase', action='store_true')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='parse command line parameters.')
+    add_dispatcher_arguments(parser)
     parser.add_argument('--multi_thread', action='store_true')
+    parser.add_argument('--async_mode', action='store_true',
+                        help='Run dispatcher on an asyncio event loop, with handlers in an executor')
+    parser.add_argument('--executor_workers', type=int, required=False,
+                        help='Number of threads running handlers in multi-thread and async mode')
+    parser.add_argument('--max_queue_delays', type=float, nargs=3, required=False,
+                        metavar=('CONTROL', 'TUNER', 'PERIODICAL'),
+                        help='Maximum seconds commands of each priority class wait for commands of higher priority')
+    parser.add_argument('--ipc_trace', type=str, default=os.environ.get('NNI_IPC_TRACE'),
+                        help='Record all commands exchanged with NNI manager to this file, see nni.replay')
 
     flags, _ = parser.parse_known_args()
     return flags
 
-def main():
+def create_dispatcher(args):
     '''
-    main function.
+    create the dispatcher from parsed arguments, see add_dispatcher_arguments().
+    returns a tuple of dispatcher, tuner and assessor, tuner and assessor are None for advisor.
     '''
-
-    args = parse_args()
-    if args.multi_thread:
-        enable_multi_thread()
-
     if args.advisor_class_name:
         # advisor is enabled and starts to run
         if args.multi_phase:
@@ -139,59 +159,90 @@ def main():
                 args.advisor_args)
         if dispatcher is None:
             raise AssertionError('Failed to create Advisor instance')
-        try:
-            dispatcher.run()
-        except Exception as exception:
-            logger.exception(exception)
-            raise
+        return dispatcher, None, None
+
+    # tuner (and assessor) is enabled and starts to run
+    tuner = None
+    assessor = None
+    if args.tuner_class_name in ModuleName:
+        tuner = create_builtin_class_instance(
+            args.tuner_class_name, 
+            args.tuner_args)
     else:
-        # tuner (and assessor) is enabled and starts to run
-        tuner = None
-        assessor = None
-        if args.tuner_class_name in ModuleName:
-            tuner = create_builtin_class_instance(
-                args.tuner_class_name, 
-                args.tuner_args)
+        tuner = create_customized_class_instance(
+            args.tuner_directory,
+            args.tuner_class_filename,
+            args.tuner_class_name,
+            args.tuner_args)
+
+    if tuner is None:
+        raise AssertionError('Failed to create Tuner instance')
+
+    if args.assessor_class_name:
+        if args.assessor_class_name in ModuleName:
+            assessor = create_builtin_class_instance(
+                args.assessor_class_name,
+                args.assessor_args)
         else:
-            tuner = create_customized_class_instance(
-                args.tuner_directory,
-                args.tuner_class_filename,
-                args.tuner_class_name,
-                args.tuner_args)
-
-        if tuner is None:
-            raise AssertionError('Failed to create Tuner instance')
-
-        if args.assessor_class_name:
-            if args.assessor_class_name in ModuleName:
-                assessor = create_builtin_class_instance(
-                    args.assessor_class_name,
-                    args.assessor_args)
-            else:
-                assessor = create_customized_class_instance(
-                    args.assessor_directory,
-                    args.assessor_class_filename,
-                    args.assessor_class_name,
-                    args.assessor_args)
-            if assessor is None:
-                raise AssertionError('Failed to create Assessor instance')
+            assessor = create_customized_class_instance(
+                args.assessor_directory,
+                args.assessor_class_filename,
+                args.assessor_class_name,
+                args.assessor_args)
+        if assessor is None:
+            raise AssertionError('Failed to create Assessor instance')
+
+    # dispatchers are imported on demand, like builtin tuners and assessors
+    if args.multi_phase:
+        from nni.multi_phase.multi_phase_dispatcher import MultiPhaseMsgDispatcher
+        dispatcher = MultiPhaseMsgDispatcher(tuner, assessor)
+        if args.import_data:
+            logger.warning('Importing data is not supported by multi-phase tuners, %s is ignored', args.import_data)
+        if args.assessor_processes:
+            logger.warning('Assessor worker processes are not supported by multi-phase tuners, '
+                           'assessor runs in dispatcher process')
+    else:
+        from nni.msg_dispatcher import MsgDispatcher
+        dispatcher = MsgDispatcher(tuner, assessor, args.assessor_processes,
+                                   args.prefetch_size, args.prefetch_staleness, args.state_spill_path,
+                                   args.config_cache, args.import_data)
+    return dispatcher, tuner, assessor
 
-        if args.multi_phase:
-            dispatcher = MultiPhaseMsgDispatcher(tuner, assessor)
-        else:
-            dispatcher = MsgDispatcher(tuner, assessor)
+def main():
+    '''
+    main function.
+    '''
 
-        try:
-            dispatcher.run()
+    init_dispatcher_logger()
+    logger.debug('START')
+    install_profiler(env_args.log_dir or os.getcwd(), 'dispatcher')
+    args = parse_args()
+    if args.multi_thread:
+        enable_multi_thread()
+    if args.async_mode:
+        enable_async_mode()
+    set_executor_workers(args.executor_workers)
+    if args.max_queue_delays:
+        set_max_queue_delays(args.max_queue_delays)
+    if args.ipc_trace:
+        start_trace(args.ipc_trace)
+
+    dispatcher, tuner, assessor = create_dispatcher(args)
+    try:
+        dispatcher.run()
+        if tuner is not None:
             tuner._on_exit()
-            if assessor is not None:
-                assessor._on_exit()
-        except Exception as exception:
-            logger.exception(exception)
+        if assessor is not None:
+            assessor._on_exit()
+    except Exception as exception:
+        logger.exception(exception)
+        if tuner is not None:
             tuner._on_error()
-            if assessor is not None:
-                assessor._on_error()
-            raise
+        if assessor is not None:
+            assessor._on_error()
+        raise
+    finally:
+        stop_trace()
 
 if __name__ == '__main__':
     try:
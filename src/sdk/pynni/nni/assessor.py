@@ -30,17 +30,63 @@ class AssessResult(Enum):
     Good = True
     Bad = False
 
+class TrialBatch:
+    """Intermediate results of several trials, assessed together by Assessor.assess_trials()."""
+    def __init__(self, trial_job_ids, histories):
+        self.trial_job_ids = trial_job_ids
+        '''identifiers of the trials (list of str)'''
+        self.histories = histories
+        '''read-only sequences of intermediate results, like trial_history of Assessor.assess_trial()'''
+        self._arrays = None
+
+    def __len__(self):
+        return len(self.trial_job_ids)
+
+    def arrays(self):
+        """Returns a tuple of NumPy arrays (values, lengths), built on first call.
+        values: float array of shape (number of trials, length of the longest history), padded with NaN.
+            The row of a history with results that are not numbers is all NaN.
+        lengths: int array of the history lengths.
+        """
+        if self._arrays is None:
+            import numpy as np  # only loaded by assessors working on arrays
+            lengths = np.array([len(history) for history in self.histories], dtype=np.int64)
+            values = np.full((len(self.histories), lengths.max() if len(lengths) else 0), np.nan)
+            for i, history in enumerate(self.histories):
+                try:
+                    values[i, :lengths[i]] = history
+                except (TypeError, ValueError):
+                    _logger.warning('Intermediate results of trial %s are not numbers, read as NaN',
+                                    self.trial_job_ids[i])
+            self._arrays = (values, lengths)
+        return self._arrays
+
+
 class Assessor(Recoverable):
     # pylint: disable=no-self-use,unused-argument
 
     def assess_trial(self, trial_job_id, trial_history):
-        """Determines whether a trial should be killed. Must override.
+        """Determines whether a trial should be killed. Must override, unless assess_trials() is overridden.
         trial_job_id: identifier of the trial (str).
-        trial_history: a list of intermediate result objects.
+        trial_history: a read-only sequence of intermediate result objects, ordered by sequence number.
         Returns AssessResult.Good or AssessResult.Bad.
         """
+        if type(self).assess_trials is not Assessor.assess_trials:
+            results = self.assess_trials(TrialBatch([trial_job_id], [trial_history]))
+            return results.tolist()[0] if hasattr(results, 'tolist') else results[0]
         raise NotImplementedError('Assessor: assess_trial not implemented')
 
+    def assess_trials(self, batch):
+        """Determines whether each trial of a batch should be killed.
+        In the default single thread mode, the dispatcher calls it once with all trials having new results
+        since the last pass over received commands, override it to decide with array operations,
+        see TrialBatch.arrays(). Calls assess_trial() for each trial by default.
+        batch: TrialBatch.
+        Returns a sequence of AssessResult or bool, or a NumPy bool array, in the order of batch.trial_job_ids.
+        """
+        return [self.assess_trial(trial_job_id, history)
+                for trial_job_id, history in zip(batch.trial_job_ids, batch.histories)]
+
     def trial_end(self, trial_job_id, success):
         """Invoked when a trial is completed or terminated. Do nothing by default.
         trial_job_id: identifier of the trial (str).
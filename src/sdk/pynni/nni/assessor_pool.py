@@ -0,0 +1,102 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+assessor_pool.py
+'''
+
+import logging
+import zlib
+
+from .metric_store import metric_store
+
+_logger = logging.getLogger(__name__)
+
+_assessor = None
+'''The assessor instance living in a worker process'''
+
+def _init_worker(assessor):
+    global _assessor  # pylint: disable=global-statement
+    _assessor = assessor
+    metric_store.reset()  # a forked worker starts with a copy of the store of the dispatcher
+
+def _assess_trial(trial_job_id, trial_history):
+    # the metric store of a worker only has the trials assessed by it
+    metric_store.record_history(trial_job_id, trial_history)
+    return _assessor.assess_trial(trial_job_id, trial_history)
+
+def _trial_end(trial_job_id, success):
+    metric_store.trial_ended(trial_job_id, success)
+    _assessor.trial_end(trial_job_id, success)
+
+
+class AssessorPool:
+    '''
+    Runs an assessor in worker processes, so heavy assessors do not hold the GIL of the dispatcher.
+    Every worker process owns a copy of the assessor, and every trial is always assessed by the same worker,
+    so the per-trial state of the assessor stays consistent.
+    Note that state shared among trials (e.g. histories of completed trials) only covers the trials of one worker,
+    and so does nni.metric_store.metric_store in a worker process.
+    '''
+    def __init__(self, assessor, processes, on_result):
+        '''
+        assessor: the assessor to copy into worker processes, must be picklable
+        processes: number of worker processes
+        on_result: callback invoked with (trial_job_id, result) once a trial is assessed,
+            called from a background thread of the pool
+        '''
+        from concurrent.futures import ProcessPoolExecutor
+        self.on_result = on_result
+        self.workers = [ProcessPoolExecutor(max_workers=1) for _ in range(processes)]
+        for worker in self.workers:
+            # a worker has only one process and runs tasks in submission order, so this runs first
+            worker.submit(_init_worker, assessor)
+
+    def _worker_of(self, trial_job_id):
+        return self.workers[zlib.crc32(str(trial_job_id).encode('utf8')) % len(self.workers)]
+
+    def assess_trial(self, trial_job_id, trial_history):
+        '''Assess a trial asynchronously, the result is delivered to on_result'''
+        future = self._worker_of(trial_job_id).submit(_assess_trial, trial_job_id, list(trial_history))
+        future.add_done_callback(lambda f: self._deliver(trial_job_id, f))
+
+    def trial_end(self, trial_job_id, success):
+        self._worker_of(trial_job_id).submit(_trial_end, trial_job_id, success)
+
+    def _deliver(self, trial_job_id, future):
+        try:
+            result = future.result()
+        except Exception:  # pylint: disable=broad-except
+            _logger.exception('Assessor error')
+            return
+        self.on_result(trial_job_id, result)
+
+    def wait(self):
+        '''Wait until all submitted work is done and its results are delivered'''
+        # a worker runs tasks in submission order, and results are delivered in completion order,
+        # so the results of earlier tasks are delivered once an empty task is done
+        futures = [worker.submit(int) for worker in self.workers]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        '''Wait for pending assessments, then stop the worker processes'''
+        for worker in self.workers:
+            worker.shutdown(wait=True)
@@ -0,0 +1,110 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+codec.py
+
+Serialization of the payloads exchanged among trials, NNI manager and the dispatcher.
+The codec is selected with NNI_CODEC environment variable or set_codec():
+    auto: (default) standard json module for plain JSON types, json_tricks for the rest (e.g. NumPy objects)
+    json_tricks: always json_tricks, as NNI did before
+    json: standard json module only, special types are not supported
+'''
+
+import json
+import os
+import time
+from collections import OrderedDict
+
+from .telemetry import telemetry
+
+_special_marker = '"__'
+'''json_tricks encodes special types as objects with keys like "__ndarray__"'''
+
+
+# json_tricks imports NumPy, which takes longer than starting the dispatcher,
+# so it is only imported once a payload needs it
+
+def _json_tricks_loads(string):
+    import json_tricks
+    return json_tricks.loads(string)
+
+
+def _json_tricks_dumps(obj):
+    import json_tricks
+    return json_tricks.dumps(obj)
+
+
+def _auto_loads(string):
+    if _special_marker not in string:
+        try:
+            return json.loads(string, object_pairs_hook=OrderedDict)
+        except ValueError:
+            pass  # e.g. comments, which json_tricks ignores
+    return _json_tricks_loads(string)
+
+
+def _auto_dumps(obj):
+    try:
+        return json.dumps(obj, allow_nan=False)
+    except (TypeError, ValueError):
+        # special types, or errors which json_tricks reports as well
+        return _json_tricks_dumps(obj)
+
+
+_codecs = {
+    'auto': (_auto_loads, _auto_dumps),
+    'json_tricks': (_json_tricks_loads, _json_tricks_dumps),
+    'json': (lambda string: json.loads(string, object_pairs_hook=OrderedDict),
+             lambda obj: json.dumps(obj, allow_nan=False))
+}
+
+_loads, _dumps = _codecs['auto']
+
+
+def register_codec(name, loads_func, dumps_func):
+    '''Register a codec, which can be selected with set_codec() or NNI_CODEC'''
+    _codecs[name] = (loads_func, dumps_func)
+
+
+def set_codec(name):
+    global _loads, _dumps  # pylint: disable=global-statement
+    if name not in _codecs:
+        raise ValueError('Unknown codec: {}, supported codecs are {}'.format(name, sorted(_codecs)))
+    _loads, _dumps = _codecs[name]
+
+
+def loads(string):
+    '''Deserialize a JSON string'''
+    start = time.perf_counter()
+    ret = _loads(string)
+    telemetry.add_time('serialization', time.perf_counter() - start)
+    return ret
+
+
+def dumps(obj):
+    '''Serialize an object to JSON string'''
+    start = time.perf_counter()
+    ret = _dumps(obj)
+    telemetry.add_time('serialization', time.perf_counter() - start)
+    return ret
+
+
+set_codec(os.environ.get('NNI_CODEC', 'auto'))
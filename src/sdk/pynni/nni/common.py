@@ -22,9 +22,14 @@
 from collections import namedtuple
 from datetime import datetime
 from io import TextIOBase
+import atexit
 import logging
 import os
+import queue
 import sys
+import threading
+import time
+import traceback
 
 
 def _load_env_args():
@@ -41,43 +46,197 @@ env_args = _load_env_args()
 
 
 _time_format = '%Y-%m-%d %H:%M:%S'
+
+_log_levels = {
+    'critical': logging.CRITICAL,
+    'error': logging.ERROR,
+    'warning': logging.WARNING,
+    'info': logging.INFO,
+    'debug': logging.DEBUG,
+}
+
+def log_level():
+    """Level of the root logger, set with environment variable NNI_LOG_LEVEL (default: info)"""
+    name = os.environ.get('NNI_LOG_LEVEL', 'info').lower()
+    if name not in _log_levels:
+        raise ValueError('NNI_LOG_LEVEL should be one of {}, got {}'.format(', '.join(_log_levels), name))
+    return _log_levels[name]
+
+_log_max_bytes = int(os.environ.get('NNI_LOG_MAX_BYTES', 64 * 1024 * 1024))
+_log_backup_count = 3
+_log_flush_interval = 1.0
+
+_stop = object()
+
+class _LogWriter:
+    """Write formatted log lines to a file, in a background thread or synchronously.
+    Callers format their lines and put() them, in background mode the writer thread only does the disk writes,
+    and flushes the file at most once per flush_interval and when the writer is closed, which is done on exit.
+    A synchronous writer writes and flushes every line before put() returns, so nothing is lost when the process
+    is killed, e.g. by SIGTERM.
+    A forked child process has no writer thread, so the writer of a child is always synchronous.
+    When the file grows over max_bytes it is rotated to path.1, path.2, ..., keeping backup_count old files,
+    max_bytes of 0 disables rotation.
+    """
+    def __init__(self, path, max_bytes=_log_max_bytes, backup_count=_log_backup_count,
+                 flush_interval=_log_flush_interval, background=True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.background = background
+        self.queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._file = open(path, 'w')
+        self._size = 0
+        self._dirty = False
+        self._last_flush = time.time()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name='nni-log-writer', daemon=True)
+            self._thread.start()
+        if hasattr(os, 'register_at_fork'):
+            # flush before forking, otherwise the child inherits the unflushed buffer and writes it again
+            os.register_at_fork(before=self._before_fork, after_in_parent=self._lock.release,
+                                after_in_child=self._after_fork)
+        atexit.register(self.close)
+
+    def put(self, line):
+        """Write a formatted line, ending with newline"""
+        if os.getpid() != self._pid:
+            self._after_fork()
+        if self.background:
+            self.queue.put(line)
+        else:
+            with self._lock:
+                self._write(line)
+                self._flush()
+
+    def close(self):
+        """Write everything queued so far, flush and close the file"""
+        if self.background and self._thread.is_alive():
+            self.queue.put(_stop)
+            self._thread.join()
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+                self._file.close()
+
+    def _before_fork(self):
+        self._lock.acquire()
+        self._flush()
+
+    def _after_fork(self):
+        # the lock is copied while held, and lines queued in the parent are written by the parent
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.background = False
+
+    def _run(self):
+        while True:
+            try:
+                line = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self._lock:
+                    self._flush()
+                continue
+            if line is _stop:
+                break
+            with self._lock:
+                try:
+                    self._write(line)
+                except Exception:  # pylint: disable=broad-except
+                    # the writer must keep running, there is no better place to report its own errors
+                    traceback.print_exc(file=sys.__stderr__)
+                if time.time() - self._last_flush >= self.flush_interval:
+                    self._flush()
+
+    def _write(self, line):
+        if self.max_bytes > 0 and self._size > 0 and self._size + len(line) > self.max_bytes:
+            self._rotate()
+        self._file.write(line)
+        self._size += len(line)
+        self._dirty = True
+
+    def _flush(self):
+        if self._dirty:
+            self._file.flush()
+            self._dirty = False
+        self._last_flush = time.time()
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = '{}.{}'.format(self.path, i)
+            if os.path.exists(src):
+                os.replace(src, '{}.{}'.format(self.path, i + 1))
+        if self.backup_count > 0:
+            os.replace(self.path, self.path + '.1')
+        self._file = open(self.path, 'w')
+        self._size = 0
+
+
+class _LogHandler(logging.Handler):
+    """Format records in the logging thread and pass them to a _LogWriter"""
+    def __init__(self, writer):
+        super().__init__()
+        self.writer = writer
+
+    def emit(self, record):
+        try:
+            self.writer.put(self.format(record) + '\n')
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+
+
 class _LoggerFileWrapper(TextIOBase):
-    def __init__(self, logger_file):
-        self.file = logger_file
+    def __init__(self, writer):
+        self.writer = writer
 
     def write(self, s):
         if s != '\n':
-            time = datetime.now().strftime(_time_format)
-            self.file.write('[{}] PRINT '.format(time) + s + '\n')
-            self.file.flush()
+            self.writer.put('[{}] PRINT {}\n'.format(datetime.now().strftime(_time_format), s))
         return len(s)
 
 
-def init_logger(logger_file_path):
+def init_logger(logger_file_path, background=False):
     """Initialize root logger.
     This will redirect anything from logging.getLogger() as well as stdout to specified file.
     logger_file_path: path of logger file (path-like object).
+    background: write the file from a background thread, see _LogWriter. Lines not written yet are lost
+        if the process is killed, so trials write synchronously.
     """
     if env_args.platform == 'unittest':
         logger_file_path = 'unittest.log'
     elif env_args.log_dir is not None:
         logger_file_path = os.path.join(env_args.log_dir, logger_file_path)
-    logger_file = open(logger_file_path, 'w')
 
     fmt = '[%(asctime)s] %(levelname)s (%(name)s) %(message)s'
-    formatter = logging.Formatter(fmt, _time_format)
-
-    handler = logging.StreamHandler(logger_file)
-    handler.setFormatter(formatter)
+    writer = _LogWriter(logger_file_path, background=background)
+    handler = _LogHandler(writer)
+    handler.setFormatter(logging.Formatter(fmt, _time_format))
 
     root_logger = logging.getLogger()
     root_logger.addHandler(handler)
-    root_logger.setLevel(logging.DEBUG)
+    root_logger.setLevel(log_level())
 
     # these modules are too verbose
     logging.getLogger('matplotlib').setLevel(logging.INFO)
 
-    sys.stdout = _LoggerFileWrapper(logger_file)
+    sys.stdout = _LoggerFileWrapper(writer)
+
+_dispatcher_logger_initialized = False
+
+def init_dispatcher_logger():
+    """Initialize root logger of the dispatcher process with dispatcher.log, only the first call takes effect.
+    It is not done on import, so that importing the dispatcher has no side effects.
+    """
+    global _dispatcher_logger_initialized
+    if not _dispatcher_logger_initialized:
+        _dispatcher_logger_initialized = True
+        init_logger('dispatcher.log', background=True)
 
 _multi_thread = False
 
@@ -87,3 +246,35 @@ def enable_multi_thread():
 
 def multi_thread_enabled():
     return _multi_thread
+
+_async_mode = False
+
+def enable_async_mode():
+    '''Run the dispatcher on an asyncio event loop'''
+    global _async_mode
+    _async_mode = True
+
+def async_mode_enabled():
+    return _async_mode
+
+_executor_workers = None
+
+def set_executor_workers(workers):
+    '''Set the number of threads running handlers in multi-thread and async mode, None for default'''
+    global _executor_workers
+    _executor_workers = workers
+
+def executor_workers():
+    return _executor_workers
+
+_max_queue_delays = (1.0, 10.0, 60.0)
+
+def set_max_queue_delays(delays):
+    '''Set the maximum seconds commands of each priority class wait for commands of higher priority,
+    classes are control commands, FINAL metrics and other tuner commands, and PERIODICAL metrics
+    '''
+    global _max_queue_delays
+    _max_queue_delays = tuple(delays)
+
+def max_queue_delays():
+    return _max_queue_delays
@@ -4,6 +4,7 @@ sys.path.append(os.path.split(os.path.dirname(os.path.realpath(__file__)))[0])
 import logging
 import numpy as np
 from assessor import Assessor, AssessResult
+from nni.metric_store import metric_store
 from curvemodelfactory import MLCurveModel
 from mcmc_modelfactory import MCMCCurveModelCombination
 from ml_curvemodel import curve_combination_models, model_defaults, all_models
@@ -109,23 +110,19 @@ class CurvefittingAssessor(Assessor):
     def __init__(self, start_step=0, xlim=XLIM):
         self.start_step = start_step
         self.xlim = xlim
-        self.running_history = dict()
         self.completed_best_history = 0.
-    
-    def _update_data(self, trial_job_id, trial_history):
-        if trial_job_id not in self.running_history: 
-            self.running_history[trial_job_id] = []
-        self.running_history[trial_job_id].extend(trial_history[len(self.running_history[trial_job_id]):])
+        metric_store.enable()
 
     def trial_end(self, trial_job_id, success):
         '''
-        trial end: record the best performance of completed trial job
+        trial end: record the best performance of completed trial job, read from nni.metric_store
         '''
-        if trial_job_id in self.running_history:
-            if success:
-                self.completed_best_history = np.max(self.running_history[trial_job_id])
+        if not success:
+            return
+        if trial_job_id in metric_store:
+            self.completed_best_history = np.nanmax(metric_store.history(trial_job_id))
         else:
-            logger.warning('trial_end: trial_job_id does not in running_history')
+            logger.warning('trial_end: trial_job_id does not in metric store')
 
     def assess_trial(self, trial_job_id, trial_history):
         '''
@@ -136,9 +133,7 @@ class CurvefittingAssessor(Assessor):
         trial_history = np.argsort(trial_history)
         if curr_step < self.start_step:
             return AssessResult.Good
-        
-        self._update_data(trial_job_id, trial_history)
-        
+
         # predict and assess
         #try:
         term_crit = TerminationCriterion(trial_history=trial_history, completed_best_history=self.completed_best_history)
@@ -0,0 +1,295 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+dispatcher_state.py
+'''
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict, deque
+
+from . import codec
+
+_logger = logging.getLogger(__name__)
+
+_customized = 1
+_final_received = 2
+_trial_ended = 4
+
+_evicted = object()
+
+_max_awaiting_final = 1000
+
+
+class ParameterStore:
+    '''
+    Parameters sent to trials, indexed by parameter id.
+    Parameter ids are allocated in increasing order, so live entries are kept in an array starting at the oldest
+    live id. An entry is evicted once the final result of its trial has been delivered and the trial has ended,
+    so memory scales with running trials instead of all trials of the experiment.
+    The final result of a trial may arrive after its end, whatever the status of the trial, or never arrive,
+    so ended trials wait for it in a queue of at most awaiting_capacity entries, oldest evicted first.
+    If spill_path is given, evicted parameters are written to a dbm database there,
+    and late results of evicted parameters can still be delivered.
+    '''
+    def __init__(self, spill_path=None, awaiting_capacity=_max_awaiting_final):
+        self._lock = threading.Lock()  # handlers of different trials access it in parallel in multi-thread mode
+        self.awaiting_capacity = awaiting_capacity
+        self._base = 0
+        self._params = deque()
+        self._flags = deque()
+        self._sparse = {}  # entries older than _base, only happens when ids are not added in order
+        self._awaiting = OrderedDict()  # ids of ended trials without final result, in order of their end
+        self._spill = None
+        if spill_path:
+            self.spill_to(spill_path)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._params) - self._params.count(_evicted) + len(self._sparse)
+
+    def __contains__(self, parameter_id):
+        with self._lock:
+            return self._index(parameter_id) is not None or parameter_id in self._sparse
+
+    def add(self, parameter_id, params, customized=False):
+        with self._lock:
+            self._add(parameter_id, params, customized)
+
+    def _add(self, parameter_id, params, customized):
+        flags = _customized if customized else 0
+        if parameter_id < self._base:
+            self._sparse[parameter_id] = [params, flags]
+            return
+        if not self._params:
+            self._base = parameter_id
+        while self._base + len(self._params) <= parameter_id:
+            self._params.append(_evicted)
+            self._flags.append(0)
+        self._params[parameter_id - self._base] = params
+        self._flags[parameter_id - self._base] = flags
+
+    def get(self, parameter_id):
+        '''Returns (parameters, customized), raises KeyError if parameter_id is unknown'''
+        with self._lock:
+            index = self._index(parameter_id)
+            if index is not None:
+                return self._params[index], bool(self._flags[index] & _customized)
+            if parameter_id in self._sparse:
+                params, flags = self._sparse[parameter_id]
+                return params, bool(flags & _customized)
+            if self._spill is not None and str(parameter_id) in self._spill:
+                params, customized = codec.loads(self._spill[str(parameter_id)].decode('utf8'))
+                return params, customized
+        raise KeyError(parameter_id)
+
+    def final_received(self, parameter_id):
+        with self._lock:
+            self._mark(parameter_id, _final_received)
+
+    def trial_ended(self, parameter_id):
+        with self._lock:
+            self._mark(parameter_id, _trial_ended)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_spill'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def spill_to(self, spill_path):
+        import dbm
+        with self._lock:
+            self._close()
+            self._spill = dbm.open(spill_path, 'n')
+        _logger.info('Evicted parameters are spilled to %s', spill_path)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def _index(self, parameter_id):
+        index = parameter_id - self._base
+        if 0 <= index < len(self._params) and self._params[index] is not _evicted:
+            return index
+        return None
+
+    def _mark(self, parameter_id, flag):
+        index = self._index(parameter_id)
+        if index is not None:
+            self._flags[index] |= flag
+            flags = self._flags[index]
+        elif parameter_id in self._sparse:
+            self._sparse[parameter_id][1] |= flag
+            flags = self._sparse[parameter_id][1]
+        else:
+            return
+        if flags & (_final_received | _trial_ended) == _final_received | _trial_ended:
+            self._awaiting.pop(parameter_id, None)
+            self._remove(parameter_id)
+        elif flag == _trial_ended:
+            self._awaiting[parameter_id] = None
+            while len(self._awaiting) > self.awaiting_capacity:
+                self._remove(self._awaiting.popitem(last=False)[0])
+
+    def _remove(self, parameter_id):
+        index = self._index(parameter_id)
+        if index is not None:
+            self._evict(parameter_id, self._params[index], self._flags[index])
+            self._params[index] = _evicted
+            while self._params and self._params[0] is _evicted:
+                self._params.popleft()
+                self._flags.popleft()
+                self._base += 1
+        else:
+            self._evict(parameter_id, *self._sparse.pop(parameter_id))
+
+    def _evict(self, parameter_id, params, flags):
+        if self._spill is not None:
+            self._spill[str(parameter_id)] = codec.dumps([params, bool(flags & _customized)])
+
+
+class RecentSet:
+    '''
+    A set remembering only the most recently added 'capacity' items
+    '''
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def add(self, item):
+        self._items[item] = None
+        self._items.move_to_end(item)
+        if len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+
+def _jsonable(obj):
+    if hasattr(obj, 'tolist'):  # NumPy scalar or array
+        return obj.tolist()
+    return repr(obj)
+
+
+def fingerprint(params):
+    '''
+    Canonical hash of parameters, equal for equal parameters regardless of the order of dict keys
+    and of NumPy types
+    '''
+    canonical = json.dumps(params, sort_keys=True, separators=(',', ':'), default=_jsonable)
+    return hashlib.sha1(canonical.encode('utf8')).digest()
+
+
+class ConfigCache:
+    '''
+    Fingerprints of the parameters sent to trials, used to find tuners proposing the same parameters again.
+    mode: 'reuse' to give the tuner the final result of a finished trial with the same parameters
+        instead of running it again, or 'resample' to always ask the tuner for other parameters.
+        Duplicates of trials still running are resampled in both modes.
+    max_resample: number of times to ask the tuner for other parameters before running a duplicate anyway
+    An entry is dropped when all its trials failed without final result, so failed parameters can be tried again.
+    '''
+    def __init__(self, mode, max_resample=10):
+        if mode not in ('reuse', 'resample'):
+            raise ValueError('Unknown config cache mode {}'.format(mode))
+        self.mode = mode
+        self.max_resample = max_resample
+        self.lookups = 0
+        self.hits = 0
+        self._entries = {}  # key: fingerprint, value: [number of running trials, final result received, final result]
+        self._running = {}  # key: parameter id, value: [fingerprint, trial ended]
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def lookup(self, params):
+        '''Returns the fingerprint of params and whether they were sent before'''
+        key = fingerprint(params)
+        self.lookups += 1
+        hit = key in self._entries
+        if hit:
+            self.hits += 1
+        return key, hit
+
+    def result(self, key):
+        '''Returns (True, final result) if a trial with these parameters reported one, else (False, None)'''
+        entry = self._entries.get(key)
+        if entry is None or not entry[1]:
+            return False, None
+        return True, entry[2]
+
+    def import_result(self, params, value):
+        '''Final result of parameters run in a previous experiment'''
+        entry = self._entries.setdefault(fingerprint(params), [0, False, None])
+        entry[1] = True
+        entry[2] = value
+
+    def add(self, key, parameter_id):
+        entry = self._entries.setdefault(key, [0, False, None])
+        entry[0] += 1
+        self._running[parameter_id] = [key, False]
+
+    def final_received(self, parameter_id, value):
+        item = self._running.get(parameter_id)
+        if item is None:
+            return
+        entry = self._entries.get(item[0])
+        if entry is not None:
+            entry[1] = True
+            entry[2] = value
+        if item[1]:  # the final result came after the end of the trial
+            del self._running[parameter_id]
+
+    def trial_ended(self, parameter_id, succeeded):
+        item = self._running.get(parameter_id)
+        if item is None:
+            return
+        entry = self._entries.get(item[0])
+        if entry is None:
+            del self._running[parameter_id]
+            return
+        entry[0] -= 1
+        if succeeded and not entry[1]:
+            item[1] = True  # NNI manager may send the final result after the end
+            return
+        del self._running[parameter_id]
+        if entry[0] <= 0 and not entry[1] and not succeeded:
+            del self._entries[item[0]]
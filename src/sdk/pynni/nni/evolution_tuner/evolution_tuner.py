@@ -30,12 +30,15 @@ that received from Trial.
 
 import copy
 from enum import Enum, unique
+import logging
 import random
 
 import numpy as np
 
 from nni.tuner import Tuner
-from .. import parameter_expressions
+from nni.search_space import compile_search_space, split_index
+
+logger = logging.getLogger('evolution_AutoML')
 
 
 @unique
@@ -58,89 +61,6 @@ class NodeType(Enum):
     Index = '_index'
 
 
-def json2space(x, oldy=None, name=NodeType.Root.value):
-    '''
-    Change search space from json format to hyperopt format
-    '''
-    y = list()
-    if isinstance(x, dict):
-        if NodeType.Type.value in x.keys():
-            _type = x[NodeType.Type.value]
-            name = name + '-' + _type
-            if _type == 'choice':
-                if oldy != None:
-                    _index = oldy[NodeType.Index.value]
-                    y += json2space(x[NodeType.Value.value][_index],
-                                    oldy[NodeType.Value.value], name=name+'[%d]' % _index)
-                else:
-                    y += json2space(x[NodeType.Value.value], None, name=name)
-            y.append(name)
-        else:
-            for key in x.keys():
-                y += json2space(x[key], (oldy[key] if oldy !=
-                                         None else None), name+"[%s]" % str(key))
-    elif isinstance(x, list):
-        for i, x_i in enumerate(x):
-            y += json2space(x_i, (oldy[i] if oldy !=
-                                  None else None), name+"[%d]" % i)
-    else:
-        pass
-    return y
-
-
-def json2paramater(x, is_rand, random_state, oldy=None, Rand=False, name=NodeType.Root.value):
-    '''
-    Json to pramaters.
-    '''
-    if isinstance(x, dict):
-        if NodeType.Type.value in x.keys():
-            _type = x[NodeType.Type.value]
-            _value = x[NodeType.Value.value]
-            name = name + '-' + _type
-            Rand |= is_rand[name]
-            if Rand is True:
-                if _type == 'choice':
-                    _index = random_state.randint(len(_value))
-                    y = {
-                        NodeType.Index.value: _index,
-                        NodeType.Value.value: json2paramater(x[NodeType.Value.value][_index],
-                                                             is_rand,
-                                                             random_state,
-                                                             None,
-                                                             Rand,
-                                                             name=name+"[%d]" % _index)
-                    }
-                else:
-                    y = eval('parameter_expressions.' +
-                             _type)(*(_value + [random_state]))
-            else:
-                y = copy.deepcopy(oldy)
-        else:
-            y = dict()
-            for key in x.keys():
-                y[key] = json2paramater(x[key], is_rand, random_state, oldy[key]
-                                        if oldy != None else None, Rand, name + "[%s]" % str(key))
-    elif isinstance(x, list):
-        y = list()
-        for i, x_i in enumerate(x):
-            y.append(json2paramater(x_i, is_rand, random_state, oldy[i]
-                                    if oldy != None else None, Rand, name + "[%d]" % i))
-    else:
-        y = copy.deepcopy(x)
-    return y
-
-
-def _split_index(params):
-    result = {}
-    for key in params:
-        if isinstance(params[key], dict):
-            value = params[key]['_value']
-        else:
-            value = params[key]
-        result[key] = value
-    return result
-
-
 class Individual(object):
     '''
     Indicidual class to store the indv info.
@@ -177,7 +97,7 @@ class EvolutionTuner(Tuner):
         self.total_data = {}
         self.random_state = None
         self.population = None
-        self.space = None
+        self.plan = None
 
     def update_search_space(self, search_space):
         '''
@@ -185,17 +105,34 @@ class EvolutionTuner(Tuner):
         search_space: search_space the json file that user pre-defined.
         '''
         self.searchspace_json = search_space
-        self.space = json2space(self.searchspace_json)
+        self.plan = compile_search_space(self.searchspace_json)
 
         self.random_state = np.random.RandomState()
-        self.population = []
-        is_rand = dict()
-        for item in self.space:
-            is_rand[item] = True
-        for _ in range(self.population_size):
-            config = json2paramater(
-                self.searchspace_json, is_rand, self.random_state)
-            self.population.append(Individual(config=config))
+        self.population = [Individual(config=config) for config in
+                           self.plan.sample(self.population_size, self.random_state, with_index=True)]
+
+    def import_data(self, data):
+        '''
+        Add the trials of a previous experiment to the population,
+        the best of them take the place of random individuals of the initial population
+        data: list of dict {'parameter': parameters of a trial, 'value': its final result}
+        '''
+        imported = []
+        for trial in data:
+            config = self.plan.add_index(trial['parameter'])
+            if config is None:
+                logger.debug('Imported parameters %s are not in search space, skipped', trial['parameter'])
+                continue
+            reward = self.extract_scalar_reward(trial['value'])
+            if self.optimize_mode == OptimizeMode.Minimize:
+                reward = -reward
+            imported.append(Individual(config=config, result=reward))
+        logger.info('Imported %d of %d trials', len(imported), len(data))
+        imported.sort(key=lambda indiv: indiv.result, reverse=True)
+        imported = imported[:self.population_size]
+        unevaluated = [indiv for indiv in self.population if indiv.result is None]
+        evaluated = [indiv for indiv in self.population if indiv.result is not None]
+        self.population = evaluated + imported + unevaluated[len(imported):]
 
     def generate_parameters(self, parameter_id):
         """Returns a set of trial (hyper-)parameters, as a serializable object.
@@ -217,21 +154,16 @@ class EvolutionTuner(Tuner):
             if self.population[0].result < self.population[1].result:
                 self.population[0] = self.population[1]
 
-            # mutation
-            space = json2space(self.searchspace_json,
-                               self.population[0].config)
-            is_rand = dict()
+            # mutation: sample again one of the dimensions used by the config, and those nested in it
+            space = list(self.plan.encode(self.population[0].config))
             mutation_pos = space[random.randint(0, len(space)-1)]
-            for i in range(len(self.space)):
-                is_rand[self.space[i]] = (self.space[i] == mutation_pos)
-            config = json2paramater(
-                self.searchspace_json, is_rand, self.random_state, self.population[0].config)
+            config = self.plan.resample(self.population[0].config, [mutation_pos], self.random_state)
             self.population.pop(1)
             # remove "_index" from config and save params-id
 
             total_config = config
         self.total_data[parameter_id] = total_config
-        config = _split_index(total_config)
+        config = split_index(total_config)
         return config
 
     def receive_trial_result(self, parameter_id, parameters, value):
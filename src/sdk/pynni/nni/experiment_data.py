@@ -0,0 +1,98 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+'''
+experiment_data.py
+
+Final results of the trials of a previous experiment, used to warm-start tuners.
+They are read from the database of the experiment (nni.sqlite in its db directory)
+or from a JSON file as written by export_trial_results:
+    [{"parameter": {"x": 1}, "value": 0.93}, ...]
+'''
+
+import json
+import logging
+
+from . import codec
+
+_logger = logging.getLogger(__name__)
+
+_sqlite_header = b'SQLite format 3\x00'
+
+
+def _decode_metric(data):
+    # NNI manager stores the string reported by the trial as a JSON string
+    value = json.loads(data)
+    if isinstance(value, str):
+        value = codec.loads(value)
+    return value
+
+
+def read_database(db_path):
+    '''
+    Returns the final results of the trials in an experiment database,
+    as a list of {'parameter': parameters, 'value': final result}
+    '''
+    import sqlite3
+    connection = sqlite3.connect('file:{}?mode=ro'.format(db_path), uri=True)
+    try:
+        parameters = {}
+        for (data,) in connection.execute('select data from TrialJobEvent where data is not null'):
+            try:
+                hyper_params = codec.loads(data)
+                parameters[str(hyper_params['parameter_id'])] = hyper_params['parameters']
+            except (ValueError, TypeError, KeyError):
+                continue  # e.g. events without hyper-parameters
+        results = []
+        for parameter_id, data in connection.execute(
+                "select parameterId, data from MetricData where type='FINAL' order by timestamp"):
+            if str(parameter_id) not in parameters:
+                _logger.warning('Parameters of final result %s not found in %s', parameter_id, db_path)
+                continue
+            results.append({'parameter': parameters[str(parameter_id)], 'value': _decode_metric(data)})
+        return results
+    finally:
+        connection.close()
+
+
+def load_trial_results(path):
+    '''
+    Returns the final results in an experiment database or exported JSON file,
+    as a list of {'parameter': parameters, 'value': final result}
+    '''
+    with open(path, 'rb') as file:
+        is_database = file.read(len(_sqlite_header)) == _sqlite_header
+    if is_database:
+        results = read_database(path)
+    else:
+        with open(path) as file:
+            results = codec.loads(file.read())
+        if not isinstance(results, list) or \
+                not all(isinstance(item, dict) and 'parameter' in item and 'value' in item for item in results):
+            raise ValueError('{} is not a list of {{"parameter": ..., "value": ...}}'.format(path))
+    _logger.info('Loaded %d trial results from %s', len(results), path)
+    return results
+
+
+def export_trial_results(db_path, path):
+    '''Write the final results in an experiment database to a JSON file, returns the number of results'''
+    results = read_database(db_path)
+    with open(path, 'w') as file:
+        file.write(codec.dumps(results))
+    return len(results)
@@ -23,15 +23,15 @@ hyperband_tuner.py
 
 from enum import Enum, unique
 import math
-import copy
 import logging
 import numpy as np
-import json_tricks
 
-from nni.protocol import CommandType, send
+from nni.protocol import CommandType, send, send_batch, initialized_payload
 from nni.msg_dispatcher_base import MsgDispatcherBase
 from nni.common import init_logger
-from .. import parameter_expressions
+from nni import codec
+from nni.metric_store import metric_store
+from nni.search_space import compile_search_space
 
 _logger = logging.getLogger(__name__)
 
@@ -65,34 +65,6 @@ def create_bracket_parameter_id(brackets_id, brackets_curr_decay, increased_id=-
                           increased_id])
     return params_id
 
-def json2paramater(ss_spec, random_state):
-    '''
-    Randomly generate values for hyperparameters from hyperparameter space i.e., x.
-    ss_spec: hyperparameter space
-    random_state: random operator to generate random values
-    '''
-    if isinstance(ss_spec, dict):
-        if '_type' in ss_spec.keys():
-            _type = ss_spec['_type']
-            _value = ss_spec['_value']
-            if _type == 'choice':
-                _index = random_state.randint(len(_value))
-                chosen_params = json2paramater(ss_spec['_value'][_index], random_state)
-            else:
-                chosen_params = eval('parameter_expressions.' + # pylint: disable=eval-used
-                                     _type)(*(_value + [random_state]))
-        else:
-            chosen_params = dict()
-            for key in ss_spec.keys():
-                chosen_params[key] = json2paramater(ss_spec[key], random_state)
-    elif isinstance(ss_spec, list):
-        chosen_params = list()
-        for _, subspec in enumerate(ss_spec):
-            chosen_params.append(json2paramater(subspec, random_state))
-    else:
-        chosen_params = copy.deepcopy(ss_spec)
-    return chosen_params
-
 class Bracket():
     '''
     A bracket in Hyperband, all the information of a bracket is managed by an instance of this class
@@ -104,8 +76,7 @@ class Bracket():
         self.n = math.ceil((s_max + 1) * (eta**s) / (s + 1)) # pylint: disable=invalid-name
         self.r = math.ceil(R / eta**s)                       # pylint: disable=invalid-name
         self.i = 0
-        self.hyper_configs = []         # [ {id: params}, {}, ... ]
-        self.configs_perf = []          # [ {id: [seq, acc]}, {}, ... ]
+        self.hyper_configs = []         # [ {id: params}, {}, ... ], results are in nni.metric_store
         self.num_configs_to_run = []    # [ n, n, n, ... ]
         self.num_finished_configs = []  # [ n, n, n, ... ]
         self.optimize_mode = optimize_mode
@@ -131,28 +102,6 @@ class Bracket():
         if self.i > self.bracket_id:
             self.no_more_trial = True
 
-    def set_config_perf(self, i, parameter_id, seq, value):
-        '''
-        update trial's latest result with its sequence number, e.g., epoch number or batch number
-        i: the ith round
-        parameter_id: the id of the trial/parameter
-        seq: sequence number, e.g., epoch number or batch number
-        value: latest result with sequence number seq
-        '''
-        if parameter_id in self.configs_perf[i]:
-            # this should always be true if there is no retry in training service
-            _logger.debug('assertion: %d %d, %s %s\n',
-                          self.configs_perf[i][parameter_id][0],
-                          seq,
-                          str(type(self.configs_perf[i][parameter_id][0])),
-                          str(type(seq)))
-            # assert self.configs_perf[i][parameter_id][0] < seq
-            if self.configs_perf[i][parameter_id][0] < seq:
-                self.configs_perf[i][parameter_id] = [seq, value]
-        else:
-            self.configs_perf[i][parameter_id] = [seq, value]
-            
-
     def inform_trial_end(self, i):
         '''
         If the trial is finished and the corresponding round (i.e., i) has all its trials finished,
@@ -165,17 +114,21 @@ class Bracket():
             and self.no_more_trial is False:
             # choose candidate configs from finished configs to run in the next round
             assert self.i == i + 1
-            this_round_perf = self.configs_perf[i]
-            if self.optimize_mode is OptimizeMode.Maximize:
-                sorted_perf = sorted(this_round_perf.items(), key=lambda kv: kv[1][1], reverse=True) # reverse
-            else:
-                sorted_perf = sorted(this_round_perf.items(), key=lambda kv: kv[1][1])
-            _logger.debug('bracket %s next round %s, sorted hyper configs: %s', self.bracket_id, self.i, sorted_perf)
+            # the latest intermediate results of the configs of this round which reported any
+            params_ids = [params_id for params_id in self.hyper_configs[i]
+                          if metric_store.row_of_parameter(params_id) is not None]
+            latest = metric_store.latest([metric_store.row_of_parameter(params_id) for params_id in params_ids])
+            has_result = ~np.isnan(latest)
+            params_ids = [params_id for params_id, valid in zip(params_ids, has_result) if valid]
+            latest = latest[has_result]
+            order = np.argsort(-latest if self.optimize_mode is OptimizeMode.Maximize else latest, kind='stable')
+            sorted_ids = [params_ids[k] for k in order]
+            _logger.debug('bracket %s next round %s, sorted hyper configs: %s', self.bracket_id, self.i, sorted_ids)
             next_n, next_r = self.get_n_r()
             _logger.debug('bracket %s next round %s, next_n=%d, next_r=%d', self.bracket_id, self.i, next_n, next_r)
             hyper_configs = dict()
             for k in range(next_n):
-                params_id = sorted_perf[k][0]
+                params_id = sorted_ids[k]
                 params = self.hyper_configs[i][params_id]
                 params[_KEY] = next_r # modify r
                 # generate new id
@@ -186,17 +139,17 @@ class Bracket():
             return [[key, value] for key, value in hyper_configs.items()]
         return None
 
-    def get_hyperparameter_configurations(self, num, r, searchspace_json, random_state): # pylint: disable=invalid-name
+    def get_hyperparameter_configurations(self, num, r, search_space_plan, random_state): # pylint: disable=invalid-name
         '''
         Randomly generate num hyperparameter configurations from search space
         num: the number of hyperparameter configurations
+        search_space_plan: the compiled search space, see nni.search_space
         '''
         global _KEY # pylint: disable=global-statement
         assert self.i == 0
         hyperparameter_configs = dict()
-        for _ in range(num):
+        for params in search_space_plan.sample(num, random_state):
             params_id = create_bracket_parameter_id(self.bracket_id, self.i)
-            params = json2paramater(searchspace_json, random_state)
             params[_KEY] = r
             hyperparameter_configs[params_id] = params
         self._record_hyper_configs(hyperparameter_configs)
@@ -209,7 +162,6 @@ class Bracket():
         in this round to be 0, and increase the round number.
         '''
         self.hyper_configs.append(hyper_configs)
-        self.configs_perf.append(dict())
         self.num_finished_configs.append(0)
         self.num_configs_to_run.append(len(hyper_configs))
         self.increase_i()
@@ -238,8 +190,11 @@ class Hyperband(MsgDispatcherBase):
         self.curr_s = self.s_max
 
         self.searchspace_json = None
+        self.search_space_plan = None
         self.random_state = None
         self.optimize_mode = OptimizeMode(optimize_mode)
+        # the latest intermediate results of failed trials rank their configs too
+        metric_store.enable(keep_failed=True)
 
         # This is for the case that nnimanager requests trial config, but tuner cannot provide immediately.
         # In this case, tuner increases self.credit to issue a trial config sometime later.
@@ -248,7 +203,7 @@ class Hyperband(MsgDispatcherBase):
     def load_checkpoint(self):
         pass
 
-    def save_checkpont(self):
+    def save_checkpoint(self):
         pass
 
     def handle_initialize(self, data):
@@ -256,40 +211,48 @@ class Hyperband(MsgDispatcherBase):
         data is search space
         '''
         self.handle_update_search_space(data)
-        send(CommandType.Initialized, '')
+        send(CommandType.Initialized, initialized_payload())
         return True
 
     def handle_request_trial_jobs(self, data):
         '''
         data: number of trial jobs
         '''
+        trial_jobs = []
         for _ in range(data):
-            self._request_one_trial_job()
+            trial_job = self._request_one_trial_job()
+            if trial_job is None:
+                break
+            trial_jobs.append(trial_job)
+        send_batch(CommandType.NewTrialJob, trial_jobs)
+
+        if len(trial_jobs) < data:
+            # have tried all configurations
+            ret = {
+                'parameter_id': '-1_0_0',
+                'parameter_source': 'algorithm',
+                'parameters': ''
+            }
+            send(CommandType.NoMoreTrialJobs, codec.dumps(ret))
+            self.credit += data - len(trial_jobs)
 
         return True
 
     def _request_one_trial_job(self):
         '''
         get one trial job, i.e., one hyperparameter configuration.
+        returns the packed trial job, or None if all configurations have been tried.
         '''
         if not self.generated_hyper_configs:
             if self.curr_s < 0:
-                # have tried all configurations
-                ret = {
-                    'parameter_id': '-1_0_0',
-                    'parameter_source': 'algorithm',
-                    'parameters': ''
-                }
-                send(CommandType.NoMoreTrialJobs, json_tricks.dumps(ret))
-                self.credit += 1
-                return True
+                return None
             _logger.debug('create a new bracket, self.curr_s=%d', self.curr_s)
             self.brackets[self.curr_s] = Bracket(self.curr_s, self.s_max, self.eta, self.R, self.optimize_mode)
             next_n, next_r = self.brackets[self.curr_s].get_n_r()
             _logger.debug('new bracket, next_n=%d, next_r=%d', next_n, next_r)
-            assert self.searchspace_json is not None and self.random_state is not None
+            assert self.search_space_plan is not None and self.random_state is not None
             generated_hyper_configs = self.brackets[self.curr_s].get_hyperparameter_configurations(next_n, next_r,
-                                                                                                   self.searchspace_json,
+                                                                                                   self.search_space_plan,
                                                                                                    self.random_state)
             self.generated_hyper_configs = generated_hyper_configs.copy()
             self.curr_s -= 1
@@ -301,15 +264,14 @@ class Hyperband(MsgDispatcherBase):
             'parameter_source': 'algorithm',
             'parameters': params[1]
         }
-        send(CommandType.NewTrialJob, json_tricks.dumps(ret))
-
-        return True
+        return codec.dumps(ret)
 
     def handle_update_search_space(self, data):
         '''
         data: JSON object, which is search space
         '''
         self.searchspace_json = data
+        self.search_space_plan = compile_search_space(data)
         self.random_state = np.random.RandomState()
 
         return True
@@ -321,12 +283,14 @@ class Hyperband(MsgDispatcherBase):
             event: the job's state
             hyper_params: the hyperparameters (a string) generated and returned by tuner
         '''
-        hyper_params = json_tricks.loads(data['hyper_params'])
+        metric_store.trial_ended(data['trial_job_id'], data['event'] == 'SUCCEEDED')
+        hyper_params = codec.loads(data['hyper_params'])
         bracket_id, i, _ = hyper_params['parameter_id'].split('_')
         hyper_configs = self.brackets[int(bracket_id)].inform_trial_end(int(i))
         if hyper_configs is not None:
             _logger.debug('bracket %s next round %s, hyper_configs: %s', bracket_id, i, hyper_configs)
             self.generated_hyper_configs = self.generated_hyper_configs + hyper_configs
+            trial_jobs = []
             for _ in range(self.credit):
                 if not self.generated_hyper_configs:
                     break
@@ -336,8 +300,9 @@ class Hyperband(MsgDispatcherBase):
                     'parameter_source': 'algorithm',
                     'parameters': params[1]
                 }
-                send(CommandType.NewTrialJob, json_tricks.dumps(ret))
+                trial_jobs.append(codec.dumps(ret))
                 self.credit -= 1
+            send_batch(CommandType.NewTrialJob, trial_jobs)
 
         return True
 
@@ -346,11 +311,10 @@ class Hyperband(MsgDispatcherBase):
         data: it is an object which has keys 'parameter_id', 'value', 'trial_job_id', 'type', 'sequence'.
         '''
         if data['type'] == 'FINAL':
+            metric_store.record_final(data['parameter_id'], data['value'], data['trial_job_id'])
             self.completed_hyper_configs.append(data)
         elif data['type'] == 'PERIODICAL':
-            bracket_id, i, _ = data['parameter_id'].split('_')
-            bracket_id = int(bracket_id)
-            self.brackets[bracket_id].set_config_perf(int(i), data['parameter_id'], data['sequence'], data['value'])
+            metric_store.record(data['trial_job_id'], data['sequence'], data['value'], data['parameter_id'])
         else:
             raise ValueError('Data type not supported: {}'.format(data['type']))
 
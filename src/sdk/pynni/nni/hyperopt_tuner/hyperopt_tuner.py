@@ -29,6 +29,7 @@ import numpy as np
 
 import hyperopt as hp
 from nni.tuner import Tuner
+from nni.search_space import compile_search_space, split_index
 
 logger = logging.getLogger('hyperopt_AutoML')
 
@@ -77,72 +78,6 @@ def json2space(in_x, name=ROOT):
     return out_y
 
 
-def json2parameter(in_x, parameter, name=ROOT):
-    '''
-    Change json to parameters.
-    '''
-    out_y = copy.deepcopy(in_x)
-    if isinstance(in_x, dict):
-        if TYPE in in_x.keys():
-            _type = in_x[TYPE]
-            name = name + '-' + _type
-            if _type == 'choice':
-                _index = parameter[name]
-                out_y = {
-                    INDEX: _index,
-                    VALUE: json2parameter(in_x[VALUE][_index], parameter, name=name+'[%d]' % _index)
-                }
-            else:
-                out_y = parameter[name]
-        else:
-            out_y = dict()
-            for key in in_x.keys():
-                out_y[key] = json2parameter(
-                    in_x[key], parameter, name + '[%s]' % str(key))
-    elif isinstance(in_x, list):
-        out_y = list()
-        for i, x_i in enumerate(in_x):
-            out_y.append(json2parameter(x_i, parameter, name + '[%d]' % i))
-    else:
-        logger.info('in_x is not a dict or a list in json2space fuinction %s', str(in_x))
-    return out_y
-
-
-def json2vals(in_x, vals, out_y, name=ROOT):
-    if isinstance(in_x, dict):
-        if TYPE in in_x.keys():
-            _type = in_x[TYPE]
-            name = name + '-' + _type
-
-            try:
-                out_y[name] = vals[INDEX]
-            # TODO - catch exact Exception
-            except Exception:
-                out_y[name] = vals
-
-            if _type == 'choice':
-                _index = vals[INDEX]
-                json2vals(in_x[VALUE][_index], vals[VALUE],
-                          out_y, name=name + '[%d]' % _index)
-        else:
-            for key in in_x.keys():
-                json2vals(in_x[key], vals[key], out_y, name + '[%s]' % str(key))
-    elif isinstance(in_x, list):
-        for i, temp in enumerate(in_x):
-            json2vals(temp, vals[i], out_y, name + '[%d]' % i)
-
-
-def _split_index(params):
-    result = {}
-    for key in params:
-        if isinstance(params[key], dict):
-            value = params[key][VALUE]
-        else:
-            value = params[key]
-        result[key] = value
-    return result
-
-
 class HyperoptTuner(Tuner):
     '''
     HyperoptTuner is a tuner which using hyperopt algorithm.
@@ -152,6 +87,7 @@ class HyperoptTuner(Tuner):
         self.algorithm_name = algorithm_name
         self.optimize_mode = OptimizeMode(optimize_mode)
         self.json = None
+        self.plan = None
         self.total_data = {}
         self.rval = None
 
@@ -171,6 +107,7 @@ class HyperoptTuner(Tuner):
         #assert self.json is None
 
         self.json = search_space
+        self.plan = compile_search_space(self.json)
         search_space_instance = json2space(self.json)
         rstate = np.random.RandomState()
         trials = hp.Trials()
@@ -202,10 +139,10 @@ class HyperoptTuner(Tuner):
             except Exception:
                 parameter[key] = None
 
-        # remove '_index' from json2parameter and save params-id
-        total_params = json2parameter(self.json, parameter)
+        # remove '_index' from the params and save params-id
+        total_params = self.plan.decode_values(parameter, with_index=True)
         self.total_data[parameter_id] = total_params
-        params = _split_index(total_params)
+        params = split_index(total_params)
         return params
 
     def receive_trial_result(self, parameter_id, parameters, value):
@@ -215,49 +152,80 @@ class HyperoptTuner(Tuner):
         parameters : dict of parameters
         value: final metrics of the trial, including reward
         '''
-        reward = self.extract_scalar_reward(value)
-        # restore the paramsters contains '_index'
-        if parameter_id not in self.total_data:
-            raise RuntimeError('Received parameter_id not in total_data.')
-        params = self.total_data[parameter_id]
-
-        if self.optimize_mode is OptimizeMode.Maximize:
-            reward = -reward
+        self.receive_trial_results([(parameter_id, parameters, value)])
 
+    def receive_trial_results(self, results):
+        '''
+        Record the observations of several trials. They are only read by the algorithm
+        when hyperopt trials are refreshed in the next generate_parameters.
+        results: list of tuple (parameter_id, parameters, value)
+        '''
+        trials = []
+        for parameter_id, _, value in results:
+            reward = self.extract_scalar_reward(value)
+            # restore the paramsters contains '_index'
+            if parameter_id not in self.total_data:
+                raise RuntimeError('Received parameter_id not in total_data.')
+            if self.optimize_mode is OptimizeMode.Maximize:
+                reward = -reward
+            trials.append((self.total_data[parameter_id], reward))
+        self._add_trials(trials)
+
+    def import_data(self, data):
+        '''
+        Add the trials of a previous experiment to the history of hyperopt
+        data: list of dict {'parameter': parameters of a trial, 'value': its final result}
+        '''
+        imported = []
+        for trial in data:
+            params = self.plan.add_index(trial['parameter'])
+            if params is None:
+                logger.debug('Imported parameters %s are not in search space, skipped', trial['parameter'])
+                continue
+            reward = self.extract_scalar_reward(trial['value'])
+            if self.optimize_mode is OptimizeMode.Maximize:
+                reward = -reward
+            imported.append((params, reward))
+        self._add_trials(imported)
+        logger.info('Imported %d of %d trials', len(imported), len(data))
+
+    def _add_trials(self, finished):
+        '''
+        Insert finished trials into hyperopt trials, without refreshing them
+        finished: list of tuple (parameters with '_index' of choices, the loss hyperopt minimizes)
+        '''
+        if not finished:
+            return
         rval = self.rval
         domain = rval.domain
         trials = rval.trials
 
-        new_id = len(trials)
-
-        rval_specs = [None]
-        rval_results = [domain.new_result()]
-        rval_miscs = [dict(tid=new_id, cmd=domain.cmd, workdir=domain.workdir)]
-
-        vals = params
-        idxs = dict()
-
-        out_y = dict()
-        json2vals(self.json, vals, out_y)
-        vals = out_y
-        for key in domain.params:
-            if key in [VALUE, INDEX]:
-                continue
-            if key not in vals or vals[key] is None or vals[key] == []:
-                idxs[key] = vals[key] = []
-            else:
-                idxs[key] = [new_id]
-                vals[key] = [vals[key]]
-
-        self.miscs_update_idxs_vals(rval_miscs, idxs, vals,
-                                    idxs_map={new_id: new_id},
-                                    assert_all_vals_used=False)
-
-        trial = trials.new_trial_docs([new_id], rval_specs, rval_results, rval_miscs)[0]
-        trial['result'] = {'loss': reward, 'status': 'ok'}
-        trial['state'] = hp.JOB_STATE_DONE
-        trials.insert_trial_docs([trial])
-        trials.refresh()
+        docs = []
+        for new_id, (params, reward) in zip(trials.new_trial_ids(len(finished)), finished):
+            rval_specs = [None]
+            rval_results = [domain.new_result()]
+            rval_miscs = [dict(tid=new_id, cmd=domain.cmd, workdir=domain.workdir)]
+
+            idxs = dict()
+            vals = self.plan.encode(params)
+            for key in domain.params:
+                if key in [VALUE, INDEX]:
+                    continue
+                if key not in vals or vals[key] is None or vals[key] == []:
+                    idxs[key] = vals[key] = []
+                else:
+                    idxs[key] = [new_id]
+                    vals[key] = [vals[key]]
+
+            self.miscs_update_idxs_vals(rval_miscs, idxs, vals,
+                                        idxs_map={new_id: new_id},
+                                        assert_all_vals_used=False)
+
+            trial = trials.new_trial_docs([new_id], rval_specs, rval_results, rval_miscs)[0]
+            trial['result'] = {'loss': reward, 'status': 'ok'}
+            trial['state'] = hp.JOB_STATE_DONE
+            docs.append(trial)
+        trials.insert_trial_docs(docs)
 
     def miscs_update_idxs_vals(self, miscs, idxs, vals,
                                assert_all_vals_used=True,
@@ -0,0 +1,149 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+journal.py
+'''
+
+import glob
+import logging
+import os
+import pickle
+import struct
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+_record = struct.Struct('!2sBI')
+_inbound = 0
+_outbound = 1
+_superseded = 2  # inbound, handled by handle_superseded()
+
+_snapshot_file = 'dispatcher_snapshot.pkl'
+_journal_prefix = 'dispatcher_journal.'
+
+
+class CommandJournal:
+    '''
+    Write-ahead journal of the commands handled by the dispatcher, kept in the checkpoint directory.
+    Incoming commands are appended in the order they are handled, which may differ from the order they arrive.
+    Every record is 2 bytes command type, 1 byte direction, 4 bytes big-endian payload length and the payload.
+    Records are flushed to OS on append, and fsync-ed at most once per sync_interval seconds.
+    A snapshot pickles the dispatcher state and starts a new journal file, so that resuming only replays
+    the commands after the latest snapshot. An incomplete record at the end of a journal, left by a crash, is ignored.
+    '''
+    def __init__(self, directory, sync_interval=1.0):
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self.records = 0  # records appended since the latest snapshot
+        self._file = None
+        self._lock = threading.Lock()  # handlers may send commands from several threads
+        self._generation = None  # journal file following the latest snapshot
+        self._last_sync = time.time()
+
+    def _journal_path(self, generation):
+        return os.path.join(self.directory, _journal_prefix + str(generation))
+
+    def load_snapshot(self):
+        '''Returns the state saved by the latest save_snapshot(), or None'''
+        path = os.path.join(self.directory, _snapshot_file)
+        if not os.path.exists(path):
+            self._generation = 0
+            return None
+        with open(path, 'rb') as snapshot_file:
+            self._generation, state = pickle.load(snapshot_file)
+        return state
+
+    def replay(self):
+        '''Yields (command, data, inbound, superseded) of the records after the latest snapshot'''
+        if self._generation is None:
+            self.load_snapshot()
+        path = self._journal_path(self._generation)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as journal_file:
+            while True:
+                header = journal_file.read(_record.size)
+                if len(header) < _record.size:
+                    break
+                command, direction, length = _record.unpack(header)
+                data = journal_file.read(length)
+                if len(data) < length:
+                    break
+                yield command, data.decode('utf8'), direction != _outbound, direction == _superseded
+
+    def open(self, resume):
+        '''Start appending records, or start from scratch if not resuming'''
+        if not resume:
+            for path in glob.glob(os.path.join(self.directory, _journal_prefix + '*')):
+                os.remove(path)
+            if os.path.exists(os.path.join(self.directory, _snapshot_file)):
+                os.remove(os.path.join(self.directory, _snapshot_file))
+            self._generation = 0
+        valid_length = sum(_record.size + len(data.encode('utf8')) for _, data, _, _ in self.replay())
+        self._file = open(self._journal_path(self._generation), 'ab')
+        self._file.truncate(valid_length)
+
+    def append(self, command, data, inbound=True, superseded=False):
+        '''
+        command: CommandType object.
+        data: string payload.
+        superseded: the incoming command is handled by handle_superseded()
+        '''
+        data = data.encode('utf8')
+        direction = (_superseded if superseded else _inbound) if inbound else _outbound
+        with self._lock:
+            self._file.write(_record.pack(command.value, direction, len(data)) + data)
+            self._file.flush()
+            self.records += 1
+            if time.time() - self._last_sync >= self.sync_interval:
+                self.sync()
+
+    def sync(self):
+        os.fsync(self._file.fileno())
+        self._last_sync = time.time()
+
+    def save_snapshot(self, state):
+        '''
+        Save the dispatcher state covering all appended records, and continue with an empty journal.
+        The snapshot is replaced atomically, and the old journal is only removed afterwards,
+        so a crash in between leaves either the old or the new snapshot with its journal.
+        '''
+        generation = self._generation
+        data = pickle.dumps((generation + 1, state), pickle.HIGHEST_PROTOCOL)
+        self.sync()
+        self._file.close()
+        self._file = open(self._journal_path(generation + 1), 'wb')
+        path = os.path.join(self.directory, _snapshot_file)
+        with open(path + '.tmp', 'wb') as snapshot_file:
+            snapshot_file.write(data)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(path + '.tmp', path)
+        os.remove(self._journal_path(generation))
+        self._generation = generation + 1
+        self.records = 0
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
@@ -16,7 +16,11 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import logging
+import warnings
+import numpy as np
+
 from nni.assessor import Assessor, AssessResult
+from nni.metric_store import metric_store, column_quantile, SUCCEEDED
 
 logger = logging.getLogger('medianstop_Assessor')
 
@@ -25,11 +29,13 @@ class MedianstopAssessor(Assessor):
     MedianstopAssessor is The median stopping rule stops a pending trial X at step S 
     if the trial’s best objective value by step S is strictly worse than the median value 
     of the running averages of all completed trials’ objectives reported up to step S
+    The histories of completed trials are read from nni.metric_store.
     '''
     def __init__(self, optimize_mode='maximize', start_step=0):
         self.start_step = start_step
-        self.running_history = dict()
-        self.completed_avg_history = dict()
+        metric_store.enable()
+        self._completed_medians = None
+        self._completed_version = None
         if optimize_mode == 'maximize':
             self.high_better = True
         elif optimize_mode == 'minimize':
@@ -38,27 +44,17 @@ class MedianstopAssessor(Assessor):
             self.high_better = True
             logger.warning('unrecognized optimize_mode', optimize_mode)
 
-    def _update_data(self, trial_job_id, trial_history):
-        if trial_job_id not in self.running_history:
-            self.running_history[trial_job_id] = []
-        self.running_history[trial_job_id].extend(trial_history[len(self.running_history[trial_job_id]):])
-
-    def trial_end(self, trial_job_id, success):
+    def _medians(self):
         '''
-        trial_end
+        median of the running averages of completed trials at each step, NaN where no completed trial is that long,
+        cached until another trial ends
         '''
-        if trial_job_id in self.running_history:
-            if success:
-                cnt = 0
-                history_sum = 0
-                self.completed_avg_history[trial_job_id] = []
-                for each in self.running_history[trial_job_id]:
-                    cnt += 1
-                    history_sum += each
-                    self.completed_avg_history[trial_job_id].append(history_sum / cnt)
-            self.running_history.pop(trial_job_id)
-        else:
-            logger.warning('trial_end: trial_job_id does not in running_history')
+        if self._completed_version != metric_store.version:
+            averages = metric_store.running_mean(metric_store.rows(SUCCEEDED))
+            # the lower median when maximizing and the upper one when minimizing
+            self._completed_medians = column_quantile(averages, 0.5, 'lower' if self.high_better else 'higher')
+            self._completed_version = metric_store.version
+        return self._completed_medians
 
     def assess_trial(self, trial_job_id, trial_history):
         '''
@@ -73,27 +69,29 @@ class MedianstopAssessor(Assessor):
         except (TypeError, ValueError) as error:
             logger.warning('incorrect data type or value:')
             logger.exception(error)
-        except Exception as error:
-            logger.warning('unrecognized exception:')
-            logger.excpetion(error)
+            return AssessResult.Good
 
-        self._update_data(trial_job_id, num_trial_history)
+        medians = self._medians()
+        if curr_step > len(medians) or np.isnan(medians[curr_step - 1]):
+            return AssessResult.Good
+        median = medians[curr_step - 1]
         if self.high_better:
-            best_history = max(trial_history)
-        else:
-            best_history = min(trial_history)
+            return AssessResult.Bad if max(num_trial_history) < median else AssessResult.Good
+        return AssessResult.Bad if min(num_trial_history) > median else AssessResult.Good
 
-        avg_array = []
-        for id in self.completed_avg_history:
-            if len(self.completed_avg_history[id]) >= curr_step:
-                avg_array.append(self.completed_avg_history[id][curr_step - 1])
-        if len(avg_array) > 0:
-            avg_array.sort()
+    def assess_trials(self, batch):
+        '''
+        assess_trials, deciding for all trials of the batch with array operations
+        '''
+        values, lengths = batch.arrays()
+        medians = self._medians()
+        # compared with NaN, which is also the median of steps no completed trial reached, the trial is good
+        step_medians = np.append(medians, np.nan)[np.minimum(lengths - 1, len(medians))]
+        with warnings.catch_warnings():
+            # the rows of histories that are not numbers are all NaN, and the trials are good like in assess_trial
+            warnings.simplefilter('ignore', RuntimeWarning)
             if self.high_better:
-                median = avg_array[(len(avg_array)-1) // 2]
-                return AssessResult.Bad if best_history < median else AssessResult.Good
+                bad = np.nanmax(values, axis=1) < step_medians
             else:
-                median = avg_array[len(avg_array) // 2]
-                return AssessResult.Bad if best_history > median else AssessResult.Good
-        else:
-            return AssessResult.Good
+                bad = np.nanmin(values, axis=1) > step_medians
+        return ~(bad & (lengths >= self.start_step))
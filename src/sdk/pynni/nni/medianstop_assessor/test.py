@@ -21,6 +21,7 @@ import random
 
 from .medianstop_assessor import MedianstopAssessor
 from nni.assessor import AssessResult
+from nni.metric_store import metric_store
 
 
 logger = logging.getLogger('nni.contrib.medianstop_assessor')
@@ -53,13 +54,17 @@ def test():
         for k in range(10):
             #d = random.randint(i*100+0, i*100+100)
             #lc.append(d)
+            # the dispatcher records the results before assessing
+            metric_store.record_history(i, lcs[i][:k+1])
             ret = assessor.assess_trial(i, lcs[i][:k+1])
             print('result: %d', ret)
             if ret == AssessResult.Bad:
+                metric_store.trial_ended(i, False)
                 assessor.trial_end(i, False)
                 to_complete = False
                 break
         if to_complete:
+            metric_store.trial_ended(i, True)
             assessor.trial_end(i, True)
 
 try:
@@ -0,0 +1,376 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+metric_store.py
+
+Columnar store of the metrics of all trials, owned by the dispatcher and read by tuners and assessors.
+'''
+
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+RUNNING = 0
+SUCCEEDED = 1
+FAILED = 2
+'''Status of a trial in MetricStore.status'''
+
+_initial_rows = 64
+_initial_steps = 16
+
+
+def _to_float(value):
+    '''Metrics are numbers, or dicts with the number under key 'default'; others are recorded as NaN'''
+    if isinstance(value, dict):
+        value = value.get('default')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        _logger.warning('Metric %r is not a number, recorded as NaN', value)
+        return float('nan')
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+def column_quantile(matrix, q, method='linear'):
+    '''
+    Quantile of every column of a matrix, ignoring NaN. Columns without any number get NaN.
+    method: 'linear' interpolates between the two nearest values, 'lower' and 'higher' take one of them.
+    '''
+    import numpy as np
+    matrix = np.sort(matrix, axis=0)  # NaN goes last
+    counts = np.count_nonzero(~np.isnan(matrix), axis=0)
+    position = q * np.maximum(counts - 1, 0)
+    lower = np.floor(position).astype(np.int64)
+    higher = np.ceil(position).astype(np.int64)
+    columns = np.arange(matrix.shape[1])
+    if method == 'lower':
+        result = matrix[lower, columns] if len(matrix) else np.full(len(columns), np.nan)
+    elif method == 'higher':
+        result = matrix[higher, columns] if len(matrix) else np.full(len(columns), np.nan)
+    elif method == 'linear':
+        if not len(matrix):
+            return np.full(len(columns), np.nan)
+        weight = position - lower
+        result = matrix[lower, columns] * (1 - weight) + matrix[higher, columns] * weight
+    else:
+        raise ValueError('Unknown quantile method {}'.format(method))
+    result[counts == 0] = np.nan
+    return result
+
+
+class MetricStore:
+    '''
+    Metrics of all trials in one process: a float64 array of intermediate results for each trial, where step s
+    holds the result with sequence number s and missing steps are NaN, plus the status and latest parameter ID
+    of each trial, and all final results with their parameter IDs.
+    Each trial only takes the memory of its own history, so a few long trials do not make every trial as long.
+    Arrays grow by doubling, so recording a result is amortized O(1).
+
+    The dispatcher is the only writer, tuners and assessors read it through read-only NumPy arrays and
+    vectorized queries, which work on a trial x step matrix padded with NaN built for the query.
+    Histories share memory with the store, they see later values of existing steps but not steps added
+    after they are taken. NumPy is imported on first use.
+
+    The dispatcher only records metrics once a reader has called enable(), so an experiment without such a tuner
+    or assessor keeps nothing. Failed trials are dropped when they end, unless a reader asks to keep them,
+    and their rows are compacted once they are half of the store, which changes row indices and version.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()  # handlers of different trials record in parallel in multi-thread mode
+        self.enabled = False
+        '''Whether the dispatcher records metrics, see enable()'''
+        self.keep_failed = False
+        self.reset()
+
+    def enable(self, keep_failed=False):
+        '''
+        Called by tuners and assessors reading the store when they are created, so that the dispatcher records
+        metrics into it. keep_failed: keep the rows of failed trials after they end
+        '''
+        self.enabled = True
+        self.keep_failed = self.keep_failed or keep_failed
+
+    def reset(self):
+        '''Forget everything'''
+        self._rows = {}             # key: trial job ID; value: row index
+        self._parameter_rows = {}   # key: parameter ID; value: row index
+        self._trial_job_ids = []
+        self._parameter_ids = []    # latest parameter ID of each row, None if unknown
+        self._histories = []        # intermediate results of each row, capacity steps, None if it has none
+        self._lengths = None        # number of steps of each row, i.e. 1 + the largest sequence number
+        self._status = None
+        self._max_length = 0
+        self._final_parameter_ids = []
+        self._final_values = None
+        self._dropped = 0           # number of rows of failed trials waiting to be compacted
+        self.version = 0
+        '''Increased when a trial ends, so that queries on ended trials can be cached'''
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def load(self, other):
+        '''Replace the content with the one of another store, e.g. unpickled from a snapshot'''
+        with self._lock:
+            state = other.__getstate__()
+            # whether to record depends on the readers of this process
+            state.pop('enabled', None)
+            state.pop('keep_failed', None)
+            self.__dict__.update(state)
+
+    def __len__(self):
+        return len(self._trial_job_ids)
+
+    def __contains__(self, trial_job_id):
+        return trial_job_id in self._rows
+
+    # writing, only done by the dispatcher
+
+    def record(self, trial_job_id, sequence, value, parameter_id=None):
+        '''Record an intermediate result'''
+        with self._lock:
+            row = self._row(trial_job_id, parameter_id)
+            self._reserve(row, sequence + 1)
+            self._histories[row][sequence] = _to_float(value)
+            if sequence >= self._lengths[row]:
+                self._lengths[row] = sequence + 1
+                self._max_length = max(self._max_length, sequence + 1)
+
+    def record_history(self, trial_job_id, history, parameter_id=None):
+        '''Record the intermediate results of a trial from a sequence ordered by sequence number'''
+        with self._lock:
+            row = self._row(trial_job_id, parameter_id)
+            self._reserve(row, len(history))
+            self._histories[row][:len(history)] = [_to_float(value) for value in history]
+            if len(history) > self._lengths[row]:
+                self._lengths[row] = len(history)
+                self._max_length = max(self._max_length, len(history))
+
+    def record_final(self, parameter_id, value, trial_job_id=None):
+        '''Record a final result, of a trial with intermediate results if trial_job_id is given'''
+        import numpy as np
+        with self._lock:
+            # a row is not created, the final result of a failed trial may arrive after its row is dropped
+            if trial_job_id in self._rows:
+                self._row(trial_job_id, parameter_id)
+            count = len(self._final_parameter_ids)
+            if self._final_values is None or count == len(self._final_values):
+                final_values = np.full(max(_initial_rows, count * 2), np.nan)
+                if count:
+                    final_values[:count] = self._final_values
+                self._final_values = final_values
+            self._final_values[count] = _to_float(value)
+            self._final_parameter_ids.append(parameter_id)
+
+    def trial_ended(self, trial_job_id, success):
+        with self._lock:
+            row = self._rows.get(trial_job_id)
+            if row is None:
+                return  # without intermediate result
+            self._status[row] = SUCCEEDED if success else FAILED
+            self.version += 1
+            if not success and not self.keep_failed:
+                self._histories[row] = None
+                self._lengths[row] = 0
+                self._dropped += 1
+                if self._dropped > _initial_rows and self._dropped * 2 > len(self._trial_job_ids):
+                    self._compact()
+
+    def _compact(self):
+        '''Remove the rows of failed trials'''
+        import numpy as np
+        count = len(self._trial_job_ids)
+        keep = np.nonzero(self._status[:count] != FAILED)[0]
+        new_rows = {old: new for new, old in enumerate(keep)}
+        self._trial_job_ids = [self._trial_job_ids[row] for row in keep]
+        self._parameter_ids = [self._parameter_ids[row] for row in keep]
+        self._histories = [self._histories[row] for row in keep]
+        self._rows = {trial_job_id: row for row, trial_job_id in enumerate(self._trial_job_ids)}
+        self._parameter_rows = {parameter_id: new_rows[row] for parameter_id, row in self._parameter_rows.items()
+                                if row in new_rows}
+        lengths, status = self._lengths[keep], self._status[keep]
+        self._lengths = self._status = None
+        self._reserve_rows(max(_initial_rows, len(keep)))
+        self._lengths[:len(keep)] = lengths
+        self._status[:len(keep)] = status
+        self._max_length = int(lengths.max()) if len(lengths) else 0
+        self._dropped = 0
+
+    def _row(self, trial_job_id, parameter_id):
+        row = self._rows.get(trial_job_id)
+        if row is None:
+            row = len(self._trial_job_ids)
+            self._reserve_rows(row + 1)
+            self._rows[trial_job_id] = row
+            self._trial_job_ids.append(trial_job_id)
+            self._histories.append(None)
+            self._parameter_ids.append(None)
+        if parameter_id is not None and self._parameter_ids[row] != parameter_id:
+            self._parameter_ids[row] = parameter_id
+            self._parameter_rows[parameter_id] = row
+        return row
+
+    def _reserve_rows(self, rows):
+        import numpy as np
+        if self._lengths is None:
+            self._lengths = np.zeros(_initial_rows, dtype=np.int64)
+            self._status = np.zeros(_initial_rows, dtype=np.int8)
+        capacity = len(self._lengths)
+        if rows > capacity:
+            new_rows = max(rows, capacity * 2)
+            self._lengths = np.concatenate([self._lengths, np.zeros(new_rows - capacity, dtype=np.int64)])
+            self._status = np.concatenate([self._status, np.zeros(new_rows - capacity, dtype=np.int8)])
+
+    def _reserve(self, row, steps):
+        import numpy as np
+        history = self._histories[row]
+        capacity = 0 if history is None else len(history)
+        if steps <= capacity:
+            return
+        new_history = np.full(max(steps, _initial_steps, capacity * 2), np.nan)
+        if capacity:
+            new_history[:capacity] = history
+        self._histories[row] = new_history
+
+    # reading
+
+    @property
+    def trial_job_ids(self):
+        '''Trial job IDs in row order (read-only sequence)'''
+        return tuple(self._trial_job_ids)
+
+    def row(self, trial_job_id):
+        '''Row index of a trial, None if it has no metric'''
+        return self._rows.get(trial_job_id)
+
+    def row_of_parameter(self, parameter_id):
+        '''Row index of the trial which got the parameter, None if unknown'''
+        return self._parameter_rows.get(parameter_id)
+
+    def parameter_id(self, row):
+        return self._parameter_ids[row]
+
+    def rows(self, status=None):
+        '''Indices of all rows, or of the rows of trials with the status'''
+        import numpy as np
+        count = len(self._trial_job_ids)
+        if status is None:
+            return np.arange(count)
+        if not count:
+            return np.zeros(0, dtype=np.int64)
+        return np.nonzero(self._status[:count] == status)[0]
+
+    @property
+    def values(self):
+        '''Intermediate results, a (trials, longest history) matrix padded with NaN, built on each access'''
+        return _read_only(self._select(None)[0])
+
+    @property
+    def lengths(self):
+        return _read_only(self._vector(self._lengths))
+
+    @property
+    def status(self):
+        return _read_only(self._vector(self._status))
+
+    def history(self, trial_job_id):
+        '''Intermediate results of a trial, an empty array if it has none'''
+        row = self._rows.get(trial_job_id)
+        if row is None or self._histories[row] is None:
+            import numpy as np
+            return _read_only(np.zeros(0))
+        return _read_only(self._histories[row][:self._lengths[row]])
+
+    def latest(self, rows=None):
+        '''Result with the largest sequence number of each row, NaN for rows without intermediate result'''
+        import numpy as np
+        values, lengths = self._select(rows)
+        latest = np.full(len(lengths), np.nan)
+        has_result = lengths > 0
+        latest[has_result] = values[np.nonzero(has_result)[0], lengths[has_result] - 1]
+        return latest
+
+    def best_so_far(self, maximize=True, rows=None):
+        '''Best result of each row up to each step, NaN after the last step of the row'''
+        import numpy as np
+        values, lengths = self._select(rows)
+        best = (np.fmax if maximize else np.fmin).accumulate(values, axis=1)
+        return self._mask_after_end(best, lengths)
+
+    def running_mean(self, rows=None):
+        '''Mean of the results of each row up to each step, NaN after the last step of the row'''
+        import numpy as np
+        values, lengths = self._select(rows)
+        counts = np.cumsum(~np.isnan(values), axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.nancumsum(values, axis=1) / counts
+        return self._mask_after_end(means, lengths)
+
+    def step_quantile(self, q, rows=None, method='linear'):
+        '''Quantile of the intermediate results at each step, see column_quantile()'''
+        return column_quantile(self._select(rows)[0], q, method)
+
+    def final_results(self):
+        '''Returns a tuple of the parameter IDs (list) and the values (read-only array) of all final results'''
+        import numpy as np
+        count = len(self._final_parameter_ids)
+        values = self._final_values[:count] if count else np.zeros(0)
+        return list(self._final_parameter_ids), _read_only(values)
+
+    def _vector(self, vector):
+        if vector is None:
+            import numpy as np
+            return np.zeros(0, dtype=np.int64)
+        return vector[:len(self._trial_job_ids)]
+
+    def _select(self, rows):
+        '''Returns the padded matrix and the lengths of the rows'''
+        import numpy as np
+        lengths = self._vector(self._lengths)
+        indices = np.arange(len(lengths))
+        if rows is not None:
+            indices, lengths = indices[rows], lengths[rows]
+        values = np.full((len(indices), self._max_length), np.nan)
+        for i, (row, length) in enumerate(zip(indices, lengths)):
+            if length:
+                values[i, :length] = self._histories[row][:length]
+        return values, lengths
+
+    @staticmethod
+    def _mask_after_end(matrix, lengths):
+        import numpy as np
+        matrix[np.arange(matrix.shape[1]) >= lengths[:, None]] = np.nan
+        return _read_only(matrix)
+
+
+metric_store = MetricStore()
+'''The store of this process'''
@@ -19,62 +19,117 @@
 # ==================================================================================================
 
 import logging
-from collections import defaultdict
-import json_tricks
+import pickle
+from collections import defaultdict, OrderedDict
 import threading
 
-from .protocol import CommandType, send
+from . import codec
+from .common import multi_thread_enabled, async_mode_enabled
+from .protocol import CommandType, send, send_batch, initialized_payload
 from .msg_dispatcher_base import MsgDispatcherBase
-from .assessor import AssessResult
+from .assessor import Assessor, AssessResult, TrialBatch
+from .assessor_pool import AssessorPool
+from .parameter_prefetcher import ParameterPrefetcher
+from .dispatcher_state import ParameterStore, RecentSet, ConfigCache
+from .metric_store import metric_store
+from .experiment_data import load_trial_results
+from .trial_history import TrialHistory
+from .telemetry import telemetry
 
 _logger = logging.getLogger(__name__)
 
 # Assessor global variables
-_trial_history = defaultdict(dict)
-'''key: trial job ID; value: intermediate results, mapping from sequence number to data'''
+_trial_history = defaultdict(TrialHistory)
+'''key: trial job ID; value: intermediate results'''
 
-_ended_trials = set()
-'''trial_job_id of all ended trials.
+_max_ended_trials = 10000
+_ended_trials = RecentSet(_max_ended_trials)
+'''trial_job_id of recently ended trials.
 We need this because NNI manager may send metrics after reporting a trial ended.
 TODO: move this logic to NNI manager
 '''
 
-def _sort_history(history):
-    ret = [ ]
-    for i, _ in enumerate(history):
-        if i in history:
-            ret.append(history[i])
-        else:
-            break
-    return ret
-
 # Tuner global variables
 _next_parameter_id = 0
-_trial_params = {}
-'''key: trial job ID; value: parameters'''
-_customized_parameter_ids = set()
+_trial_params = ParameterStore()
+'''parameters of trials whose final result is not delivered yet, indexed by parameter ID'''
 
 def _create_parameter_id():
     global _next_parameter_id  # pylint: disable=global-statement
     _next_parameter_id += 1
     return _next_parameter_id - 1
 
-def _pack_parameter(parameter_id, params, customized=False):
-    _trial_params[parameter_id] = params
+def _pack_parameter(parameter_id, params, customized=False, record=True):
+    if record:
+        _trial_params.add(parameter_id, params, customized)
     ret = {
         'parameter_id': parameter_id,
         'parameter_source': 'customized' if customized else 'algorithm',
         'parameters': params
     }
-    return json_tricks.dumps(ret)
+    return codec.dumps(ret)
+
+def _is_bad(result):
+    if isinstance(result, bool):
+        return not result
+    if not isinstance(result, AssessResult):
+        msg = 'Result of Assessor.assess_trial must be an object of AssessResult, not %s'
+        raise RuntimeError(msg % type(result))
+    return result is AssessResult.Bad
 
 class MsgDispatcher(MsgDispatcherBase):
-    def __init__(self, tuner, assessor=None):
+    def __init__(self, tuner, assessor=None, assessor_processes=0, prefetch_size=0, prefetch_staleness=0,
+                 state_spill_path=None, config_cache=None, import_data=None):
+        '''
+        assessor_processes: if positive, run the assessor in this many worker processes
+            and send kill decisions asynchronously, see nni.assessor_pool.AssessorPool
+        prefetch_size: if positive, generate up to this many parameters in advance while idle,
+            see nni.parameter_prefetcher.ParameterPrefetcher
+        prefetch_staleness: number of final results a prefetched parameter may miss before it is regenerated
+        state_spill_path: if given, parameters of finished trials are moved to a database at this path
+            instead of being dropped, see nni.dispatcher_state.ParameterStore
+        config_cache: 'reuse' or 'resample' to handle tuners proposing parameters that were sent before,
+            see nni.dispatcher_state.ConfigCache
+        import_data: path of the database or exported results of a previous experiment,
+            given to Tuner.import_data() before the first trial, see nni.experiment_data
+        '''
         super().__init__()
         self.tuner = tuner
+        self.tuner_lock = threading.RLock()
+        self.prefetcher = None
+        if prefetch_size > 0:
+            self.prefetcher = ParameterPrefetcher(tuner, prefetch_size, prefetch_staleness,
+                                                  self.tuner_lock, _create_parameter_id)
         self.assessor = assessor
+        self.assessor_pool = None
+        # assessors overriding assess_trials() get all trials with new results at the end of each pass
+        self.batch_assessment = assessor is not None and assessor_processes <= 0 and \
+            type(assessor).assess_trials is not Assessor.assess_trials
+        self._pending_assessments = OrderedDict()  # key: trial job ID
+        # final results are given to the tuner in batches, before it generates parameters again
+        self._pending_results = []  # (parameter ID, parameters, value, customized)
+        if state_spill_path:
+            _trial_params.spill_to(state_spill_path)
+        self.import_data_path = import_data
+        self.data_imported = False
+        self.config_cache = None
+        if config_cache and config_cache != 'off':
+            self.config_cache = ConfigCache(config_cache)
+            telemetry.set_gauge('config_cache_hit_rate', lambda: self.config_cache.hit_rate)
         if assessor is None:
             _logger.debug('Assessor is not configured')
+        elif assessor_processes > 0:
+            self.assessor_pool = AssessorPool(assessor, assessor_processes, self._handle_assess_result)
+
+    def run(self):
+        try:
+            super().run()
+        finally:
+            if self.prefetcher is not None:
+                self.prefetcher.stop()
+            if self.assessor_pool is not None:
+                self.assessor_pool.shutdown()
+            _trial_params.close()
 
     def load_checkpoint(self):
         self.tuner.load_checkpoint()
@@ -86,34 +141,209 @@ class MsgDispatcher(MsgDispatcherBase):
         if self.assessor is not None:
             self.assessor.save_checkpoint()
 
+    def journal_state(self):
+        if self.assessor_pool is not None:
+            # the assessors in worker processes are not accessible
+            return None
+        with self.tuner_lock:
+            return pickle.dumps({
+                'tuner': self.tuner,
+                'assessor': self.assessor,
+                'trial_history': _trial_history,
+                'metric_store': metric_store,
+                'ended_trials': _ended_trials,
+                'trial_params': _trial_params,
+                'config_cache': self.config_cache,
+                'pending_results': self._pending_results,
+                'data_imported': self.data_imported,
+                'next_parameter_id': _next_parameter_id
+            }, pickle.HIGHEST_PROTOCOL)
+
+    def restore_journal_state(self, state):
+        global _trial_history, _ended_trials, _trial_params, _next_parameter_id  # pylint: disable=global-statement
+        state = pickle.loads(state)
+        self.tuner = state['tuner']
+        self.assessor = state['assessor']
+        if self.prefetcher is not None:
+            self.prefetcher.tuner = self.tuner
+        _trial_history = state['trial_history']
+        if 'metric_store' in state:
+            metric_store.load(state['metric_store'])
+        _ended_trials = state['ended_trials']
+        state['trial_params']._spill = _trial_params._spill
+        _trial_params = state['trial_params']
+        _next_parameter_id = state['next_parameter_id']
+        if self.config_cache is not None and state.get('config_cache') is not None:
+            self.config_cache = state['config_cache']
+        self.data_imported = state.get('data_imported', False)
+        self._pending_results = state.get('pending_results', [])
+
+    def replay_sent(self, command, data):
+        global _next_parameter_id  # pylint: disable=global-statement
+        if command is not CommandType.NewTrialJob:
+            return
+        # tuners may generate different parameters when replaying, the ones sent to trials take precedence
+        data = codec.loads(data)
+        _trial_params.add(data['parameter_id'], data['parameters'], data['parameter_source'] == 'customized')
+        if self.config_cache is not None:
+            self.config_cache.add(self.config_cache.lookup(data['parameters'])[0], data['parameter_id'])
+        _next_parameter_id = max(_next_parameter_id, data['parameter_id'] + 1)
+
+    def replay_done(self):
+        with self.tuner_lock:
+            self._deliver_results()
+        self._assess_pending()
+        if self.assessor_pool is not None:
+            self.assessor_pool.wait()
+
+    def handle_start(self):
+        # the prefetcher allocates parameter ids, which must not clash with those sent in the replayed journal
+        if self.prefetcher is not None:
+            self.prefetcher.start()
+
+    def handle_pass_end(self):
+        with self.tuner_lock:
+            self._deliver_results()
+        self._assess_pending()
+
+    def command_lane(self, command, data):
+        # assessor commands of a trial only touch the state of that trial,
+        # so different trials are assessed in parallel while tuner commands stay in order.
+        # The final result shares the lane of its trial, so that it is handled before the end of the trial
+        # when it arrives first; the tuner is locked when it gets the result
+        if command is CommandType.TrialEnd:
+            return ('trial', data['trial_job_id'])
+        if command is CommandType.ReportMetricData and data['type'] == 'PERIODICAL':
+            return ('trial', data.get('trial_job_id'))
+        if command is CommandType.ReportMetricData and data['type'] == 'FINAL' and data.get('trial_job_id'):
+            return ('trial', data['trial_job_id'])
+        return 'tuner'
+
+    def handle_command(self, command, data):
+        if self.prefetcher is None:
+            return super().handle_command(command, data)
+        self.prefetcher.pause()
+        try:
+            return super().handle_command(command, data)
+        finally:
+            self.prefetcher.resume()
+
+    def coalesce_key(self, command, data):
+        # only the latest history of a trial needs assessing when several metrics are pending
+        if command is CommandType.ReportMetricData and data['type'] == 'PERIODICAL' and self.assessor is not None:
+            return ('metric', data['trial_job_id'])
+        return None
+
+    def handle_superseded(self, command, data):
+        if self.coalesce_key(command, data) is not None:
+            # record the metric, it is assessed along with the pending one
+            return self._handle_intermediate_metric_data(data, assess=False)
+        return self.handle_command(command, data)
+
     def handle_initialize(self, data):
         '''
         data is search space
         '''
-        self.tuner.update_search_space(data)
-        send(CommandType.Initialized, '')
+        self.handle_update_search_space(data)
+        if self.import_data_path and not self.data_imported:
+            self._import_data()
+        send(CommandType.Initialized, initialized_payload())
         return True
 
+    def _import_data(self):
+        try:
+            data = load_trial_results(self.import_data_path)
+        except (OSError, ValueError) as e:
+            _logger.error('Failed to load trial results from %s: %s', self.import_data_path, e)
+            return
+        with self.tuner_lock, telemetry.timed('tuner'):
+            self.tuner.import_data(data)
+            if self.prefetcher is not None:
+                self.prefetcher.reset()
+            if self.config_cache is not None:
+                for trial in data:
+                    self.config_cache.import_result(trial['parameter'], trial['value'])
+        self.data_imported = True
+
     def handle_request_trial_jobs(self, data):
         # data: number or trial jobs
-        ids = [_create_parameter_id() for _ in range(data)]
-        params_list = self.tuner.generate_multiple_parameters(ids)
+        with self.tuner_lock:
+            self._deliver_results()
+            prefetched = self.prefetcher.take(data) if self.prefetcher is not None else []
+            ids = [_create_parameter_id() for _ in range(data - len(prefetched))]
+            with telemetry.timed('tuner'):
+                params_list = self.tuner.generate_multiple_parameters(ids) if ids else []
+            ids = [id_ for id_, _ in prefetched] + ids
+            params_list = [params for _, params in prefetched] + list(params_list)
+            trials = list(zip(ids, params_list))
+            if self.config_cache is not None:
+                trials = self._replace_duplicates(trials)
 
-        for i, _ in enumerate(params_list):
-            send(CommandType.NewTrialJob, _pack_parameter(ids[i], params_list[i]))
+        send_batch(CommandType.NewTrialJob, [_pack_parameter(id_, params) for id_, params in trials])
         # when parameters is None.
-        if len(params_list) < len(ids):
-            send(CommandType.NoMoreTrialJobs, _pack_parameter(ids[0], ''))
+        if len(trials) < data:
+            send(CommandType.NoMoreTrialJobs, _pack_parameter(ids[0], '', record=False))
         return True
 
+    def _replace_duplicates(self, trials):
+        '''
+        Replace the parameters that were sent before, see nni.dispatcher_state.ConfigCache.
+        Called with tuner_lock held, drops only the parameters the tuner has no replacement for,
+        the others of the batch are already generated and recorded by the tuner.
+        '''
+        hits = self.config_cache.hits
+        result = []
+        for id_, params in trials:
+            trial = self._replace_duplicate(id_, params)
+            if trial is None:
+                continue
+            result.append(trial)
+        if self.config_cache.hits > hits:
+            _logger.info('Config cache hit rate %.1f%% (%d duplicates in %d parameters)',
+                         self.config_cache.hit_rate * 100, self.config_cache.hits, self.config_cache.lookups)
+        return result
+
+    def _replace_duplicate(self, id_, params):
+        '''Returns (parameter id, parameters) to send, or None if the tuner has no more parameters'''
+        cache = self.config_cache
+        key, hit = cache.lookup(params)
+        for _ in range(cache.max_resample):
+            if not hit:
+                break
+            finished, value = cache.result(key)
+            if cache.mode == 'reuse' and finished:
+                _logger.debug('Parameters %s were run before, final result %s is reused', id_, value)
+                self._pending_results.append((id_, params, value, False))
+            else:
+                _logger.debug('Parameters %s were sent before, resampled', id_)
+            self._deliver_results()
+            id_ = _create_parameter_id()
+            with telemetry.timed('tuner'):
+                new_params = self.tuner.generate_multiple_parameters([id_])
+            if not new_params:
+                return None
+            params = new_params[0]
+            key, hit = cache.lookup(params)
+        if hit:
+            _logger.warning('Tuner keeps proposing parameters that were sent before, sending them as %s', id_)
+        cache.add(key, id_)
+        return id_, params
+
     def handle_update_search_space(self, data):
-        self.tuner.update_search_space(data)
+        with self.tuner_lock:
+            self._deliver_results()
+            with telemetry.timed('tuner'):
+                self.tuner.update_search_space(data)
+            if self.prefetcher is not None:
+                self.prefetcher.reset()
         return True
 
     def handle_add_customized_trial(self, data):
          # data: parameters
-        id_ = _create_parameter_id()
-        _customized_parameter_ids.add(id_)
+        with self.tuner_lock:
+            id_ = _create_parameter_id()
+            if self.config_cache is not None:
+                self.config_cache.add(self.config_cache.lookup(data)[0], id_)
         send(CommandType.NewTrialJob, _pack_parameter(id_, data, customized=True))
         return True
 
@@ -127,20 +357,54 @@ class MsgDispatcher(MsgDispatcherBase):
         if data['type'] == 'FINAL':
             id_ = data['parameter_id']
             value = data['value']
-            if id_ in _customized_parameter_ids:
-                self.tuner.receive_customized_trial_result(id_, _trial_params[id_], value)
-            else:
-                self.tuner.receive_trial_result(id_, _trial_params[id_], value)
+            if metric_store.enabled:
+                metric_store.record_final(id_, value, data.get('trial_job_id'))
+            if self.config_cache is not None:
+                with self.tuner_lock:
+                    self.config_cache.final_received(id_, value)
+            try:
+                params, customized = _trial_params.get(id_)
+            except KeyError:
+                _logger.warning('Final result of parameter %s is dropped, its trial has ended', id_)
+                return True
+            with self.tuner_lock:
+                self._pending_results.append((id_, params, value, customized))
+                if multi_thread_enabled() or async_mode_enabled():
+                    # there is no end of pass, results are delivered in order of arrival
+                    self._deliver_results()
+            _trial_params.final_received(id_)
         elif data['type'] == 'PERIODICAL':
-            if self.assessor is not None:
-                self._handle_intermediate_metric_data(data)
-            else:
-                pass
+            self._handle_intermediate_metric_data(data)
         else:
             raise ValueError('Data type not supported: {}'.format(data['type']))
 
         return True
 
+    def _deliver_results(self):
+        '''
+        Give the pending final results to the tuner, consecutive results of algorithm trials in one
+        Tuner.receive_trial_results() call. Called with tuner_lock held.
+        '''
+        if not self._pending_results:
+            return
+        pending, self._pending_results = self._pending_results, []
+        _logger.debug('Deliver %d final results to tuner', len(pending))
+        batch = []
+        with telemetry.timed('tuner'):
+            for id_, params, value, customized in pending:
+                if not customized:
+                    batch.append((id_, params, value))
+                    continue
+                if batch:
+                    self.tuner.receive_trial_results(batch)
+                    batch = []
+                self.tuner.receive_customized_trial_result(id_, params, value)
+            if batch:
+                self.tuner.receive_trial_results(batch)
+        if self.prefetcher is not None:
+            for _ in pending:
+                self.prefetcher.receive_result()
+
     def handle_trial_end(self, data):
         """
         data: it has three keys: trial_job_id, event, hyper_params
@@ -150,41 +414,102 @@ class MsgDispatcher(MsgDispatcherBase):
         """
         trial_job_id = data['trial_job_id']
         _ended_trials.add(trial_job_id)
+        if metric_store.enabled:
+            metric_store.trial_ended(trial_job_id, data['event'] == 'SUCCEEDED')
+        if data.get('hyper_params'):
+            parameter_id = codec.loads(data['hyper_params'])['parameter_id']
+            with self.tuner_lock:  # trials end in their own lanes in multi-thread mode
+                _trial_params.trial_ended(parameter_id)
+                if self.config_cache is not None:
+                    self.config_cache.trial_ended(parameter_id, data['event'] == 'SUCCEEDED')
+        if trial_job_id in self._pending_assessments:
+            # assess the results received before the end, as it is done without batches
+            self._assess_pending()
         if trial_job_id in _trial_history:
             _trial_history.pop(trial_job_id)
-            if self.assessor is not None:
-                self.assessor.trial_end(trial_job_id, data['event'] == 'SUCCEEDED')
+            if self.assessor_pool is not None:
+                self.assessor_pool.trial_end(trial_job_id, data['event'] == 'SUCCEEDED')
+            elif self.assessor is not None:
+                with telemetry.timed('assessor'):
+                    self.assessor.trial_end(trial_job_id, data['event'] == 'SUCCEEDED')
         return True
 
-    def _handle_intermediate_metric_data(self, data):
+    def _handle_intermediate_metric_data(self, data, assess=True):
         if data['type'] != 'PERIODICAL':
             return True
-        if self.assessor is None:
-            return True
 
         trial_job_id = data['trial_job_id']
         if trial_job_id in _ended_trials:
             return True
+        if metric_store.enabled:
+            metric_store.record(trial_job_id, data['sequence'], data['value'], data.get('parameter_id'))
+        if self.assessor is None:
+            return True
 
         history = _trial_history[trial_job_id]
-        history[data['sequence']] = data['value']
-        ordered_history = _sort_history(history)
-        if len(ordered_history) < data['sequence']:  # no user-visible update since last time
+        if history.add(data['sequence'], data['value']):
+            history.updated = True
+        if not history.updated or not assess:  # no user-visible update since last time
+            return True
+        history.updated = False
+        if self.batch_assessment and not multi_thread_enabled() and not async_mode_enabled():
+            self._pending_assessments[trial_job_id] = None
+            return True
+        ordered_history = history.view()
+
+        if self.assessor_pool is not None:
+            self.assessor_pool.assess_trial(trial_job_id, ordered_history)
             return True
 
         try:
-            result = self.assessor.assess_trial(trial_job_id, ordered_history)
+            with telemetry.timed('assessor'):
+                result = self.assessor.assess_trial(trial_job_id, ordered_history)
         except Exception as e:
             _logger.exception('Assessor error')
+            return True
+        self._handle_assess_result(trial_job_id, result)
+        return True
 
-        if isinstance(result, bool):
-            result = AssessResult.Good if result else AssessResult.Bad
-        elif not isinstance(result, AssessResult):
-            msg = 'Result of Assessor.assess_trial must be an object of AssessResult, not %s'
-            raise RuntimeError(msg % type(result))
+    def _assess_pending(self):
+        trial_job_ids = [id_ for id_ in self._pending_assessments if id_ in _trial_history]
+        self._pending_assessments.clear()
+        if not trial_job_ids:
+            return
+        batch = TrialBatch(trial_job_ids, [_trial_history[id_].view() for id_ in trial_job_ids])
+        try:
+            with telemetry.timed('assessor'):
+                results = self.assessor.assess_trials(batch)
+            if hasattr(results, 'tolist'):  # NumPy array
+                results = results.tolist()
+            if len(results) != len(trial_job_ids):
+                raise RuntimeError('Assessor.assess_trials returned %d results for %d trials' %
+                                   (len(results), len(trial_job_ids)))
+        except Exception:
+            _logger.exception('Assessor error, assess the %d trials one by one', len(trial_job_ids))
+            results = [self._assess_trial(id_, history) for id_, history in zip(batch.trial_job_ids, batch.histories)]
+        bad_trials = []
+        for id_, result in zip(trial_job_ids, results):
+            try:
+                if result is not None and _is_bad(result):
+                    bad_trials.append(id_)
+            except Exception:
+                _logger.exception('Assessor error of trial %s', id_)
+        _logger.debug('%d trials assessed, kill %s', len(trial_job_ids), bad_trials)
+        if bad_trials:
+            send_batch(CommandType.KillTrialJob, [codec.dumps(id_) for id_ in bad_trials])
+
+    def _assess_trial(self, trial_job_id, history):
+        '''Result of Assessor.assess_trial(), or None if it fails'''
+        try:
+            with telemetry.timed('assessor'):
+                return self.assessor.assess_trial(trial_job_id, history)
+        except Exception:
+            _logger.exception('Assessor error of trial %s', trial_job_id)
+            return None
 
-        if result is AssessResult.Bad:
+    def _handle_assess_result(self, trial_job_id, result):
+        if _is_bad(result):
             _logger.debug('BAD, kill %s', trial_job_id)
-            send(CommandType.KillTrialJob, json_tricks.dumps(trial_job_id))
+            send(CommandType.KillTrialJob, codec.dumps(trial_job_id))
         else:
             _logger.debug('GOOD')
@@ -21,56 +21,511 @@
 #import json_tricks
 import os
 import logging
-import json_tricks
-from multiprocessing.dummy import Pool as ThreadPool
-from .common import init_logger, multi_thread_enabled
+import itertools
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from .common import init_dispatcher_logger, multi_thread_enabled, async_mode_enabled, executor_workers, max_queue_delays
 from .recoverable import Recoverable
-from .protocol import CommandType, receive
+from .journal import CommandJournal
+from . import codec
+from .telemetry import telemetry, METRICS_FILE
+from . import protocol
+from .protocol import CommandType, send, receive, receive_async, has_input, initialized_payload
 
-init_logger('dispatcher.log')
 _logger = logging.getLogger(__name__)
 
+_stop = object()
+
+_journaled_commands = {
+    CommandType.Initialize,
+    CommandType.RequestTrialJobs,
+    CommandType.UpdateSearchSpace,
+    CommandType.AddCustomizedTrialJob,
+    CommandType.ReportMetricData,
+    CommandType.TrialEnd
+}
+'''Incoming commands changing dispatcher state, which are journaled when handled and replayed on resume'''
+
+_max_drained_commands = 1000
+'''Maximum number of received commands waiting to be handled'''
+
+CONTROL_PRIORITY = 0
+TUNER_PRIORITY = 1
+PERIODICAL_METRIC_PRIORITY = 2
+'''Priority classes of incoming commands, see MsgDispatcherBase.command_priority()'''
+
+class _PriorityInbox:
+    '''
+    Received commands waiting to be handled, ordered by priority class and then by arrival.
+    A command waiting longer than the maximum delay of its class goes before commands of higher priority.
+    When a command is queued, the pending commands of the same lane with lower priority are promoted
+    to its priority, so commands of a lane are always handled in arrival order.
+    '''
+    def __init__(self, max_delays):
+        self.max_delays = max_delays
+        self._queues = [deque() for _ in max_delays]  # deques of [arrival time, lane, command, data, coalesce key]
+        self._keys = defaultdict(int)  # key: coalesce key; value: number of pending commands with the key
+        self.max_observed_delays = [0.0] * len(max_delays)
+        '''Longest time a command of each priority class has waited'''
+
+    def __len__(self):
+        return sum(len(q) for q in self._queues)
+
+    def push(self, priority, lane, command, data, key):
+        promoted = []
+        for lower in self._queues[priority + 1:]:
+            if any(request[1] == lane for request in lower):
+                promoted.extend(request for request in lower if request[1] == lane)
+                kept = [request for request in lower if request[1] != lane]
+                lower.clear()
+                lower.extend(kept)
+        self._queues[priority].extend(sorted(promoted, key=lambda request: request[0]))
+        self._queues[priority].append([time.time(), lane, command, data, key])
+        if key is not None:
+            self._keys[key] += 1
+
+    def pop(self):
+        '''Returns (command, data, superseded), superseded is True if a later command has the same coalesce key'''
+        now = time.time()
+        overdue = [(q[0][0], i) for i, q in enumerate(self._queues) if q and now - q[0][0] > self.max_delays[i]]
+        if overdue:
+            priority = min(overdue)[1]
+        else:
+            priority = next(i for i, q in enumerate(self._queues) if q)
+        arrival, _, command, data, key = self._queues[priority].popleft()
+
+        delay = now - arrival
+        if delay > self.max_observed_delays[priority]:
+            self.max_observed_delays[priority] = delay
+            if delay > self.max_delays[priority]:
+                _logger.warning('Command %s waited %.3f seconds, exceeding the limit of priority class %d',
+                                command, delay, priority)
+
+        if key is None:
+            return command, data, False
+        self._keys[key] -= 1
+        if self._keys[key]:
+            return command, data, True
+        self._keys.pop(key)
+        return command, data, False
+
+class _KeyedWorkQueue:
+    '''
+    Thread pool which runs the work items sharing a key one by one in submission order,
+    and the work items of different keys in parallel.
+    Among the keys with pending work items, the one whose next item has the lowest priority value runs first.
+    '''
+    def __init__(self, workers=None):
+        self._lock = threading.Lock()
+        self._pending = dict()               # key: deques of (priority, func, args), present while ready or running
+        self._ready = queue.PriorityQueue()  # (priority, sequence, key) of keys with pending items and none running
+        self._sequence = itertools.count()
+        self._threads = [threading.Thread(target=self._work, daemon=True)
+                         for _ in range(workers or os.cpu_count() or 1)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key, func, *args, priority=0):
+        with self._lock:
+            if key in self._pending:
+                self._pending[key].append((priority, func, args))
+                return
+            self._pending[key] = deque([(priority, func, args)])
+            self._ready.put((priority, next(self._sequence), key))
+
+    def __len__(self):
+        '''Number of pending work items, including the running ones'''
+        with self._lock:
+            return sum(len(items) for items in self._pending.values())
+
+    def wait(self):
+        '''Wait for all submitted work items'''
+        self._ready.join()
+
+    def join(self):
+        '''Wait for all submitted work items, then stop the worker threads'''
+        self._ready.join()
+        for _ in self._threads:
+            self._ready.put((float('inf'), next(self._sequence), _stop))
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        while True:
+            _, _, key = self._ready.get()
+            if key is _stop:
+                self._ready.task_done()
+                return
+            with self._lock:
+                _, func, args = self._pending[key].popleft()
+            try:
+                func(*args)
+            except Exception:  # pylint: disable=broad-except
+                _logger.exception('Error in handling command of lane %s', key)
+            with self._lock:
+                if self._pending[key]:
+                    self._ready.put((self._pending[key][0][0], next(self._sequence), key))
+                else:
+                    self._pending.pop(key)
+            self._ready.task_done()
+
 class MsgDispatcherBase(Recoverable):
-    def __init__(self):
-        if multi_thread_enabled():
-            self.pool = ThreadPool()
+    inbox = None
+    '''Received commands waiting to be handled in single and multi-thread mode'''
+    journal = None
+    '''CommandJournal in the checkpoint directory, None if there is no checkpoint directory'''
+    snapshot_interval = 10000
+    '''Number of journal records between two snapshots of journal_state()'''
+    telemetry_interval = 10
+    '''Seconds between two updates of the metrics file in NNI_LOG_DIRECTORY'''
+    _work_queue = None
+    _lanes = None
+    _search_space = None
+    '''Raw payload of the latest Initialize or UpdateSearchSpace command in the journal'''
+    _resumed_search_space = None
 
     def run(self):
         """Run the tuner.
         This function will never return unless raise.
         """
+        init_dispatcher_logger()
         mode = os.getenv('NNI_MODE')
         if mode == 'resume':
             self.load_checkpoint()
+        self._open_journal(mode == 'resume')
+        self.handle_start()
 
-        while True:
-            _logger.debug('waiting receive_message')
-            command, data = receive()
-            if command is None:
-                break
-            if multi_thread_enabled():
-                self.pool.map_async(self.handle_request, [(command, data)])
+        metrics_path = None
+        if os.getenv('NNI_LOG_DIRECTORY'):
+            metrics_path = os.path.join(os.getenv('NNI_LOG_DIRECTORY'), METRICS_FILE)
+            telemetry.set_gauge('input_backlog', self.input_backlog)
+            telemetry.start_exporter(metrics_path, self.telemetry_interval)
+        try:
+            if async_mode_enabled():
+                self._run_async()
             else:
-                self.handle_request((command, data))
+                self._run_sync()
+        finally:
+            if self.journal is not None:
+                protocol.set_send_observer(None)
+                self.journal.close()
+            if metrics_path is not None:
+                telemetry.stop_exporter(metrics_path)
+        _logger.info('Terminated by NNI manager')
 
-        if multi_thread_enabled():
-            self.pool.close()
-            self.pool.join()
+    def input_backlog(self):
+        """Returns the number of received commands which are not handled yet."""
+        backlog = len(self.inbox) if self.inbox is not None else 0
+        if self._work_queue is not None:
+            backlog += len(self._work_queue)
+        if self._lanes is not None:
+            backlog += sum(len(pending) for pending, _ in list(self._lanes.values()))
+        return backlog
 
-        _logger.info('Terminated by NNI manager')
+    def _run_sync(self):
+        work_queue = _KeyedWorkQueue(executor_workers()) if multi_thread_enabled() else None
+        self._work_queue = work_queue
+        self.inbox = _PriorityInbox(max_queue_delays())
+        eof = False
+        while not eof or self.inbox:
+            # receive the commands already in the pipe, or wait for one if there is nothing to handle,
+            # so that control commands go before the ones received earlier, and superseded ones are coalesced
+            while not eof and (not self.inbox or has_input()) and len(self.inbox) < _max_drained_commands:
+                _logger.debug('waiting receive_message')
+                command, data = receive()
+                if command is None:
+                    eof = True
+                elif command is CommandType.Terminate:
+                    self.handle_request((command, data))
+                elif self._accept(command, data):
+                    raw, data = data, codec.loads(data)
+                    self.inbox.push(self.command_priority(command, data), self.command_lane(command, data),
+                                    command, (raw, data), self._coalesce_key(command, data))
+            if not self.inbox:
+                continue
+
+            command, (raw, data), superseded = self.inbox.pop()
+            if work_queue is not None:
+                work_queue.submit(self.command_lane(command, data), self._handle, command, raw, data, superseded,
+                                  priority=self.command_priority(command, data))
+                if not self.inbox and self._snapshot_due():
+                    # wait until no handler is running, so that the state matches the journal
+                    work_queue.wait()
+                    self._save_snapshot()
+            else:
+                _logger.debug('handle request: command: [%s], data: [%s]', command, data)
+                self._handle(command, raw, data, superseded)
+                if not self.inbox:
+                    # all received commands are journaled and handled now
+                    self.handle_pass_end()
+                    self._save_snapshot()
+
+        if work_queue is not None:
+            work_queue.join()
+        _logger.info('Longest queueing delays of priority classes: %s', self.inbox.max_observed_delays)
+
+    def _open_journal(self, resume):
+        checkpoint_path = self.get_checkpoint_path()
+        if checkpoint_path is None:
+            return
+        self.journal = CommandJournal(checkpoint_path)
+        if resume:
+            self._replay_journal()
+        self.journal.open(resume)
+        protocol.set_send_observer(lambda command, data: self.journal.append(command, data, inbound=False))
+
+    def _replay_journal(self):
+        """Rebuild the state of the dispatcher from the latest snapshot and the journal after it,
+        without sending anything to NNI manager.
+        """
+        snapshot = self.journal.load_snapshot()
+        if snapshot is not None:
+            self._search_space, state = snapshot
+            self.restore_journal_state(state)
+        replayed = 0
+        with protocol.muted():
+            for command, data, inbound, superseded in self.journal.replay():
+                command = CommandType(command)
+                try:
+                    if inbound:
+                        if command in (CommandType.Initialize, CommandType.UpdateSearchSpace):
+                            self._search_space = data
+                        # handled in the same order and by the same handler as before
+                        handler = self.handle_superseded if superseded else self.handle_command
+                        handler(command, codec.loads(data))
+                    else:
+                        self.replay_sent(command, data)
+                except Exception:  # pylint: disable=broad-except
+                    _logger.exception('Error in replaying command %s', command)
+                replayed += 1
+            self.replay_done()
+        self._resumed_search_space = self._search_space
+        _logger.info('Resumed from journal, %s snapshot, %d commands replayed',
+                     'with' if snapshot is not None else 'without', replayed)
+
+    def _accept(self, command, data):
+        """Returns False if a received command is already handled, which is the case for the Initialize command
+        resending the search space after a resume.
+        """
+        if command is CommandType.Initialize and self._resumed_search_space is not None:
+            search_space, self._resumed_search_space = self._resumed_search_space, None
+            if data == search_space:
+                send(CommandType.Initialized, initialized_payload())
+                return False
+        return True
+
+    def _handle(self, command, raw, data, superseded):
+        """Append an incoming command to the journal and handle it.
+        Commands are journaled when they are handled rather than received, because they are not handled in
+        the order they arrive, so that replaying the journal repeats what the handlers did.
+        raw: string payload.
+        data: deserialized payload.
+        """
+        if self.journal is not None and command in _journaled_commands:
+            self.journal.append(command, raw, superseded=superseded)
+            if command in (CommandType.Initialize, CommandType.UpdateSearchSpace):
+                self._search_space = raw
+        if superseded:
+            return self.handle_superseded(command, data)
+        return self.handle_command(command, data)
+
+    def _snapshot_due(self):
+        return self.journal is not None and self.journal.records >= self.snapshot_interval
+
+    def _save_snapshot(self):
+        # only called when no handler is running, so that the state matches the journal
+        if not self._snapshot_due():
+            return
+        try:
+            # tuners holding e.g. a lock, a thread or a file cannot be pickled
+            state = self.journal_state()
+            if state is None:
+                return
+            self.journal.save_snapshot((self._search_space, state))
+        except Exception as e:  # pylint: disable=broad-except
+            _logger.warning('Failed to save snapshot, replay the whole journal on resume: %r', e)
+            self.snapshot_interval = float('inf')
+            return
+        self.save_checkpoint()
+
+    def journal_state(self):
+        """Returns picklable state of the dispatcher, which is saved along the journal periodically,
+        so that only the commands after it are replayed on resume.
+        Returns None by default, which means the whole journal is replayed.
+        """
+        return None
+
+    def restore_journal_state(self, state):
+        """Restore the state returned by journal_state() on resume."""
+        pass
+
+    def replay_sent(self, command, data):
+        """Invoked with the commands sent to NNI manager in the journal on resume,
+        override this to restore state which is not rebuilt by handling incoming commands again,
+        e.g. the parameters actually sent to trials.
+        command: CommandType object.
+        data: string payload.
+        """
+        pass
+
+    def replay_done(self):
+        """Invoked after the journal is replayed, while outgoing commands are still dropped."""
+        pass
+
+    def handle_start(self):
+        """Invoked once the journal is replayed on resume, before handling received commands.
+        Override this to start background work, which must not run while the journal is replayed.
+        """
+        pass
+
+    def handle_pass_end(self):
+        """Invoked in single thread mode when all received commands are handled, before waiting for more.
+        Override this to handle the work collected from several commands at once.
+        """
+        pass
+
+    def command_priority(self, command, data):
+        """Returns the priority class of a command in single and multi-thread mode, lower value goes first.
+        Control commands (Initialize, TrialEnd) go first, then FINAL metrics and other tuner commands,
+        then PERIODICAL metrics. Commands of a lane are still handled in arrival order, see command_lane().
+        command: CommandType object.
+        data: deserialized payload.
+        """
+        if command in (CommandType.Initialize, CommandType.TrialEnd):
+            return CONTROL_PRIORITY
+        if command is CommandType.ReportMetricData and data.get('type') == 'PERIODICAL':
+            return PERIODICAL_METRIC_PRIORITY
+        return TUNER_PRIORITY
+
+    def _coalesce_key(self, command, data):
+        if command is CommandType.Terminate:
+            return None
+        return self.coalesce_key(command, data)
+
+    def coalesce_key(self, command, data):
+        """Returns a key of commands which can be coalesced, or None by default.
+        If a command is followed by a pending command with the same key,
+        handle_superseded() is invoked for it instead of the full handler.
+        command: CommandType object.
+        data: deserialized payload.
+        """
+        return None
+
+    def handle_superseded(self, command, data):
+        """Handle a command superseded by a later one with the same coalesce_key().
+        Override this to only record the data, and leave the expensive work to the later command.
+        command: CommandType object.
+        data: deserialized payload.
+        """
+        return self.handle_command(command, data)
+
+    def _run_async(self):
+        """Run the dispatcher on an asyncio event loop.
+        Frames are read without blocking, and handlers run in an executor, one command of a lane at a time,
+        so a slow tuner never delays Terminate or the commands of other lanes.
+        """
+        import asyncio  # only imported in async mode
+        from concurrent.futures import ThreadPoolExecutor
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        executor = ThreadPoolExecutor(max_workers=executor_workers())
+        try:
+            loop.run_until_complete(self._dispatch_async(loop, executor))
+        finally:
+            # do not wait for a handler which is still running when Terminate is received
+            executor.shutdown(wait=False)
+            loop.close()
+
+    async def _dispatch_async(self, loop, executor):
+        import asyncio
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), protocol._in_file)
+        lanes = {}  # key: lane returned by command_lane(), value: (pending requests, task consuming them)
+        self._lanes = lanes
+        receiving = loop.create_task(receive_async(reader))
+        try:
+            while True:
+                _logger.debug('waiting receive_message')
+                await asyncio.wait([receiving] + [task for _, task in lanes.values()],
+                                   return_when=asyncio.FIRST_COMPLETED)
+                for lane in [lane for lane, (_, task) in lanes.items() if task.done()]:
+                    lanes.pop(lane)[1].result()  # re-raise handler errors
+                if self._snapshot_due():
+                    # stop dispatching until no handler is running, so that the state matches the journal
+                    for lane in list(lanes):
+                        await lanes.pop(lane)[1]
+                    self._save_snapshot()
+                if not receiving.done():
+                    continue
+
+                command, data = receiving.result()
+                if command is None:
+                    break
+                if not self._accept(command, data):
+                    receiving = loop.create_task(receive_async(reader))
+                    continue
+                if command is CommandType.Terminate:
+                    self.handle_request((command, data))
+                receiving = loop.create_task(receive_async(reader))
+
+                raw, data = data, codec.loads(data)
+                lane = self.command_lane(command, data)
+                if lane not in lanes:
+                    pending = deque()
+                    lanes[lane] = (pending, loop.create_task(self._run_lane(loop, executor, pending)))
+                pending = lanes[lane][0]
+                key = self._coalesce_key(command, data)
+                if key is not None:
+                    for request in reversed(pending):
+                        if request[3] == key:
+                            request[4] = True  # superseded by this one
+                            break
+                pending.append([command, raw, data, key, False])
+
+            for _, task in lanes.values():
+                await task
+        finally:
+            receiving.cancel()
+            for _, task in lanes.values():
+                task.cancel()
+
+    async def _run_lane(self, loop, executor, pending):
+        # the task ends once the lane is drained, so idle lanes (e.g. of ended trials) hold no resource
+        while pending:
+            command, raw, data, _, superseded = pending.popleft()
+            await loop.run_in_executor(executor, self._handle, command, raw, data, superseded)
+
+    def command_lane(self, command, data):
+        """Returns the lane of a command in multi-thread and async mode.
+        Commands in the same lane are handled one by one in arrival order,
+        while commands in different lanes may be handled concurrently.
+        All commands share one lane by default, override this if the handlers of
+        different lanes do not share state.
+        command: CommandType object.
+        data: deserialized payload.
+        """
+        return None
 
     def handle_request(self, request):
         command, data = request
 
-        _logger.debug('handle request: command: [{}], data: [{}]'.format(command, data))
+        _logger.debug('handle request: command: [%s], data: [%s]', command, data)
 
         if command is CommandType.Terminate:
             # if receive Terminate command, exit process
             _logger.info('Receive Terminate command from NNI manager, terminating')
             exit(0)
 
-        data = json_tricks.loads(data)
+        data = codec.loads(data)
+        return self.handle_command(command, data)
 
+    def handle_command(self, command, data):
+        """Invoke the handler of a command.
+        command: CommandType object.
+        data: deserialized payload.
+        """
         command_handlers = {
             # Tunner commands:
             CommandType.Initialize: self.handle_initialize,
@@ -86,7 +541,11 @@ class MsgDispatcherBase(Recoverable):
         if command not in command_handlers:
             raise AssertionError('Unsupported command: {}'.format(command))
 
-        return command_handlers[command](data)
+        start = time.perf_counter()
+        try:
+            return command_handlers[command](data)
+        finally:
+            telemetry.observe_handler(command, time.perf_counter() - start)
 
     def handle_initialize(self, data):
         raise NotImplementedError('handle_initialize not implemented')
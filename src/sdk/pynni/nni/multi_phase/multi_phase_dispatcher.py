@@ -20,17 +20,19 @@
 
 import logging
 from collections import defaultdict
-import json_tricks
 
-from nni.protocol import CommandType, send
+from nni import codec
+from nni.protocol import CommandType, send, send_batch, initialized_payload
 from nni.msg_dispatcher_base import MsgDispatcherBase
 from nni.assessor import AssessResult
+from nni.trial_history import TrialHistory
+from nni.metric_store import metric_store
 
 _logger = logging.getLogger(__name__)
 
 # Assessor global variables
-_trial_history = defaultdict(dict)
-'''key: trial job ID; value: intermediate results, mapping from sequence number to data'''
+_trial_history = defaultdict(TrialHistory)
+'''key: trial job ID; value: intermediate results'''
 
 _ended_trials = set()
 '''trial_job_id of all ended trials.
@@ -38,15 +40,6 @@ We need this because NNI manager may send metrics after reporting a trial ended.
 TODO: move this logic to NNI manager
 '''
 
-def _sort_history(history):
-    ret = [ ]
-    for i, _ in enumerate(history):
-        if i in history:
-            ret.append(history[i])
-        else:
-            break
-    return ret
-
 # Tuner global variables
 _next_parameter_id = 0
 _trial_params = {}
@@ -71,7 +64,7 @@ def _pack_parameter(parameter_id, params, customized=False, trial_job_id=None, p
         ret['parameter_index'] = parameter_index
     else:
         ret['parameter_index'] = 0
-    return json_tricks.dumps(ret)
+    return codec.dumps(ret)
 
 class MultiPhaseMsgDispatcher(MsgDispatcherBase):
     def __init__(self, tuner, assessor=None):
@@ -91,12 +84,21 @@ class MultiPhaseMsgDispatcher(MsgDispatcherBase):
         if self.assessor is not None:
             self.assessor.save_checkpoint()
 
+    def command_lane(self, command, data):
+        # assessor commands of a trial only touch the state of that trial,
+        # so different trials are assessed in parallel while tuner commands stay in order
+        if command is CommandType.TrialEnd:
+            return ('trial', data['trial_job_id'])
+        if command is CommandType.ReportMetricData and data['type'] == 'PERIODICAL':
+            return ('trial', data.get('trial_job_id'))
+        return 'tuner'
+
     def handle_initialize(self, data):
         '''
         data is search space
         '''
         self.tuner.update_search_space(data)
-        send(CommandType.Initialized, '')
+        send(CommandType.Initialized, initialized_payload())
         return True
 
     def handle_request_trial_jobs(self, data):
@@ -104,8 +106,7 @@ class MultiPhaseMsgDispatcher(MsgDispatcherBase):
         ids = [_create_parameter_id() for _ in range(data)]
         params_list = self.tuner.generate_multiple_parameters(ids)
         assert len(ids) == len(params_list)
-        for i, _ in enumerate(ids):
-            send(CommandType.NewTrialJob, _pack_parameter(ids[i], params_list[i]))
+        send_batch(CommandType.NewTrialJob, [_pack_parameter(ids[i], params_list[i]) for i, _ in enumerate(ids)])
         return True
 
     def handle_update_search_space(self, data):
@@ -123,15 +124,14 @@ class MultiPhaseMsgDispatcher(MsgDispatcherBase):
         trial_job_id = data['trial_job_id']
         if data['type'] == 'FINAL':
             id_ = data['parameter_id']
+            if metric_store.enabled:
+                metric_store.record_final(id_, data['value'], trial_job_id)
             if id_ in _customized_parameter_ids:
                 self.tuner.receive_customized_trial_result(id_, _trial_params[id_], data['value'], trial_job_id)
             else:
                 self.tuner.receive_trial_result(id_, _trial_params[id_], data['value'], trial_job_id)
         elif data['type'] == 'PERIODICAL':
-            if self.assessor is not None:
-                self._handle_intermediate_metric_data(data)
-            else:
-               pass
+            self._handle_intermediate_metric_data(data)
         elif data['type'] == 'REQUEST_PARAMETER':
             assert data['trial_job_id'] is not None
             assert data['parameter_index'] is not None
@@ -146,6 +146,8 @@ class MultiPhaseMsgDispatcher(MsgDispatcherBase):
     def handle_trial_end(self, data):
         trial_job_id = data['trial_job_id']
         _ended_trials.add(trial_job_id)
+        if metric_store.enabled:
+            metric_store.trial_ended(trial_job_id, data.get('event') == 'SUCCEEDED')
         if trial_job_id in _trial_history:
             _trial_history.pop(trial_job_id)
             if self.assessor is not None:
@@ -155,18 +157,19 @@ class MultiPhaseMsgDispatcher(MsgDispatcherBase):
     def _handle_intermediate_metric_data(self, data):
         if data['type'] != 'PERIODICAL':
             return True
-        if self.assessor is None:
-            return True
 
         trial_job_id = data['trial_job_id']
         if trial_job_id in _ended_trials:
             return True
+        if metric_store.enabled and 'sequence' in data:  # results of multi-phase trials are not always numbered
+            metric_store.record(trial_job_id, data['sequence'], data['value'], data.get('parameter_id'))
+        if self.assessor is None:
+            return True
 
         history = _trial_history[trial_job_id]
-        history[data['sequence']] = data['value']
-        ordered_history = _sort_history(history)
-        if len(ordered_history) < data['sequence']:  # no user-visible update since last time
+        if not history.add(data['sequence'], data['value']):  # no user-visible update since last time
             return True
+        ordered_history = history.view()
 
         try:
             result = self.assessor.assess_trial(trial_job_id, ordered_history)
@@ -181,6 +184,6 @@ class MultiPhaseMsgDispatcher(MsgDispatcherBase):
 
         if result is AssessResult.Bad:
             _logger.debug('BAD, kill %s', trial_job_id)
-            send(CommandType.KillTrialJob, json_tricks.dumps(trial_job_id))
+            send(CommandType.KillTrialJob, codec.dumps(trial_job_id))
         else:
             _logger.debug('GOOD')
@@ -24,63 +24,69 @@ parameter_expression.py
 import numpy as np
 
 
-def choice(options, random_state):
+def choice(options, random_state, size=None):
     '''
     options: 1-D array-like or int
     random_state: an object of numpy.random.RandomState
+    size: number of samples to return as a numpy array, or None for a single sample
     '''
-    return random_state.choice(options)
+    return random_state.choice(options, size=size)
 
 
-def randint(upper, random_state):
+def randint(upper, random_state, size=None):
     '''
     upper: an int that represent an upper bound
     random_state: an object of numpy.random.RandomState
+    size: number of samples to return as a numpy array, or None for a single sample
     '''
-    return random_state.randint(upper)
+    return random_state.randint(upper, size=size)
 
 
-def uniform(low, high, random_state):
+def uniform(low, high, random_state, size=None):
     '''
     low: an float that represent an lower bound
     high: an float that represent an upper bound
     random_state: an object of numpy.random.RandomState
+    size: number of samples to return as a numpy array, or None for a single sample
     '''
     assert high > low, 'Upper bound must be larger than lower bound'
-    return random_state.uniform(low, high)
+    return random_state.uniform(low, high, size)
 
 
-def quniform(low, high, q, random_state):
+def quniform(low, high, q, random_state, size=None):
     '''
     low: an float that represent an lower bound
     high: an float that represent an upper bound
     q: sample step
     random_state: an object of numpy.random.RandomState
+    size: number of samples to return as a numpy array, or None for a single sample
     '''
-    return np.round(uniform(low, high, random_state) / q) * q
+    return np.round(uniform(low, high, random_state, size) / q) * q
 
 
-def loguniform(low, high, random_state):
+def loguniform(low, high, random_state, size=None):
     '''
     low: an float that represent an lower bound
     high: an float that represent an upper bound
     random_state: an object of numpy.random.RandomState
+    size: number of samples to return as a numpy array, or None for a single sample
     '''
     assert low > 0, 'Lower bound must be positive'
-    return np.exp(uniform(np.log(low), np.log(high), random_state))
+    return np.exp(uniform(np.log(low), np.log(high), random_state, size))
 
 
-def qloguniform(low, high, q, random_state):
+def qloguniform(low, high, q, random_state, size=None):
     '''
     low: an float that represent an lower bound
     high: an float that represent an upper bound
     q: sample step
     random_state: an object of numpy.random.RandomState
+    size: number of samples to return as a numpy array, or None for a single sample
     '''
-    return np.round(loguniform(low, high, random_state) / q) * q
+    return np.round(loguniform(low, high, random_state, size) / q) * q
 
 
-def normal(mu, sigma, random_state):
+def normal(mu, sigma, random_state, size=None):
     '''
     The probability density function of the normal distribution,
     first derived by De Moivre and 200 years later by both Gauss and Laplace independently.
@@ -89,34 +95,63 @@ def normal(mu, sigma, random_state):
     sigma: float or array_like of floats
            Standard deviation (spread or “width”) of the distribution.
     random_state: an object of numpy.random.RandomState
+    size: number of samples to return as a numpy array, or None for a single sample
     '''
-    return random_state.normal(mu, sigma)
+    return random_state.normal(mu, sigma, size)
 
 
-def qnormal(mu, sigma, q, random_state):
+def qnormal(mu, sigma, q, random_state, size=None):
     '''
     mu: float or array_like of floats
     sigma: float or array_like of floats
     q: sample step
     random_state: an object of numpy.random.RandomState
+    size: number of samples to return as a numpy array, or None for a single sample
     '''
-    return np.round(normal(mu, sigma, random_state) / q) * q
+    return np.round(normal(mu, sigma, random_state, size) / q) * q
 
 
-def lognormal(mu, sigma, random_state):
+def lognormal(mu, sigma, random_state, size=None):
     '''
     mu: float or array_like of floats
     sigma: float or array_like of floats
     random_state: an object of numpy.random.RandomState
+    size: number of samples to return as a numpy array, or None for a single sample
     '''
-    return np.exp(normal(mu, sigma, random_state))
+    return np.exp(normal(mu, sigma, random_state, size))
 
 
-def qlognormal(mu, sigma, q, random_state):
+def qlognormal(mu, sigma, q, random_state, size=None):
     '''
     mu: float or array_like of floats
     sigma: float or array_like of floats
     q: sample step
     random_state: an object of numpy.random.RandomState
+    size: number of samples to return as a numpy array, or None for a single sample
     '''
-    return np.round(lognormal(mu, sigma, random_state) / q) * q
+    return np.round(lognormal(mu, sigma, random_state, size) / q) * q
+
+
+EXPRESSIONS = {
+    'choice': choice,
+    'randint': randint,
+    'uniform': uniform,
+    'quniform': quniform,
+    'loguniform': loguniform,
+    'qloguniform': qloguniform,
+    'normal': normal,
+    'qnormal': qnormal,
+    'lognormal': lognormal,
+    'qlognormal': qlognormal
+}
+'''The expressions by their '_type' in the search space'''
+
+
+def sample(_type, _value, random_state, size=None):
+    '''
+    Sample the expression of a search space node, i.e. {'_type': _type, '_value': _value}
+    size: number of samples to return as a numpy array, or None for a single sample
+    '''
+    if _type not in EXPRESSIONS:
+        raise ValueError('Unknown expression type {}'.format(_type))
+    return EXPRESSIONS[_type](*(list(_value) + [random_state]), size=size)
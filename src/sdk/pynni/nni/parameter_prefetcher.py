@@ -0,0 +1,137 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+parameter_prefetcher.py
+'''
+
+import logging
+import threading
+from collections import deque
+
+from .telemetry import telemetry
+
+_logger = logging.getLogger(__name__)
+
+
+class ParameterPrefetcher:
+    '''
+    Generates parameters with the tuner in a background thread while the dispatcher is idle,
+    so that RequestTrialJobs can be answered from a bounded queue.
+    A queued parameter is discarded once more than 'staleness' final results have been received
+    after it was generated, and the queue is refilled from the updated tuner.
+    This only suits tuners whose generate_parameters() has no side effect besides recording the parameter id,
+    because discarded parameters are never sent to trials.
+    '''
+    def __init__(self, tuner, size, staleness, lock, create_parameter_id):
+        '''
+        tuner: the tuner to prefetch parameters from
+        size: maximum number of queued parameters
+        staleness: maximum number of final results a queued parameter may miss
+        lock: lock serializing all calls to the tuner
+        create_parameter_id: function allocating parameter ids
+        '''
+        self.tuner = tuner
+        self.size = size
+        self.staleness = staleness
+        self.lock = lock
+        self.create_parameter_id = create_parameter_id
+        self._condition = threading.Condition()
+        self._queue = deque()  # (parameter id, parameters, number of results seen when generated)
+        self._results = 0
+        self._epoch = 0        # increased on every reset(), parameters of an old epoch are dropped
+        self._paused = 0       # number of commands being handled
+        self._active = False   # False before the search space is known or after the tuner runs out of parameters
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='ParameterPrefetcher', daemon=True)
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread.ident is not None:  # started
+            self._thread.join()
+
+    def pause(self):
+        '''Stop generating while a command is handled, the dispatcher has priority over prefetching'''
+        with self._condition:
+            self._paused += 1
+
+    def resume(self):
+        with self._condition:
+            self._paused -= 1
+            self._condition.notify_all()
+
+    def reset(self):
+        '''Drop queued parameters and start prefetching with current search space'''
+        with self._condition:
+            self._queue.clear()
+            self._epoch += 1
+            self._active = True
+            self._condition.notify_all()
+
+    def receive_result(self):
+        '''Invoked when a final result is delivered to the tuner'''
+        with self._condition:
+            self._results += 1
+            while self._queue and self._results - self._queue[0][2] > self.staleness:
+                self._queue.popleft()
+            self._condition.notify_all()
+
+    def take(self, count):
+        '''Returns up to count prefetched (parameter id, parameters) tuples'''
+        with self._condition:
+            ret = [self._queue.popleft()[:2] for _ in range(min(count, len(self._queue)))]
+            self.hits += len(ret)
+            self.misses += count - len(ret)
+            self._condition.notify_all()
+        _logger.debug('Prefetched parameters: %d hits, %d misses in total', self.hits, self.misses)
+        return ret
+
+    def _wait_for_work(self):
+        with self._condition:
+            while not self._stopped and (self._paused or not self._active or len(self._queue) >= self.size):
+                self._condition.wait()
+            return None if self._stopped else self._epoch
+
+    def _run(self):
+        while True:
+            epoch = self._wait_for_work()
+            if epoch is None:
+                return
+            with self.lock:
+                parameter_id = self.create_parameter_id()
+                try:
+                    with telemetry.timed('prefetch'):
+                        params_list = self.tuner.generate_multiple_parameters([parameter_id])
+                except Exception:  # pylint: disable=broad-except
+                    _logger.exception('Prefetching parameters failed, stop prefetching')
+                    params_list = []
+            with self._condition:
+                if not params_list:
+                    # no more trial, or the tuner is broken, let the dispatcher call the tuner directly
+                    self._active = False
+                elif epoch == self._epoch:
+                    self._queue.append((parameter_id, params_list[0], self._results))
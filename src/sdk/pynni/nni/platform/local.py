@@ -21,10 +21,11 @@
 import os
 import json
 import time
-import json_tricks
 import subprocess
 
 from ..common import init_logger, env_args
+from ..profiler import install_profiler
+from .. import codec
 
 _sysdir = os.environ['NNI_SYS_DIR']
 if not os.path.exists(os.path.join(_sysdir, '.nni')):
@@ -36,13 +37,14 @@ if not os.path.exists(_outputdir):
     os.makedirs(_outputdir)
 _log_file_path = os.path.join(_outputdir, 'trial.log')
 init_logger(_log_file_path)
+install_profiler(_outputdir, 'trial')
 
 _multiphase = os.environ.get('MULTI_PHASE')
 
 _param_index = 0
 
 def request_next_parameter():
-    metric = json_tricks.dumps({
+    metric = codec.dumps({
         'trial_job_id': env_args.trial_job_id,
         'type': 'REQUEST_PARAMETER',
         'sequence': 0,
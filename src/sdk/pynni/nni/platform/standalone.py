@@ -19,7 +19,7 @@
 # ==================================================================================================
 
 
-import json_tricks
+from .. import codec
 
 
 def get_next_parameter():
@@ -29,7 +29,7 @@ def get_sequence_id():
     pass
 
 def send_metric(string):
-    metric = json_tricks.loads(string)
+    metric = codec.loads(string)
     if metric['type'] == 'FINAL':
         print('Final result:', metric['value'])
     elif metric['type'] == 'PERIODICAL':
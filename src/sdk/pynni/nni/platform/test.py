@@ -43,3 +43,6 @@ def init_params(params):
 
 def get_last_metric():
     return json_tricks.loads(_last_metric)
+
+def get_sequence_id():
+    return 0
@@ -0,0 +1,298 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+profiler.py
+
+Profiling a running dispatcher or trial on demand, without restarting it.
+Profiling is toggled by SIGUSR1, or requested by writing a control file into the directory of the process.
+'''
+
+import atexit
+import json
+import logging
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+_logger = logging.getLogger(__name__)
+
+CONTROL_FILE = 'profile.ctl'
+'''
+Name of the control file, a JSON object like {"action": "start", "mode": "sample", "memory": true}.
+It should be written to another name and renamed, so the watcher never reads a partial file.
+'''
+
+MODES = ('sample', 'cprofile')
+'''
+sample: record the stacks of all threads periodically, cheap enough for production.
+cprofile: trace every call of the main thread with cProfile, only covers handlers in the default dispatch mode.
+'''
+
+_sample_interval = 0.005
+_poll_interval = 1.0
+_report_lines = 50
+
+
+class _Sampler(threading.Thread):
+    '''Counts the stacks of all other threads every interval seconds'''
+    def __init__(self, interval, ignored_threads):
+        super().__init__(name='nni-profile-sampler', daemon=True)
+        self.interval = interval
+        self.ignored_threads = ignored_threads
+        self.stacks = Counter()  # key: tuple of frame labels, outermost first
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        ignored = set(self.ignored_threads) | {threading.get_ident()}
+        while not self._stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():  # pylint: disable=protected-access
+                if ident in ignored:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename),
+                                                     code.co_firstlineno))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    '''
+    Profiles the process between a start and a stop request, then writes the reports into directory,
+    named after name and the time profiling started.
+    Requests come from the control file, polled every poll_interval seconds by a watcher thread,
+    and from SIGUSR1, which toggles profiling with default_mode.
+    cProfile can only trace the thread that enables it, so cprofile requests are applied by the signal handler
+    on the main thread. Everything else, including writing reports, is done by the watcher thread.
+    '''
+    def __init__(self, directory, name, default_mode='sample', poll_interval=_poll_interval):
+        if default_mode not in MODES:
+            raise ValueError('Profiling mode should be one of {}, got {}'.format(', '.join(MODES), default_mode))
+        self.directory = directory
+        self.name = name
+        self.default_mode = default_mode
+        self.poll_interval = poll_interval
+        self.control_path = os.path.join(directory, CONTROL_FILE)
+        self.reports = []  # paths of all reports written so far
+        self._requests = queue.Queue()
+        self._pending = None  # request waiting for the signal handler
+        self._signal_installed = False
+        self._session = None  # dict of the running profiling session
+        self._cprofile = None
+        self._watcher = None
+        self._stop_event = threading.Event()
+
+    def install(self):
+        '''Install the SIGUSR1 handler, when possible, and start the watcher thread'''
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            # do not take over the signal if the application handles it
+            if signal.getsignal(signal.SIGUSR1) == signal.SIG_DFL:
+                signal.signal(signal.SIGUSR1, self._on_signal)
+                self._signal_installed = True
+        self._watcher = threading.Thread(target=self._watch, name='nni-profile-watcher', daemon=True)
+        self._watcher.start()
+        atexit.register(self.close)
+
+    def close(self):
+        '''Stop the watcher thread, and write the reports if profiling is still running'''
+        if self._watcher is not None and self._watcher.is_alive():
+            self._stop_event.set()
+            self._watcher.join()
+        if self._session is not None:
+            if self._cprofile is not None and threading.current_thread() is threading.main_thread():
+                self._cprofile.disable()
+            self._stop()
+
+    @property
+    def active(self):
+        return self._session is not None
+
+    def request(self, action, mode=None, memory=False):
+        '''
+        Start or stop profiling, like writing the control file.
+        action: 'start' or 'stop'.
+        mode: one of MODES, default_mode if None.
+        memory: also take a tracemalloc snapshot when profiling stops.
+        '''
+        request = {'action': action, 'mode': mode or self.default_mode, 'memory': memory}
+        if action not in ('start', 'stop'):
+            raise ValueError('Profiling action should be start or stop, got {}'.format(action))
+        if request['mode'] not in MODES:
+            raise ValueError('Profiling mode should be one of {}, got {}'.format(', '.join(MODES), request['mode']))
+        if request['mode'] == 'cprofile' and not self._signal_installed:
+            _logger.warning('cProfile needs the SIGUSR1 handler on the main thread, falling back to sample mode')
+            request['mode'] = 'sample'
+        if request['mode'] == 'cprofile' or (action == 'stop' and self._cprofile is not None):
+            # the main thread enables or disables cProfile in the signal handler and passes the request on
+            self._pending = request
+            os.kill(os.getpid(), signal.SIGUSR1)
+        else:
+            self._requests.put(request)
+
+    def _on_signal(self, signum, frame):  # pylint: disable=unused-argument
+        # keep it minimal, the main thread may be interrupted anywhere, even in logging
+        request = self._pending
+        self._pending = None
+        if request is None:
+            action = 'stop' if self._session is not None or self._cprofile is not None else 'start'
+            request = {'action': action, 'mode': self.default_mode, 'memory': False}
+        if request['action'] == 'start' and request['mode'] == 'cprofile' and self._cprofile is None:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        elif request['action'] == 'stop' and self._cprofile is not None:
+            self._cprofile.disable()
+        self._requests.put(request)
+
+    def _watch(self):
+        while not self._stop_event.is_set():
+            try:
+                request = self._requests.get(timeout=self.poll_interval)
+            except queue.Empty:
+                self._check_control_file()
+                continue
+            try:
+                if request['action'] == 'start':
+                    self._start(request)
+                else:
+                    self._stop()
+            except Exception:  # pylint: disable=broad-except
+                _logger.exception('Failed to %s profiling', request['action'])
+
+    def _check_control_file(self):
+        if not os.path.exists(self.control_path):
+            return
+        try:
+            with open(self.control_path) as control_file:
+                request = json.load(control_file)
+            os.remove(self.control_path)
+            self.request(request['action'], request.get('mode'), request.get('memory', False))
+        except Exception:  # pylint: disable=broad-except
+            _logger.exception('Invalid profiling control file %s', self.control_path)
+            if os.path.exists(self.control_path):
+                os.remove(self.control_path)
+
+    def _start(self, request):
+        if self._session is not None:
+            _logger.warning('Profiling is already running since %s', self._session['started'])
+            return
+        session = dict(request, started=time.strftime('%Y%m%d-%H%M%S'), start_time=time.time())
+        if request['mode'] == 'sample':
+            session['sampler'] = _Sampler(_sample_interval, [threading.get_ident()])
+            session['sampler'].start()
+        if request['memory']:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                session['stop_tracemalloc'] = True
+        self._session = session
+        _logger.info('Profiling started, mode: %s, memory: %s', request['mode'], request['memory'])
+
+    def _stop(self):
+        session = self._session
+        if session is None:
+            _logger.warning('Profiling is not running')
+            return
+        self._session = None
+        base = os.path.join(self.directory, '{}_profile_{}'.format(self.name, session['started']))
+        seconds = time.time() - session['start_time']
+        reports = []
+        if session['mode'] == 'sample':
+            session['sampler'].stop()
+            reports += _write_sample_reports(base, session['sampler'], seconds)
+        elif self._cprofile is not None:
+            reports += _write_cprofile_reports(base, self._cprofile)
+            self._cprofile = None
+        if session['memory']:
+            import tracemalloc
+            reports.append(_write_memory_report(base, tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()))
+            if session.get('stop_tracemalloc'):
+                tracemalloc.stop()
+        self.reports += reports
+        _logger.info('Profiling stopped after %.1f seconds, reports: %s', seconds, ', '.join(reports))
+
+
+def _write_sample_reports(base, sampler, seconds):
+    '''Write the stacks in the folded format of flamegraph.pl, and the functions taking most samples'''
+    folded_path = base + '.folded'
+    with open(folded_path, 'w') as folded_file:
+        for stack, count in sampler.stacks.most_common():
+            folded_file.write('{} {}\n'.format(';'.join(stack), count))
+    inclusive = Counter()
+    exclusive = Counter()
+    for stack, count in sampler.stacks.items():
+        for label in set(stack):
+            inclusive[label] += count
+        exclusive[stack[-1]] += count
+    total = sum(sampler.stacks.values()) or 1
+    text_path = base + '.txt'
+    with open(text_path, 'w') as text_file:
+        text_file.write('{} samples in {:.1f} seconds, {} thread stacks, percentages are of thread stacks\n\n'
+                        .format(sampler.samples, seconds, total))
+        for title, counter in (('total', inclusive), ('self', exclusive)):
+            text_file.write('{:>8} {:>7}  function ({})\n'.format('samples', '%', title))
+            for label, count in counter.most_common(_report_lines):
+                text_file.write('{:>8} {:>6.1f}%  {}\n'.format(count, count * 100 / total, label))
+            text_file.write('\n')
+    return [text_path, folded_path]
+
+
+def _write_cprofile_reports(base, profile):
+    '''Write the raw stats, which can be loaded by pstats or snakeviz, and the functions with most cumulative time'''
+    import pstats
+    stats_path = base + '.prof'
+    profile.dump_stats(stats_path)
+    text_path = base + '.txt'
+    with open(text_path, 'w') as text_file:
+        pstats.Stats(profile, stream=text_file).sort_stats('cumulative').print_stats(_report_lines)
+    return [text_path, stats_path]
+
+
+def _write_memory_report(base, snapshot, traced_memory):
+    '''Write the source lines holding most memory allocated since tracemalloc started'''
+    path = base + '_memory.txt'
+    with open(path, 'w') as memory_file:
+        memory_file.write('traced memory: {} bytes, peak: {} bytes\n\n'.format(*traced_memory))
+        for stat in snapshot.statistics('lineno')[:_report_lines]:
+            memory_file.write('{}\n'.format(stat))
+    return path
+
+
+_profiler = None
+
+def install_profiler(directory, name):
+    '''Install the profiler of this process, writing reports into directory. Only the first call takes effect.'''
+    global _profiler  # pylint: disable=global-statement
+    if _profiler is None:
+        _profiler = Profiler(directory, name, os.environ.get('NNI_PROFILE_MODE', 'sample'))
+        _profiler.install()
+    return _profiler
@@ -18,10 +18,22 @@
 # OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 # ==================================================================================================
 
+import contextlib
+import io
 import logging
+import os
+import select
+import struct
 import threading
+import time
+import zlib
 from enum import Enum
-from .common import multi_thread_enabled
+
+from .telemetry import telemetry
+from .trace import TraceWriter
+from .transport import ADDRESS_ENV, ConnectionRestored, SocketTransport
+
+_logger = logging.getLogger(__name__)
 
 
 class CommandType(Enum):
@@ -37,19 +49,136 @@ class CommandType(Enum):
     # out
     Initialized = b'ID'
     NewTrialJob = b'TR'
+    NewTrialJobBatch = b'TB'
     SendTrialJobParameter = b'SP'
     NoMoreTrialJobs = b'NO'
     KillTrialJob = b'KI'
 
 
+IPC_VERSION = 2
+'''Highest frame format supported by this side of the pipe.
+
+Version 1 is the legacy format: 2 bytes command type, 6 ASCII digits payload length, payload.
+Version 2 is a binary format: 2 bytes command type, 1 byte version, 1 byte flags,
+4 bytes big-endian payload length, payload.
+Both headers are 8 bytes long, and the third byte of a version 1 header is always an ASCII digit,
+so incoming frames can be decoded without knowing the peer's version in advance.
+'''
+
+_header = struct.Struct('!2sBBI')
+_flag_compressed = 0x01
+_flag_more_chunks = 0x02
+_legacy_length_digits = b'0123456789'
+
+_chunk_size = 1 << 20
+'''Payloads larger than this are split into several version 2 frames'''
+_compress_threshold = 1 << 16
+'''Payloads larger than this are compressed with zlib in version 2 frames'''
+
+_batch_commands = {
+    CommandType.NewTrialJob: CommandType.NewTrialJobBatch
+}
+'''key: command type; value: command type carrying a JSON array of the former's payloads'''
+
+_out_version = 1
+'''Frame format used for outgoing commands.
+Starts with version 1, and is upgraded once the peer sends a version 2 frame,
+which it only does after the Initialized command announced our IPC_VERSION.
+'''
+
+_lock = threading.Lock()
+
+_muted = False
+'''If True, outgoing commands are dropped, used when replaying the journal on resume'''
+_send_observer = None
+'''Function invoked with (command, data) for every outgoing command, see set_send_observer()'''
+_trace = None
+'''TraceWriter recording all commands, see start_trace()'''
+
 try:
-    _in_file = open(3, 'rb')
-    _out_file = open(4, 'wb')
-    _lock = threading.Lock()
+    if os.environ.get(ADDRESS_ENV):
+        # connected on first use, so trial code inheriting the environment does not take over the connection
+        _in_file = _out_file = SocketTransport(os.environ[ADDRESS_ENV])
+    else:
+        _in_file = open(3, 'rb')
+        _out_file = open(4, 'wb')
 except OSError:
-    _msg = 'IPC pipeline not exists, maybe you are importing tuner/assessor from trial code?'
-    import logging
-    logging.getLogger(__name__).warning(_msg)
+    _logger.warning('IPC pipeline not exists, maybe you are importing tuner/assessor from trial code?')
+
+
+def initialized_payload():
+    """Returns the payload of Initialized command, which announces the supported frame format."""
+    return '{"ipc_version": %d}' % IPC_VERSION
+
+
+def set_send_observer(observer):
+    """Register a function invoked with (command, data) for every command sent to Training Service.
+    Commands of a batch are reported one by one. Pass None to unregister.
+    """
+    global _send_observer  # pylint: disable=global-statement
+    _send_observer = observer
+
+
+def start_trace(path):
+    """Record all commands received from and sent to Training Service to a trace file, for nni.replay."""
+    global _trace  # pylint: disable=global-statement
+    stop_trace()
+    _trace = TraceWriter(path)
+
+
+def stop_trace():
+    global _trace  # pylint: disable=global-statement
+    if _trace is not None:
+        _trace.close()
+        _trace = None
+
+
+@contextlib.contextmanager
+def muted():
+    """Drop all outgoing commands in the context."""
+    global _muted  # pylint: disable=global-statement
+    _muted = True
+    try:
+        yield
+    finally:
+        _muted = False
+
+
+def _encode(command, data):
+    """Encode a command to bytes with current outgoing frame format.
+    command: CommandType object.
+    data: bytes payload.
+    """
+    telemetry.observe_payload('out', command, len(data))
+    with telemetry.timed('serialization'):
+        return _encode_frames(command, data)
+
+
+def _encode_frames(command, data):
+    if _out_version < 2:
+        assert len(data) < 1000000, 'Command too long'
+        return b'%b%06d%b' % (command.value, len(data), data)
+
+    flags = 0
+    if len(data) > _compress_threshold:
+        data = zlib.compress(data)
+        flags |= _flag_compressed
+    chunks = [data[i:i + _chunk_size] for i in range(0, len(data), _chunk_size)] or [b'']
+    frames = []
+    for i, chunk in enumerate(chunks):
+        chunk_flags = flags if i == len(chunks) - 1 else flags | _flag_more_chunks
+        frames.append(_header.pack(command.value, 2, chunk_flags, len(chunk)))
+        frames.append(chunk)
+    return b''.join(frames)
+
+
+def _write(msg):
+    # handlers may send from several threads in multi-thread and async mode
+    with _lock:
+        _logger.debug('Sending command, data: [%s]', msg)
+        with telemetry.timed('pipe_write'):
+            _out_file.write(msg)
+            _out_file.flush()
 
 
 def send(command, data):
@@ -57,34 +186,158 @@ def send(command, data):
     command: CommandType object.
     data: string payload.
     """
-    global _lock
+    if _muted:
+        return
+    if _send_observer is not None:
+        _send_observer(command, data)
+    if _trace is not None:
+        _trace.append(command, data, inbound=False)
+    _write(_encode(command, data.encode('utf8')))
+
+
+def send_batch(command, data_list):
+    """Send several commands of the same type to Training Service with a single write.
+    If the peer supports version 2 frames and the command has a batch counterpart,
+    all payloads are merged into one batch command.
+    command: CommandType object.
+    data_list: list of string payloads, each one must be a JSON string.
+    """
+    if not data_list or _muted:
+        return
+    if _send_observer is not None:
+        for data in data_list:
+            _send_observer(command, data)
+    if _trace is not None:
+        for data in data_list:
+            _trace.append(command, data, inbound=False)
+    if _out_version >= 2 and command in _batch_commands:
+        data = '[' + ','.join(data_list) + ']'
+        _write(_encode(_batch_commands[command], data.encode('utf8')))
+    else:
+        _write(b''.join(_encode(command, data.encode('utf8')) for data in data_list))
+
+
+def _parse_header(header):
+    """Returns a tuple of command type (bytes), frame version, flags and payload length."""
+    if header[2] in _legacy_length_digits:
+        return header[:2], 1, 0, int(header[2:])
+    command, version, flags, length = _header.unpack(header)
+    if version != 2:
+        raise ValueError('Unsupported IPC frame version: %d' % version)
+    return command, version, flags, length
+
+
+def _read_frame():
+    """Read one frame from Training Service.
+    Returns a tuple of command type (bytes), frame version, flags and payload, or None on pipe EOF.
+    """
+    header = _in_file.read(8)
+    _logger.debug('Received command, header: [%s]', header)
+    if header is None or len(header) < 8:
+        return None
+    command, version, flags, length = _parse_header(header)
+    # waiting for the header is idle time, only reading the payload is counted
+    with telemetry.timed('pipe_read'):
+        data = _in_file.read(length)
+    return command, version, flags, data
+
+
+async def _read_frame_async(reader):
+    """Coroutine version of _read_frame(), reading from an asyncio.StreamReader."""
+    import asyncio  # only imported in async mode
     try:
-        if multi_thread_enabled():
-            _lock.acquire()
-        data = data.encode('utf8')
-        assert len(data) < 1000000, 'Command too long'
-        msg = b'%b%06d%b' % (command.value, len(data), data)
-        logging.getLogger(__name__).debug('Sending command, data: [%s]' % msg)
-        _out_file.write(msg)
-        _out_file.flush()
+        header = await reader.readexactly(8)
+    except asyncio.IncompleteReadError:
+        return None
+    _logger.debug('Received command, header: [%s]', header)
+    command, version, flags, length = _parse_header(header)
+    start = time.perf_counter()
+    data = await reader.readexactly(length)
+    telemetry.add_time('pipe_read', time.perf_counter() - start)
+    return command, version, flags, data
+
+
+def _decode(command, version, flags, chunks):
+    """Assemble the chunks of a command and decode it.
+    Returns a tuple of command (CommandType) and payload (str)
+    """
+    global _out_version  # pylint: disable=global-statement
+    start = time.perf_counter()
+    data = b''.join(chunks)
+    if flags & _flag_compressed:
+        data = zlib.decompress(data)
+    _out_version = max(_out_version, version)
+    command = CommandType(command)
+    telemetry.observe_payload('in', command, len(data))
+    data = data.decode('utf8')
+    telemetry.add_time('serialization', time.perf_counter() - start)
+    _logger.debug('Received command, data: [%s]', data)
+    if _trace is not None:
+        _trace.append(command, data, inbound=True)
+    return command, data
+
+
+def has_input():
+    """Returns True if there is incoming data ready, so that receive() will not wait for Training Service.
+    Both data waiting in the pipe or socket and data already read into the buffer of the incoming file count.
+    """
+    try:
+        fileno = _in_file.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return True  # in-memory stream, reading never blocks
+    if select.select([fileno], [], [], 0)[0]:
+        return True
+    # the buffered reader may hold the rest of a read which select() does not see,
+    # peek() reads the file if the buffer is empty, so it must not block
+    blocking = os.get_blocking(fileno)
+    if blocking:
+        os.set_blocking(fileno, False)
+    try:
+        return len(_in_file.peek(1)) > 0
+    except BlockingIOError:
+        return False
     finally:
-        if multi_thread_enabled():
-            _lock.release()
+        if blocking:
+            os.set_blocking(fileno, True)
 
 
 def receive():
     """Receive a command from Training Service.
     Returns a tuple of command (CommandType) and payload (str)
     """
-    header = _in_file.read(8)
-    logging.getLogger(__name__).debug('Received command, header: [%s]' % header)
-    if header is None or len(header) < 8:
-        # Pipe EOF encountered
-        logging.getLogger(__name__).debug('Pipe EOF encountered')
-        return None, None
-    length = int(header[2:])
-    data = _in_file.read(length)
-    command = CommandType(header[:2])
-    data = data.decode('utf8')
-    logging.getLogger(__name__).debug('Received command, data: [%s]' % data)
-    return command, data
+    while True:
+        try:
+            return _receive()
+        except ConnectionRestored:
+            _logger.warning('Connection to NNI manager is restored, waiting for commands')
+
+
+def _receive():
+    frame = _read_frame()
+    chunks = []
+    while frame is not None:
+        command, version, flags, data = frame
+        chunks.append(data)
+        if not flags & _flag_more_chunks:
+            return _decode(command, version, flags, chunks)
+        frame = _read_frame()
+    # Pipe EOF encountered
+    _logger.debug('Pipe EOF encountered')
+    return None, None
+
+
+async def receive_async(reader):
+    """Receive a command from Training Service without blocking the event loop.
+    reader: asyncio.StreamReader connected to the incoming pipe.
+    Returns a tuple of command (CommandType) and payload (str)
+    """
+    frame = await _read_frame_async(reader)
+    chunks = []
+    while frame is not None:
+        command, version, flags, data = frame
+        chunks.append(data)
+        if not flags & _flag_more_chunks:
+            return _decode(command, version, flags, chunks)
+        frame = await _read_frame_async(reader)
+    _logger.debug('Pipe EOF encountered')
+    return None, None
@@ -0,0 +1,258 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+'''
+replay.py
+
+Replay a trace recorded with the --ipc_trace option of the dispatcher (or NNI_IPC_TRACE environment variable)
+into a tuner, assessor or advisor in this process, without NNI manager and training service.
+Reports handler latency percentiles, memory growth and the decisions differing from the recorded ones.
+
+Example:
+    python -m nni.replay experiment.trace --tuner_class_name TPE --tuner_args '{"optimize_mode": "maximize"}'
+'''
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from . import codec
+from . import protocol
+from .__main__ import add_dispatcher_arguments, create_dispatcher
+from .common import enable_multi_thread, enable_async_mode
+from .protocol import CommandType
+from .trace import read_trace
+
+_logger = logging.getLogger(__name__)
+
+
+class ReplayReport:
+    def __init__(self):
+        self.commands = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        self.latencies = defaultdict(list)  # key: command name; value: list of handler seconds
+        self.suggestion_latencies = []      # handler seconds of RequestTrialJobs per requested parameter
+        self.rss_growth = None              # growth of peak resident set size in bytes
+        self.allocated_growth = None        # growth of memory allocated by Python in bytes, with trace_memory
+        self.allocated_peak = None
+        self.decisions = {}                 # key: command name; value: (recorded count, replayed count, differing count)
+        self.diffs = []                     # list of (command name, index, recorded payload, replayed payload)
+
+
+def replay(dispatcher, records, realtime=False, trace_memory=False):
+    '''
+    Feed the inbound commands of a trace to dispatcher.run() through a pipe, and compare the outbound ones.
+    dispatcher: MsgDispatcherBase object, which is not started yet.
+    records: iterable of (offset, command, data, inbound), see nni.trace.read_trace().
+    realtime: if True, commands are fed at the recorded time offsets, otherwise as fast as possible.
+    Returns a ReplayReport object.
+    '''
+    records = list(records)
+    report = ReplayReport()
+    replayed = []
+
+    handle_command = dispatcher.handle_command
+    def timed_handle_command(command, data):
+        start = time.perf_counter()
+        try:
+            return handle_command(command, data)
+        except Exception:  # pylint: disable=broad-except
+            # keep replaying, the error is reported as in production but does not stop the dispatcher
+            _logger.exception('Error in handling command %s', command)
+            report.errors += 1
+        finally:
+            seconds = time.perf_counter() - start
+            report.latencies[command.name].append(seconds)
+            if command is CommandType.RequestTrialJobs and data:
+                report.suggestion_latencies.append(seconds / data)
+    dispatcher.handle_command = timed_handle_command
+
+    read_fd, write_fd = os.pipe()
+    saved_files = getattr(protocol, '_in_file', None), getattr(protocol, '_out_file', None), protocol._out_version
+    protocol._in_file = open(read_fd, 'rb')
+    protocol._out_file = open(os.devnull, 'wb')
+    # NNI manager upgrades to version 2 frames after Initialized, so are the commands fed here
+    protocol._out_version = protocol.IPC_VERSION
+    protocol.set_send_observer(lambda command, data: replayed.append((command, data)))
+
+    feeder = threading.Thread(target=_feed, args=(records, write_fd, realtime, report), daemon=True)
+    if trace_memory:
+        tracemalloc.start()
+    allocated_base = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+    rss_base = _peak_rss()
+    start = time.perf_counter()
+    try:
+        feeder.start()
+        dispatcher.run()
+        feeder.join()
+    finally:
+        report.elapsed = time.perf_counter() - start
+        if rss_base is not None:
+            report.rss_growth = _peak_rss() - rss_base
+        if trace_memory:
+            allocated, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report.allocated_growth = allocated - allocated_base
+            report.allocated_peak = peak - allocated_base
+        protocol.set_send_observer(None)
+        protocol._in_file.close()
+        protocol._out_file.close()
+        protocol._in_file, protocol._out_file, protocol._out_version = saved_files
+        dispatcher.handle_command = handle_command
+
+    recorded = [(CommandType(command), data) for _, command, data, inbound in records if not inbound]
+    _compare_decisions(report, recorded, replayed)
+    return report
+
+
+def _feed(records, write_fd, realtime, report):
+    start = time.perf_counter()
+    with open(write_fd, 'wb') as pipe:
+        for offset, command, data, inbound in records:
+            if not inbound:
+                continue
+            if command == CommandType.Terminate.value:
+                break  # closing the pipe terminates the dispatcher without exiting this process
+            if realtime:
+                delay = offset - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            try:
+                pipe.write(protocol._encode_frames(CommandType(command), data.encode('utf8')))
+                pipe.flush()
+            except BrokenPipeError:
+                _logger.error('Dispatcher stopped before the end of trace')
+                return
+            report.commands += 1
+
+
+def _peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # kilobytes on Linux
+
+
+def _normalize(data):
+    try:
+        return codec.loads(data)
+    except ValueError:
+        return data
+
+
+def _compare_decisions(report, recorded, replayed):
+    '''Compare the outbound commands of each type in order'''
+    recorded_payloads = defaultdict(list)
+    replayed_payloads = defaultdict(list)
+    for command, data in recorded:
+        recorded_payloads[command.name].append(data)
+    for command, data in replayed:
+        replayed_payloads[command.name].append(data)
+    for name in sorted(set(recorded_payloads) | set(replayed_payloads)):
+        recorded_list = recorded_payloads[name]
+        replayed_list = replayed_payloads[name]
+        differing = 0
+        for i in range(max(len(recorded_list), len(replayed_list))):
+            recorded_data = recorded_list[i] if i < len(recorded_list) else None
+            replayed_data = replayed_list[i] if i < len(replayed_list) else None
+            if recorded_data is None or replayed_data is None or _normalize(recorded_data) != _normalize(replayed_data):
+                differing += 1
+                report.diffs.append((name, i, recorded_data, replayed_data))
+        report.decisions[name] = (len(recorded_list), len(replayed_list), differing)
+
+
+def _percentile(values, percent):
+    '''Nearest-rank percentile of sorted values'''
+    return values[max(0, min(len(values) - 1, int(round(percent / 100 * len(values))) - 1))]
+
+
+def print_report(report, max_diffs=10, file=None):
+    '''file: defaults to sys.stdout'''
+    def output(line=''):
+        print(line, file=file or sys.stdout)
+
+    output('Replayed %d commands in %.3f seconds, %d handler errors' % (report.commands, report.elapsed, report.errors))
+    output()
+    row_format = '%-24s %8s %10s %10s %10s %10s'
+    output(row_format % ('handler', 'count', 'p50 (ms)', 'p90 (ms)', 'p99 (ms)', 'max (ms)'))
+    rows = sorted(report.latencies.items())
+    if report.suggestion_latencies:
+        rows.append(('per suggestion', report.suggestion_latencies))
+    for name, latencies in rows:
+        latencies = sorted(latencies)
+        output(row_format % ((name, len(latencies)) + tuple('%.3f' % (_percentile(latencies, percent) * 1000)
+                                                           for percent in (50, 90, 99, 100))))
+    output()
+    if report.rss_growth is not None:
+        output('Peak RSS growth: %.1f MB' % (report.rss_growth / 2 ** 20))
+    if report.allocated_growth is not None:
+        output('Allocated memory growth: %.1f MB, peak %.1f MB' % \
+              (report.allocated_growth / 2 ** 20, report.allocated_peak / 2 ** 20))
+    output()
+    row_format = '%-24s %10s %10s %10s'
+    output(row_format % ('decision', 'recorded', 'replayed', 'differing'))
+    for name, counts in sorted(report.decisions.items()):
+        output(row_format % ((name,) + counts))
+    for name, index, recorded_data, replayed_data in report.diffs[:max_diffs]:
+        output()
+        output('%s #%d' % (name, index))
+        output('  recorded: %s' % recorded_data)
+        output('  replayed: %s' % replayed_data)
+    if len(report.diffs) > max_diffs:
+        output()
+        output('... %d more differing decisions' % (len(report.diffs) - max_diffs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a dispatcher trace into a tuner, assessor or advisor.')
+    parser.add_argument('trace', help='Trace file recorded with --ipc_trace')
+    add_dispatcher_arguments(parser)
+    parser.add_argument('--multi_thread', action='store_true')
+    parser.add_argument('--async_mode', action='store_true')
+    parser.add_argument('--realtime', action='store_true',
+                        help='Feed commands at recorded speed instead of as fast as possible')
+    parser.add_argument('--trace_memory', action='store_true',
+                        help='Measure memory allocated by Python with tracemalloc, which slows down the replay')
+    parser.add_argument('--max_diffs', type=int, default=10,
+                        help='Number of differing decisions to print')
+    args = parser.parse_args()
+    if args.multi_thread:
+        enable_multi_thread()
+    if args.async_mode:
+        enable_async_mode()
+
+    dispatcher, _, _ = create_dispatcher(args)
+    report = replay(dispatcher, read_trace(args.trace), args.realtime, args.trace_memory)
+    # running the dispatcher redirects stdout to dispatcher.log
+    print_report(report, args.max_diffs, sys.__stdout__)
+
+
+if __name__ == '__main__':
+    main()
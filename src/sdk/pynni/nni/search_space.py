@@ -0,0 +1,286 @@
+# Copyright (c) Microsoft Corporation
+# All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and
+# to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+'''
+search_space.py
+
+Compiles a JSON search space once into a flat list of typed dimensions,
+which tuners sample, decode and encode without walking the JSON again.
+
+Every '_type' node of the search space is a dimension, named like 'root[key]-uniform'.
+The options of a 'choice' named 'root[key]-choice' are prefixed 'root[key]-choice[i]',
+and the dimensions inside an option are only active when the choice picks that option.
+A choice is sampled as the index of its option.
+'''
+
+from collections import namedtuple
+import copy
+import numbers
+
+from . import parameter_expressions
+
+ROOT = 'root'
+TYPE = '_type'
+VALUE = '_value'
+INDEX = '_index'
+
+
+def _choice_index(options, random_state, size=None):
+    return parameter_expressions.randint(len(options), random_state, size)
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+def _in_range(low, high, *_):
+    return lambda value: _is_number(value) and low <= value <= high
+
+
+def _positive(*_):
+    return lambda value: _is_number(value) and value > 0
+
+
+_contains = {
+    'randint': lambda upper: lambda value: _is_number(value) and value == int(value) and 0 <= value < upper,
+    'uniform': _in_range,
+    'quniform': _in_range,
+    'loguniform': _in_range,
+    'qloguniform': _in_range,
+    'normal': lambda *_: _is_number,
+    'qnormal': lambda *_: _is_number,
+    'lognormal': _positive,
+    'qlognormal': lambda *_: lambda value: _is_number(value) and value >= 0
+}
+'''Predicates of the values each type of dimension can take'''
+
+
+Dimension = namedtuple('Dimension', ['index', 'name', 'type', 'args', 'parent', 'option'])
+Dimension.__doc__ = '''
+A '_type' node of the search space.
+parent: index of the choice dimension this one is nested in, or None at the top level
+option: index of the option of the parent choice that activates this dimension
+'''
+
+
+class _Constant:
+    def __init__(self, value):
+        self.value = value
+        self.immutable = isinstance(value, (str, int, float, bool, type(None)))
+
+    def decode(self, row, with_index):
+        return self.value if self.immutable else copy.deepcopy(self.value)
+
+    def encode(self, config, row):
+        pass
+
+    def match(self, value, row):
+        return value == self.value
+
+
+class _Parameter:
+    def __init__(self, dim, contains):
+        self.dim = dim
+        self.contains = contains
+
+    def decode(self, row, with_index):
+        return row[self.dim]
+
+    def encode(self, config, row):
+        row[self.dim] = config
+
+    def match(self, value, row):
+        if not self.contains(value):
+            return False
+        row[self.dim] = value
+        return True
+
+
+class _Choice:
+    def __init__(self, dim, options):
+        self.dim = dim
+        self.options = options
+
+    def decode(self, row, with_index):
+        index = row[self.dim]
+        value = self.options[index].decode(row, with_index)
+        return {INDEX: index, VALUE: value} if with_index else value
+
+    def encode(self, config, row):
+        index = config[INDEX]
+        row[self.dim] = index
+        self.options[index].encode(config[VALUE], row)
+
+    def match(self, value, row):
+        for index, option in enumerate(self.options):
+            option_row = list(row)
+            if option.match(value, option_row):
+                row[:] = option_row
+                row[self.dim] = index
+                return True
+        return False
+
+
+class _Dict:
+    def __init__(self, items):
+        self.items = items
+
+    def decode(self, row, with_index):
+        return {key: node.decode(row, with_index) for key, node in self.items}
+
+    def encode(self, config, row):
+        for key, node in self.items:
+            node.encode(config[key], row)
+
+    def match(self, value, row):
+        if not isinstance(value, dict) or len(value) != len(self.items):
+            return False
+        return all(key in value and node.match(value[key], row) for key, node in self.items)
+
+
+class _List:
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def decode(self, row, with_index):
+        return [node.decode(row, with_index) for node in self.nodes]
+
+    def encode(self, config, row):
+        for node, value in zip(self.nodes, config):
+            node.encode(value, row)
+
+    def match(self, value, row):
+        if not isinstance(value, (list, tuple)) or len(value) != len(self.nodes):
+            return False
+        return all(node.match(item, row) for node, item in zip(self.nodes, value))
+
+
+class SearchSpacePlan:
+    '''
+    A compiled search space. Configurations come in two formats:
+    with_index=True wraps the value of every choice as {'_index': i, '_value': value},
+    which is what the tuners keep to find the options again; with_index=False is what trials receive.
+    '''
+    def __init__(self, search_space):
+        self.dimensions = []
+        self.names = {}
+        self._calls = []
+        self._root = self._compile(search_space, ROOT, None, None)
+
+    def _compile(self, spec, name, parent, option):
+        if isinstance(spec, dict):
+            if TYPE in spec:
+                _type = spec[TYPE]
+                if _type not in parameter_expressions.EXPRESSIONS:
+                    raise ValueError('Unknown type {} of {} in search space'.format(_type, name))
+                name = name + '-' + _type
+                dim = Dimension(len(self.dimensions), name, _type, list(spec[VALUE]), parent, option)
+                self.dimensions.append(dim)
+                self.names[name] = dim
+                if _type == 'choice':
+                    self._calls.append((_choice_index, [dim.args]))
+                else:
+                    self._calls.append((parameter_expressions.EXPRESSIONS[_type], dim.args))
+                if _type == 'choice':
+                    return _Choice(dim.index, [self._compile(value, name + '[%d]' % i, dim.index, i)
+                                               for i, value in enumerate(dim.args)])
+                return _Parameter(dim.index, _contains[_type](*dim.args))
+            return _Dict([(key, self._compile(value, name + '[%s]' % str(key), parent, option))
+                          for key, value in spec.items()])
+        if isinstance(spec, list):
+            return _List([self._compile(value, name + '[%d]' % i, parent, option)
+                          for i, value in enumerate(spec)])
+        return _Constant(spec)
+
+    def sample_columns(self, n, random_state):
+        '''
+        Sample n values of every dimension at once, inactive or not.
+        Returns one numpy array per dimension, in the order of self.dimensions.
+        '''
+        return [expression(*(args + [random_state]), size=n) for expression, args in self._calls]
+
+    def sample(self, n, random_state, with_index=False):
+        '''Sample n configurations'''
+        columns = [column.tolist() for column in self.sample_columns(n, random_state)]
+        if not columns:
+            return [self._root.decode((), with_index) for _ in range(n)]
+        return [self._root.decode(row, with_index) for row in zip(*columns)]
+
+    def decode(self, row, with_index=False):
+        '''Configuration of a row holding a value per dimension, indexed like self.dimensions'''
+        return self._root.decode(row, with_index)
+
+    def decode_values(self, values, with_index=False):
+        '''Configuration of a dict from dimension names to values'''
+        return self._root.decode([values.get(dim.name) for dim in self.dimensions], with_index)
+
+    def add_index(self, params):
+        '''
+        Configuration in the with_index format of parameters a trial received, e.g. from a previous experiment,
+        or None if they are not in this search space. The first matching option of a choice is taken.
+        '''
+        row = [None] * len(self.dimensions)
+        if not self._root.match(params, row):
+            return None
+        return self._root.decode(row, True)
+
+    def _encode_row(self, config):
+        row = [None] * len(self.dimensions)
+        self._root.encode(config, row)
+        return row
+
+    def encode(self, config):
+        '''
+        Dict from the names of the active dimensions of a configuration in the with_index format to their values,
+        the inverse of decode_values
+        '''
+        row = self._encode_row(config)
+        return {dim.name: row[dim.index] for dim in self.dimensions if row[dim.index] is not None}
+
+    def resample(self, config, names, random_state, with_index=True):
+        '''
+        Copy of a configuration in the with_index format in which the named dimensions,
+        and all those nested in them, are sampled again.
+        '''
+        old = self._encode_row(config)
+        new = [column[0] for column in self.sample_columns(1, random_state)]
+        row = [None] * len(self.dimensions)
+        fresh = [False] * len(self.dimensions)
+        for dim in self.dimensions:  # a choice always comes before the dimensions nested in it
+            fresh[dim.index] = dim.name in names or old[dim.index] is None \
+                or (dim.parent is not None and fresh[dim.parent])
+            row[dim.index] = new[dim.index].item() if fresh[dim.index] else old[dim.index]
+        return self._root.decode(row, with_index)
+
+
+def compile_search_space(search_space):
+    '''Compile a JSON search space, see SearchSpacePlan'''
+    return SearchSpacePlan(search_space)
+
+
+def split_index(params):
+    '''Drop the '_index' of the choices at the top level of a configuration'''
+    result = {}
+    for key in params:
+        if isinstance(params[key], dict):
+            value = params[key][VALUE]
+        else:
+            value = params[key]
+        result[key] = value
+    return result
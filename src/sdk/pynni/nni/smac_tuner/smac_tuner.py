@@ -21,9 +21,11 @@
 smac_tuner.py
 '''
 
+import nni
 from nni.tuner import Tuner
 
 import sys
+import json
 import logging
 import numpy as np
 import json_tricks
@@ -57,6 +59,8 @@ class SMACTuner(Tuner):
         self.smbo_solver = None
         self.first_one = True
         self.update_ss_done = False
+        self.challengers = None
+        '''challengers of the latest model, which is fit again after new results are received'''
 
     def _main_cli(self):
         '''
@@ -149,6 +153,56 @@ class SMACTuner(Tuner):
             self.first_one = False
         else:
             self.smbo_solver.nni_smac_receive_runs(self.total_data[parameter_id], reward)
+        self.challengers = None
+
+    def import_data(self, data):
+        '''
+        Add the trials of a previous experiment to the run history of SMAC
+        data: list of dict {'parameter': parameters of a trial, 'value': its final result}
+        '''
+        imported = 0
+        for trial in data:
+            config = self._to_configuration(trial['parameter'])
+            if config is None:
+                self.logger.debug('Imported parameters %s are not in search space, skipped', trial['parameter'])
+                continue
+            reward = self.extract_scalar_reward(trial['value'])
+            if self.optimize_mode is OptimizeMode.Maximize:
+                reward = -reward
+            if self.first_one:
+                self.smbo_solver.nni_smac_receive_first_run(config, reward)
+                self.first_one = False
+            else:
+                self.smbo_solver.nni_smac_receive_runs(config, reward)
+            imported += 1
+        self.challengers = None
+        self.logger.info('Imported %d of %d trials', imported, len(data))
+
+    def _to_configuration(self, parameters):
+        '''
+        ConfigSpace configuration of trial parameters, or None if they are not in the configuration space.
+        Choices are categorical hyperparameters whose values are the JSON of the options in the search space.
+        '''
+        from ConfigSpace import Configuration
+        from ConfigSpace.hyperparameters import CategoricalHyperparameter
+        config_space = self.optimizer.scenario.cs
+        values = {}
+        for name, value in parameters.items():
+            try:
+                hyperparameter = config_space.get_hyperparameter(name)
+            except KeyError:
+                return None
+            if isinstance(hyperparameter, CategoricalHyperparameter):
+                matches = [choice for choice in hyperparameter.choices
+                           if choice == value or str(choice) == json.dumps(value)]
+                if not matches:
+                    return None
+                value = matches[0]
+            values[name] = value
+        try:
+            return Configuration(config_space, values=values)
+        except (ValueError, TypeError):
+            return None
 
     def generate_parameters(self, parameter_id):
         '''
@@ -160,11 +214,12 @@ class SMACTuner(Tuner):
             json_tricks.dumps(init_challenger.get_dictionary())
             return init_challenger.get_dictionary()
         else:
-            challengers = self.smbo_solver.nni_smac_request_challengers()
-            for challenger in challengers:
-                self.total_data[parameter_id] = challenger
-                json_tricks.dumps(challenger.get_dictionary())
-                return challenger.get_dictionary()
+            challenger = self._next_challenger()
+            if challenger is None:
+                raise nni.NoMoreTrialError('SMAC has no more challengers')
+            self.total_data[parameter_id] = challenger
+            json_tricks.dumps(challenger.get_dictionary())
+            return challenger.get_dictionary()
 
     def generate_multiple_parameters(self, parameter_id_list):
         '''
@@ -178,14 +233,25 @@ class SMACTuner(Tuner):
                 json_tricks.dumps(init_challenger.get_dictionary())
                 params.append(init_challenger.get_dictionary())
         else:
-            challengers = self.smbo_solver.nni_smac_request_challengers()
-            cnt = 0
             params = []
-            for challenger in challengers:
-                if cnt >= len(parameter_id_list):
+            for one_id in parameter_id_list:
+                challenger = self._next_challenger()
+                if challenger is None:
                     break
-                self.total_data[parameter_id_list[cnt]] = challenger
+                self.total_data[one_id] = challenger
                 json_tricks.dumps(challenger.get_dictionary())
                 params.append(challenger.get_dictionary())
-                cnt += 1
         return params
+
+    def _next_challenger(self):
+        '''
+        Next challenger of the model, or None if there is none.
+        The model is only fit again by nni_smac_request_challengers when new results were received,
+        or when all challengers of the latest fit are taken.
+        '''
+        if self.challengers is not None:
+            challenger = next(self.challengers, None)
+            if challenger is not None:
+                return challenger
+        self.challengers = iter(self.smbo_solver.nni_smac_request_challengers())
+        return next(self.challengers, None)
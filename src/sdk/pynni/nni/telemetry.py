@@ -0,0 +1,176 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+telemetry.py
+
+Counters of where the dispatcher spends its time, exported in Prometheus text format.
+'''
+
+import bisect
+import contextlib
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+_logger = logging.getLogger(__name__)
+
+METRICS_FILE = 'dispatcher_metrics.prom'
+'''Name of the metrics file in NNI_LOG_DIRECTORY'''
+
+_latency_buckets = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+_size_buckets = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    '''Cumulative histogram with fixed bucket upper bounds, like a Prometheus histogram'''
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        ret = []
+        total = 0
+        for count in self.counts:
+            total += count
+            ret.append(total)
+        return ret
+
+
+class Telemetry:
+    '''
+    Handler latency and payload size histograms per command type, seconds spent in each phase
+    (tuner, assessor, serialization, pipe I/O) and gauges like the input backlog.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.handler_seconds = defaultdict(lambda: Histogram(_latency_buckets))  # key: command name
+        self.payload_bytes = defaultdict(lambda: Histogram(_size_buckets))      # key: (direction, command name)
+        self.phase_seconds = defaultdict(float)                                 # key: phase
+        self.gauges = {}                                                        # key: name; value: function
+        self._exporter = None
+        self._stop_event = threading.Event()
+
+    def reset(self):
+        '''Clear the histograms and phase counters'''
+        with self._lock:
+            self.handler_seconds.clear()
+            self.payload_bytes.clear()
+            self.phase_seconds.clear()
+
+    def observe_handler(self, command, seconds):
+        with self._lock:
+            self.handler_seconds[command.name].observe(seconds)
+
+    def observe_payload(self, direction, command, size):
+        '''direction: 'in' or 'out' '''
+        with self._lock:
+            self.payload_bytes[(direction, command.name)].observe(size)
+
+    def add_time(self, phase, seconds):
+        with self._lock:
+            self.phase_seconds[phase] += seconds
+
+    @contextlib.contextmanager
+    def timed(self, phase):
+        '''Add the time spent in the context to a phase'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def set_gauge(self, name, func):
+        '''Report the return value of func as gauge nni_dispatcher_<name>'''
+        self.gauges[name] = func
+
+    def render(self):
+        '''Returns the metrics in Prometheus text format'''
+        lines = []
+        with self._lock:
+            lines.append('# HELP nni_dispatcher_handler_seconds Time spent in handling a command.')
+            lines.append('# TYPE nni_dispatcher_handler_seconds histogram')
+            for command, histogram in sorted(self.handler_seconds.items()):
+                _render_histogram(lines, 'nni_dispatcher_handler_seconds', 'command="%s"' % command, histogram)
+            lines.append('# HELP nni_dispatcher_payload_bytes Size of command payloads.')
+            lines.append('# TYPE nni_dispatcher_payload_bytes histogram')
+            for (direction, command), histogram in sorted(self.payload_bytes.items()):
+                labels = 'direction="%s",command="%s"' % (direction, command)
+                _render_histogram(lines, 'nni_dispatcher_payload_bytes', labels, histogram)
+            lines.append('# HELP nni_dispatcher_phase_seconds_total Time spent in tuner, assessor, serialization and pipe I/O.')
+            lines.append('# TYPE nni_dispatcher_phase_seconds_total counter')
+            for phase, seconds in sorted(self.phase_seconds.items()):
+                lines.append('nni_dispatcher_phase_seconds_total{phase="%s"} %r' % (phase, seconds))
+        for name, func in sorted(self.gauges.items()):
+            try:
+                value = func()
+            except Exception:  # pylint: disable=broad-except
+                _logger.exception('Failed to read gauge %s', name)
+                continue
+            lines.append('# TYPE nni_dispatcher_%s gauge' % name)
+            lines.append('nni_dispatcher_%s %r' % (name, value))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        '''Rewrite the metrics file atomically'''
+        with open(path + '.tmp', 'w') as metrics_file:
+            metrics_file.write(self.render())
+        os.replace(path + '.tmp', path)
+
+    def start_exporter(self, path, interval):
+        '''Rewrite the metrics file every interval seconds in a background thread'''
+        def export():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.write(path)
+                except OSError:
+                    _logger.exception('Failed to write metrics file %s', path)
+        self._stop_event.clear()
+        self._exporter = threading.Thread(target=export, daemon=True)
+        self._exporter.start()
+
+    def stop_exporter(self, path):
+        '''Stop the background thread and write the final metrics'''
+        if self._exporter is None:
+            return
+        self._stop_event.set()
+        self._exporter.join()
+        self._exporter = None
+        self.write(path)
+
+
+def _render_histogram(lines, name, labels, histogram):
+    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.cumulative_counts()):
+        lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, count))
+    lines.append('%s_sum{%s} %r' % (name, labels, histogram.sum))
+    lines.append('%s_count{%s} %d' % (name, labels, histogram.count))
+
+
+telemetry = Telemetry()
+'''Telemetry of this process'''
@@ -0,0 +1,77 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+'''
+trace.py
+'''
+
+import struct
+import threading
+import time
+
+_record = struct.Struct('!2sBdI')
+_inbound = 0
+_outbound = 1
+
+
+class TraceWriter:
+    '''
+    Records the commands exchanged with NNI manager, to be replayed by nni.replay.
+    Every record is 2 bytes command type, 1 byte direction, 8 bytes big-endian double of the seconds since
+    the trace is started, 4 bytes big-endian payload length and the payload.
+    Batches are recorded as the commands in them, so a trace does not depend on the negotiated frame format.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._lock = threading.Lock()  # handlers may send commands from several threads
+        self._start = time.perf_counter()
+
+    def append(self, command, data, inbound):
+        '''
+        command: CommandType object.
+        data: string payload.
+        '''
+        data = data.encode('utf8')
+        with self._lock:
+            if self._file is None:
+                return
+            offset = time.perf_counter() - self._start
+            self._file.write(_record.pack(command.value, _inbound if inbound else _outbound, offset, len(data)))
+            self._file.write(data)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_trace(path):
+    '''Yields (offset, command, data, inbound) of the records in a trace file, command is bytes'''
+    with open(path, 'rb') as trace_file:
+        while True:
+            header = trace_file.read(_record.size)
+            if len(header) < _record.size:
+                break
+            command, direction, offset, length = _record.unpack(header)
+            data = trace_file.read(length)
+            if len(data) < length:
+                break  # truncated by a crash of the recording dispatcher
+            yield offset, command, data.decode('utf8'), direction == _inbound
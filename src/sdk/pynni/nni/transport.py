@@ -0,0 +1,199 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+'''
+transport.py
+
+Socket connection to NNI manager, used instead of the pipes when the dispatcher is not a child of NNI manager.
+'''
+
+import logging
+import select
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+_logger = logging.getLogger(__name__)
+
+ADDRESS_ENV = 'NNI_DISPATCHER_ADDRESS'
+'''Environment variable of the socket address, 'unix:///path/to/socket' or 'tcp://host:port' '''
+
+
+class ConnectionRestored(ConnectionError):
+    '''The connection was lost and is established again, the partially received command is dropped'''
+
+
+def parse_address(address):
+    '''Returns a tuple of address family and socket address'''
+    url = urlsplit(address)
+    if url.scheme == 'unix' and (url.netloc or url.path):
+        return socket.AF_UNIX, url.netloc + url.path
+    if url.scheme == 'tcp' and url.hostname and url.port:
+        return socket.AF_INET, (url.hostname, url.port)
+    raise ValueError('Unsupported dispatcher address: %s' % address)
+
+
+class SocketTransport:
+    '''
+    File-like object used as both incoming and outgoing file of nni.protocol, connected to NNI manager
+    listening on a Unix domain socket or TCP address. Commands are framed as on the pipes.
+
+    The connection is established on first use, so importing nni.protocol does not connect,
+    and connecting is retried for connect_timeout seconds, so the dispatcher may start before NNI manager listens.
+    If the connection is lost, for example NNI manager restarts, it is established again within connect_timeout:
+    reading raises ConnectionRestored, and commands being sent are dropped, NNI manager initializes the new
+    connection again. Otherwise reading returns EOF, which terminates the dispatcher.
+    In async mode the socket is read by the event loop, so losing the connection terminates the dispatcher.
+    '''
+    def __init__(self, address, connect_timeout=60, retry_interval=1):
+        self.address = address
+        self.connect_timeout = connect_timeout
+        self.retry_interval = retry_interval
+        self._family, self._sockaddr = parse_address(address)
+        self._sock = None
+        self._reader = None  # buffered reader of _sock
+        self._generation = 0  # incremented on every connection
+        self._closed = False
+        self._lock = threading.Lock()  # reading and writing threads may both find the connection lost
+
+    def _connect(self):
+        deadline = time.time() + self.connect_timeout
+        while True:
+            try:
+                if self._family == socket.AF_UNIX:
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    try:
+                        sock.connect(self._sockaddr)
+                    except OSError:
+                        sock.close()
+                        raise
+                else:
+                    sock = socket.create_connection(self._sockaddr)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                break
+            except OSError:
+                if time.time() + self.retry_interval > deadline:
+                    raise
+                time.sleep(self.retry_interval)
+        self._sock = sock
+        self._reader = sock.makefile('rb')
+        self._generation += 1
+        _logger.info('Connected to NNI manager at %s', self.address)
+
+    def _connection(self):
+        '''Returns a tuple of socket, buffered reader and generation, or None after the connection is given up'''
+        with self._lock:
+            if self._closed:
+                return None
+            if self._sock is None:
+                try:
+                    self._connect()
+                except OSError:
+                    _logger.exception('Cannot connect to NNI manager at %s', self.address)
+                    self._closed = True
+                    return None
+            return self._sock, self._reader, self._generation
+
+    def _reconnect(self, generation):
+        '''Returns True if a new connection is established, by this thread or another one'''
+        with self._lock:
+            if self._closed:
+                return False
+            if generation != self._generation:
+                return True
+            _logger.warning('Connection to NNI manager at %s is lost, reconnecting', self.address)
+            self._close_socket()
+            try:
+                self._connect()
+            except OSError:
+                _logger.exception('Cannot reconnect to NNI manager at %s', self.address)
+                self._closed = True
+                return False
+            return True
+
+    def _close_socket(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = None
+            self._reader = None
+
+    def read(self, size):
+        connection = self._connection()
+        if connection is None:
+            return b''
+        _, reader, generation = connection
+        try:
+            data = reader.read(size)
+        except (OSError, ValueError):  # ValueError if another thread closed the reader
+            data = b''
+        if len(data) < size:
+            if self._reconnect(generation):
+                raise ConnectionRestored('Connection to NNI manager is restored')
+        return data
+
+    def peek(self, size):
+        '''Returns buffered data without consuming it, reading the socket only if the buffer is empty'''
+        connection = self._connection()
+        if connection is None:
+            return b''
+        try:
+            return connection[1].peek(size)
+        except ValueError:  # another thread closed the reader
+            return b''
+
+    def write(self, data):
+        connection = self._connection()
+        if connection is None:
+            raise BrokenPipeError('Connection to NNI manager is closed')
+        sock, _, generation = connection
+        try:
+            _send_all(sock, data)
+        except OSError:
+            if not self._reconnect(generation):
+                raise
+            _logger.warning('Connection to NNI manager is restored, a command of %d bytes is dropped', len(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def fileno(self):
+        connection = self._connection()
+        if connection is None:
+            raise OSError('Connection to NNI manager is closed')
+        return connection[0].fileno()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._close_socket()
+
+
+def _send_all(sock, data):
+    # the event loop sets the socket to non-blocking mode in async mode, so sendall() cannot be used
+    view = memoryview(data)
+    while view:
+        try:
+            sent = sock.send(view)
+        except BlockingIOError:
+            select.select([], [sock], [])
+            continue
+        view = view[sent:]
@@ -19,7 +19,7 @@
 # ==================================================================================================
 
 
-import json_tricks
+from . import codec
 
 from .common import env_args
 from . import platform
@@ -63,7 +63,7 @@ def report_intermediate_result(metric):
     """
     global _intermediate_seq
     assert _params is not None, 'nni.get_next_parameter() needs to be called before report_intermediate_result'
-    metric = json_tricks.dumps({
+    metric = codec.dumps({
         'parameter_id': _params['parameter_id'],
         'trial_job_id': env_args.trial_job_id,
         'type': 'PERIODICAL',
@@ -79,7 +79,7 @@ def report_final_result(metric):
     metric: serializable object.
     """
     assert _params is not None, 'nni.get_next_parameter() needs to be called before report_final_result'
-    metric = json_tricks.dumps({
+    metric = codec.dumps({
         'parameter_id': _params['parameter_id'],
         'trial_job_id': env_args.trial_job_id,
         'type': 'FINAL',
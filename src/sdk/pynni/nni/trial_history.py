@@ -0,0 +1,96 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+'''
+trial_history.py
+'''
+
+from collections.abc import Sequence
+
+
+class TrialHistory:
+    '''
+    Intermediate results of a trial.
+    Results may arrive out of order, the longest prefix without missing sequence number is kept in an array
+    and extended incrementally, so each result costs amortized O(1) instead of re-sorting the whole history.
+    '''
+    def __init__(self):
+        self._values = []
+        self._pending = {}  # results after the first missing sequence number
+        self.updated = False
+        '''Whether the ordered prefix is changed since the trial is assessed, maintained by the dispatcher'''
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, sequence, value):
+        '''Returns True if the ordered prefix is changed'''
+        if sequence < len(self._values):
+            self._values[sequence] = value
+            return True
+        self._pending[sequence] = value
+        if sequence != len(self._values):
+            return False
+        while len(self._values) in self._pending:
+            self._values.append(self._pending.pop(len(self._values)))
+        return True
+
+    def view(self):
+        '''Returns a read-only view of the ordered prefix, which does not grow with later results'''
+        return HistoryView(self._values, len(self._values))
+
+
+class HistoryView(Sequence):
+    '''
+    A read-only sequence of the first 'length' items of a list, created without copying the list
+    '''
+    __slots__ = ('_values', '_length')
+
+    def __init__(self, values, length):
+        self._values = values
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._values[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('history index out of range')
+        return self._values[index]
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self._values[i]
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __reduce__(self):
+        # only the visible part is sent to assessor worker processes
+        return (HistoryView, (self[:], self._length))
@@ -62,6 +62,17 @@ class Tuner(Recoverable):
         """
         raise NotImplementedError('Tuner: receive_trial_result not implemented')
 
+    def receive_trial_results(self, results):
+        """Invoked with the final results received together, before the next 'generate_parameters()'
+        or 'generate_multiple_parameters()'. In the default single thread mode, the dispatcher calls it once
+        with all final results since the last pass over received commands, override it to update the model
+        once per batch, or only mark it stale and refit when parameters are requested.
+        Calls 'receive_trial_result()' for each result by default.
+        results: list of tuple (parameter_id, parameters, value)
+        """
+        for parameter_id, parameters, value in results:
+            self.receive_trial_result(parameter_id, parameters, value)
+
     def receive_customized_trial_result(self, parameter_id, parameters, value):
         """Invoked when a trial added by WebUI reports its final result. Do nothing by default.
         parameter_id: int
@@ -70,6 +81,13 @@ class Tuner(Recoverable):
         """
         _logger.info('Customized trial job %s ignored by tuner', parameter_id)
 
+    def import_data(self, data):
+        """Invoked before the first trial with the final results of a previous experiment. Do nothing by default.
+        Called after 'update_search_space()', parameters that are not in the search space should be skipped.
+        data: list of dict {'parameter': parameters of a trial, 'value': its final result}
+        """
+        _logger.info('Imported data of %d trials ignored by tuner', len(data))
+
     def update_search_space(self, search_space):
         """Update the search space of tuner. Must override.
         search_space: JSON object
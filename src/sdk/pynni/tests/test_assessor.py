@@ -21,13 +21,18 @@
 
 import nni.protocol
 from nni.protocol import CommandType, send, receive
-from nni.assessor import Assessor, AssessResult
+from nni.assessor import Assessor, AssessResult, TrialBatch
+from nni.medianstop_assessor.medianstop_assessor import MedianstopAssessor
+from nni.metric_store import metric_store
 from nni.msg_dispatcher import MsgDispatcher
 
 from io import BytesIO
 import json
+import random
 from unittest import TestCase, main
 
+import numpy as np
+
 
 _trials = [ ]
 _end_trials = [ ]
@@ -44,6 +49,27 @@ class NaiveAssessor(Assessor):
         _end_trials.append((trial_job_id, success))
 
 
+_batches = [ ]
+
+class NaiveBatchAssessor(Assessor):
+    def assess_trials(self, batch):
+        _batches.append(list(batch.trial_job_ids))
+        values, lengths = batch.arrays()
+        return np.nansum(values, axis=1) % 2 == 0
+
+
+class FailingBatchAssessor(Assessor):
+    def assess_trials(self, batch):
+        raise ValueError('cannot assess a batch')
+
+    def assess_trial(self, trial_job_id, trial_history):
+        if trial_job_id == 'K':
+            raise ValueError('cannot assess K')
+        if trial_job_id == 'L':
+            return 'not a result'
+        return AssessResult.Bad
+
+
 _in_buf = BytesIO()
 _out_buf = BytesIO()
 
@@ -79,7 +105,9 @@ class AssessorTestCase(TestCase):
             self.assertIs(type(e), AssertionError)
             self.assertEqual(e.args[0], 'Unsupported command: CommandType.NewTrialJob')
 
-        self.assertEqual(_trials, ['A', 'B', 'A'])
+        # trial ends go first, each bringing the pending metrics of its trial,
+        # and the first metric of A is superseded by the second one
+        self.assertEqual(_trials, ['A', 'B'])
         self.assertEqual(_end_trials, [('A', False), ('B', True)])
 
         _reverse_io()
@@ -88,6 +116,139 @@ class AssessorTestCase(TestCase):
         self.assertEqual(data, '"A"')
         self.assertEqual(len(_out_buf.read()), 0)
 
+    def test_coalesce(self):
+        _in_buf.truncate(0)
+        _out_buf.truncate(0)
+        _reverse_io()
+        send(CommandType.ReportMetricData, '{"trial_job_id":"E","type":"PERIODICAL","sequence":0,"value":2}')
+        send(CommandType.ReportMetricData, '{"trial_job_id":"F","type":"PERIODICAL","sequence":0,"value":2}')
+        send(CommandType.ReportMetricData, '{"trial_job_id":"E","type":"PERIODICAL","sequence":2,"value":2}')
+        send(CommandType.ReportMetricData, '{"trial_job_id":"F","type":"PERIODICAL","sequence":1,"value":4}')
+        send(CommandType.ReportMetricData, '{"trial_job_id":"E","type":"PERIODICAL","sequence":1,"value":6}')
+        _restore_io()
+
+        del _trials[:]
+        MsgDispatcher(None, NaiveAssessor()).run()
+        # every trial is assessed once with its longest history, and all metrics are recorded
+        self.assertEqual(_trials, ['F', 'E'])
+        _reverse_io()
+        self.assertEqual(len(_out_buf.read()), 0)
+
+        _in_buf.truncate(0)
+        _out_buf.truncate(0)
+        _reverse_io()
+        send(CommandType.ReportMetricData, '{"trial_job_id":"E","type":"PERIODICAL","sequence":3,"value":1}')
+        _restore_io()
+        MsgDispatcher(None, NaiveAssessor()).run()
+        _reverse_io()
+        command, data = receive()
+        self.assertEqual((command, data), (CommandType.KillTrialJob, '"E"'))
+
+    def test_assessor_pool(self):
+        _in_buf.truncate(0)
+        _out_buf.truncate(0)
+        _reverse_io()
+        send(CommandType.ReportMetricData, '{"trial_job_id":"C","type":"PERIODICAL","sequence":0,"value":2}')
+        send(CommandType.ReportMetricData, '{"trial_job_id":"D","type":"PERIODICAL","sequence":0,"value":3}')
+        send(CommandType.TrialEnd, '{"trial_job_id":"C","event":"SUCCEEDED"}')
+        _restore_io()
+
+        dispatcher = MsgDispatcher(None, NaiveAssessor(), assessor_processes=2)
+        dispatcher.run()
+
+        _reverse_io()
+        command, data = receive()
+        self.assertIs(command, CommandType.KillTrialJob)
+        self.assertEqual(data, '"D"')
+        self.assertEqual(len(_out_buf.read()), 0)
+
+    def test_batch(self):
+        _in_buf.truncate(0)
+        _out_buf.truncate(0)
+        _reverse_io()
+        send(CommandType.ReportMetricData, '{"trial_job_id":"G","type":"PERIODICAL","sequence":0,"value":2}')
+        send(CommandType.ReportMetricData, '{"trial_job_id":"H","type":"PERIODICAL","sequence":0,"value":3}')
+        send(CommandType.ReportMetricData, '{"trial_job_id":"G","type":"PERIODICAL","sequence":1,"value":1}')
+        send(CommandType.ReportMetricData, '{"trial_job_id":"I","type":"PERIODICAL","sequence":0,"value":4}')
+        _restore_io()
+
+        del _batches[:]
+        MsgDispatcher(None, NaiveBatchAssessor()).run()
+        # all trials are assessed in one call once the received commands are handled,
+        # G goes after H as its first metric is superseded
+        self.assertEqual(_batches, [['H', 'G', 'I']])
+        _reverse_io()
+        self.assertEqual(receive(), (CommandType.KillTrialJob, '"H"'))
+        self.assertEqual(receive(), (CommandType.KillTrialJob, '"G"'))
+        self.assertEqual(len(_out_buf.read()), 0)
+
+    def test_batch_error(self):
+        _in_buf.truncate(0)
+        _out_buf.truncate(0)
+        _reverse_io()
+        for trial_job_id in 'JKLM':
+            send(CommandType.ReportMetricData,
+                 '{"trial_job_id":"%s","type":"PERIODICAL","sequence":0,"value":1}' % trial_job_id)
+        _restore_io()
+
+        MsgDispatcher(None, FailingBatchAssessor()).run()
+        # the trials are assessed one by one, and the errors of K and L do not prevent killing the others
+        _reverse_io()
+        self.assertEqual(receive(), (CommandType.KillTrialJob, '"J"'))
+        self.assertEqual(receive(), (CommandType.KillTrialJob, '"M"'))
+        self.assertEqual(len(_out_buf.read()), 0)
+
+    def test_batch_fallback(self):
+        # without assess_trial, single trials are assessed as batches of one
+        assessor = NaiveBatchAssessor()
+        self.assertIs(assessor.assess_trial('J', [1, 2]), False)
+        self.assertEqual(NaiveAssessor().assess_trials(TrialBatch(['K', 'L'], [[1], [2]])),
+                         [AssessResult.Bad, AssessResult.Good])
+
+    def test_medianstop_batch(self):
+        random.seed(0)
+        metric_store.reset()
+        self.addCleanup(metric_store.reset)
+        completed = [[random.random() for _ in range(random.randint(2, 10))] for _ in range(20)]
+        for i, history in enumerate(completed):
+            metric_store.record_history(str(i), history)
+            metric_store.trial_ended(str(i), i % 4 != 0)
+        averages = [np.cumsum(history) / np.arange(1, len(history) + 1)
+                    for i, history in enumerate(completed) if i % 4 != 0]
+        running = []
+        for _ in range(50):
+            offset = random.uniform(-0.5, 0.5)
+            running.append([random.random() + offset for _ in range(random.randint(1, 12))])
+        ids = ['running-%d' % i for i in range(len(running))]
+
+        for optimize_mode in ['maximize', 'minimize']:
+            # the rule written out for a single trial
+            expected = []
+            for history in running:
+                step_averages = sorted(average[len(history) - 1] for average in averages if len(average) >= len(history))
+                if len(history) < 2 or not step_averages:
+                    expected.append(AssessResult.Good)
+                elif optimize_mode == 'maximize':
+                    median = step_averages[(len(step_averages) - 1) // 2]
+                    expected.append(AssessResult.Bad if max(history) < median else AssessResult.Good)
+                else:
+                    median = step_averages[len(step_averages) // 2]
+                    expected.append(AssessResult.Bad if min(history) > median else AssessResult.Good)
+
+            self.assertIn(AssessResult.Bad, expected)
+            assessor = MedianstopAssessor(optimize_mode, start_step=2)
+            self.assertEqual([assessor.assess_trial(id_, history) for id_, history in zip(ids, running)], expected)
+            results = assessor.assess_trials(TrialBatch(ids, running))
+            self.assertEqual([AssessResult.Good if good else AssessResult.Bad for good in results], expected)
+
+            # a trial with results that are not numbers is good, and the others are still assessed
+            batch = TrialBatch(['text', 'dict'] + ids, [['a', 'b'], [{'loss': 1}, {'loss': 2}]] + running)
+            self.assertEqual(assessor.assess_trial('text', ['a', 'b']), AssessResult.Good)
+            results = assessor.assess_trials(batch)
+            self.assertEqual([AssessResult.Good if good else AssessResult.Bad for good in results],
+                             [AssessResult.Good, AssessResult.Good] + expected)
+            self.assertTrue(np.isnan(batch.arrays()[0][:2]).all())
+
 
 if __name__ == '__main__':
     main()
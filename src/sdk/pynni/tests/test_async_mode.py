@@ -0,0 +1,89 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+
+import nni.common
+import nni.msg_dispatcher
+import nni.protocol
+from nni.protocol import CommandType, send, receive
+from nni.assessor import Assessor, AssessResult
+from nni.tuner import Tuner
+from nni.msg_dispatcher import MsgDispatcher
+
+from io import BytesIO
+import os
+import time
+from unittest import TestCase, main
+
+
+class SlowTuner(Tuner):
+    def generate_parameters(self, parameter_id):
+        time.sleep(0.5)
+        return {'param': parameter_id}
+
+    def receive_trial_result(self, parameter_id, parameters, value):
+        pass
+
+    def update_search_space(self, search_space):
+        pass
+
+
+class KillAllAssessor(Assessor):
+    def assess_trial(self, trial_job_id, trial_history):
+        return AssessResult.Bad
+
+
+class AsyncModeTestCase(TestCase):
+    def setUp(self):
+        nni.common.enable_async_mode()
+        nni.common.set_executor_workers(2)
+        self._next_parameter_id = nni.msg_dispatcher._next_parameter_id
+
+    def tearDown(self):
+        nni.common._async_mode = False
+        nni.common.set_executor_workers(None)
+        nni.msg_dispatcher._next_parameter_id = self._next_parameter_id
+
+    def test_async_mode(self):
+        nni.protocol._out_version = 1
+        nni.protocol._out_file = BytesIO()
+        send(CommandType.RequestTrialJobs, '1')
+        send(CommandType.ReportMetricData, '{"trial_job_id":"async","type":"PERIODICAL","sequence":0,"value":1}')
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, nni.protocol._out_file.getvalue())
+        os.close(write_fd)
+        nni.protocol._in_file = os.fdopen(read_fd, 'rb')
+        nni.protocol._out_file = BytesIO()
+
+        dispatcher = MsgDispatcher(SlowTuner(), KillAllAssessor())
+        dispatcher.run()
+
+        # the kill decision must not wait for the slow tuner
+        nni.protocol._in_file = BytesIO(nni.protocol._out_file.getvalue())
+        command, data = receive()
+        self.assertIs(command, CommandType.KillTrialJob)
+        self.assertEqual(data, '"async"')
+        command, data = receive()
+        self.assertIs(command, CommandType.NewTrialJob)
+        self.assertEqual(receive(), (None, None))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+from nni import codec
+
+import json_tricks
+import numpy as np
+from unittest import TestCase, main
+
+
+class CodecTestCase(TestCase):
+    def tearDown(self):
+        codec.set_codec('auto')
+
+    def test_plain(self):
+        obj = {'b': [1, 2.5, 'x', None, True], 'a': {'c': 'd'}}
+        string = codec.dumps(obj)
+        self.assertEqual(string, json_tricks.dumps(obj))
+        self.assertEqual(codec.loads(string), obj)
+        self.assertEqual(list(codec.loads(string)), ['b', 'a'])
+
+    def test_special_types(self):
+        obj = {'value': np.array([1, 2, 3])}
+        string = codec.dumps(obj)
+        self.assertIn('__ndarray__', string)
+        self.assertTrue((codec.loads(string)['value'] == obj['value']).all())
+        # json_tricks ignores comments
+        self.assertEqual(codec.loads('{"a": 1} // comment'), {'a': 1})
+
+    def test_set_codec(self):
+        codec.set_codec('json')
+        self.assertRaises(TypeError, codec.dumps, {'value': np.array([1])})
+        self.assertRaises(ValueError, codec.set_codec, 'unknown')
+        codec.register_codec('upper', str.lower, lambda obj: str(obj).upper())
+        codec.set_codec('upper')
+        self.assertEqual(codec.dumps('abc'), 'ABC')
+
+
+if __name__ == '__main__':
+    main()
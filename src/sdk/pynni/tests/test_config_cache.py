@@ -0,0 +1,174 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import nni
+import nni.msg_dispatcher
+import nni.protocol
+from nni.dispatcher_state import ConfigCache, fingerprint, ParameterStore
+from nni.protocol import CommandType, receive
+from nni.tuner import Tuner
+from nni.msg_dispatcher import MsgDispatcher
+
+from io import BytesIO
+import json
+from unittest import TestCase, main
+
+import numpy as np
+
+
+class RepeatingTuner(Tuner):
+    '''Proposes the parameters in the given order'''
+    def __init__(self, proposals):
+        self.proposals = list(proposals)
+        self.results = []
+
+    def generate_parameters(self, parameter_id):
+        if not self.proposals:
+            raise nni.NoMoreTrialError('no more parameters')
+        return self.proposals.pop(0)
+
+    def receive_trial_result(self, parameter_id, parameters, value):
+        self.results.append((parameters, value))
+
+    def update_search_space(self, search_space):
+        pass
+
+
+class ConfigCacheTestCase(TestCase):
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint({'a': 1, 'b': [0.5, 'x']}), fingerprint({'b': [0.5, 'x'], 'a': 1}))
+        self.assertEqual(fingerprint({'a': np.int64(1), 'b': np.float32(0.5)}), fingerprint({'a': 1, 'b': 0.5}))
+        self.assertNotEqual(fingerprint({'a': 1}), fingerprint({'a': 2}))
+
+    def test_entries(self):
+        cache = ConfigCache('reuse')
+        key, hit = cache.lookup({'x': 1})
+        self.assertFalse(hit)
+        cache.add(key, 0)
+        self.assertEqual(cache.lookup({'x': 1}), (key, True))
+        self.assertEqual(cache.result(key), (False, None))
+        cache.final_received(0, 0.9)
+        cache.trial_ended(0, True)
+        self.assertEqual(cache.result(key), (True, 0.9))
+        self.assertEqual(cache.hit_rate, 0.5)
+
+        # failed parameters may run again
+        key, _ = cache.lookup({'x': 2})
+        cache.add(key, 1)
+        cache.trial_ended(1, False)
+        self.assertFalse(cache.lookup({'x': 2})[1])
+
+        # the final result may come after the end of the trial
+        key, _ = cache.lookup({'x': 3})
+        cache.add(key, 2)
+        cache.trial_ended(2, True)
+        cache.final_received(2, 0.5)
+        self.assertEqual(cache.result(key), (True, 0.5))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache._running, {})
+        with self.assertRaises(ValueError):
+            ConfigCache('unknown')
+
+
+class DispatcherConfigCacheTestCase(TestCase):
+    def setUp(self):
+        self._state = {name: getattr(nni.msg_dispatcher, name) for name in ('_next_parameter_id', '_trial_params')}
+        nni.msg_dispatcher._next_parameter_id = 0
+        nni.msg_dispatcher._trial_params = ParameterStore()
+        self._saved_out_file = getattr(nni.protocol, '_out_file', None)
+        self._saved_out_version = nni.protocol._out_version
+        nni.protocol._out_version = 1
+
+    def tearDown(self):
+        for name, value in self._state.items():
+            setattr(nni.msg_dispatcher, name, value)
+        nni.protocol._out_file = self._saved_out_file
+        nni.protocol._out_version = self._saved_out_version
+
+    def _run(self, dispatcher, command, data):
+        out_buf = BytesIO()
+        nni.protocol._out_file = out_buf
+        dispatcher.handle_command(command, data)
+        out_buf.seek(0)
+        saved_in_file = getattr(nni.protocol, '_in_file', None)
+        nni.protocol._in_file = out_buf
+        sent = []
+        try:
+            while out_buf.tell() < len(out_buf.getvalue()):
+                command, data = receive()
+                sent.append((command, json.loads(data)))
+        finally:
+            nni.protocol._in_file = saved_in_file
+        return sent
+
+    def _finish(self, dispatcher, parameter_id, value):
+        self._run(dispatcher, CommandType.ReportMetricData,
+                  {'parameter_id': parameter_id, 'type': 'FINAL', 'value': value, 'trial_job_id': str(parameter_id)})
+        hyper_params = json.dumps({'parameter_id': parameter_id})
+        self._run(dispatcher, CommandType.TrialEnd,
+                  {'trial_job_id': str(parameter_id), 'event': 'SUCCEEDED', 'hyper_params': hyper_params})
+
+    def test_reuse(self):
+        tuner = RepeatingTuner([{'x': 1}, {'x': 2}, {'x': 1}, {'x': 2}, {'x': 3}])
+        dispatcher = MsgDispatcher(tuner, config_cache='reuse')
+        sent = self._run(dispatcher, CommandType.RequestTrialJobs, 2)
+        self.assertEqual([data['parameters'] for _, data in sent], [{'x': 1}, {'x': 2}])
+        self._finish(dispatcher, sent[0][1]['parameter_id'], 0.5)
+
+        # {'x': 1} finished and gets its result again, {'x': 2} is still running and is resampled
+        sent = self._run(dispatcher, CommandType.RequestTrialJobs, 1)
+        self.assertEqual(sent, [(CommandType.NewTrialJob,
+                                 {'parameter_id': 4, 'parameter_source': 'algorithm', 'parameters': {'x': 3}})])
+        self.assertEqual(tuner.results, [({'x': 1}, 0.5), ({'x': 1}, 0.5)])
+        self.assertEqual((dispatcher.config_cache.hits, dispatcher.config_cache.lookups), (2, 5))
+
+        sent = self._run(dispatcher, CommandType.RequestTrialJobs, 1)
+        self.assertEqual([command for command, _ in sent], [CommandType.NoMoreTrialJobs])
+
+    def test_resample(self):
+        tuner = RepeatingTuner([{'x': 1}, {'x': 1}, {'x': 2}])
+        dispatcher = MsgDispatcher(tuner, config_cache='resample')
+        sent = self._run(dispatcher, CommandType.RequestTrialJobs, 1)
+        self._finish(dispatcher, sent[0][1]['parameter_id'], 0.5)
+        sent = self._run(dispatcher, CommandType.RequestTrialJobs, 1)
+        self.assertEqual([data['parameters'] for _, data in sent], [{'x': 2}])
+        self.assertEqual(tuner.results, [({'x': 1}, 0.5)])
+
+    def test_give_up(self):
+        tuner = RepeatingTuner([{'x': 1}] * 20)
+        dispatcher = MsgDispatcher(tuner, config_cache='resample')
+        dispatcher.config_cache.max_resample = 3
+        self._run(dispatcher, CommandType.RequestTrialJobs, 1)
+        sent = self._run(dispatcher, CommandType.RequestTrialJobs, 1)
+        self.assertEqual([data['parameters'] for _, data in sent], [{'x': 1}])
+        self.assertEqual(len(tuner.proposals), 20 - 5)
+
+    def test_no_replacement(self):
+        # a duplicate without replacement is dropped, the other parameters of the request are still sent
+        tuner = RepeatingTuner([{'x': 1}, {'x': 1}, {'x': 2}])
+        dispatcher = MsgDispatcher(tuner, config_cache='resample')
+        self._run(dispatcher, CommandType.RequestTrialJobs, 1)
+        sent = self._run(dispatcher, CommandType.RequestTrialJobs, 2)
+        self.assertEqual([command for command, _ in sent], [CommandType.NewTrialJob, CommandType.NoMoreTrialJobs])
+        self.assertEqual(sent[0][1]['parameters'], {'x': 2})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+
+from nni.dispatcher_state import ParameterStore, RecentSet
+
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from unittest import TestCase, main
+
+
+class ParameterStoreTestCase(TestCase):
+    def test_evict(self):
+        store = ParameterStore()
+        for i in range(100):
+            store.add(i, {'x': i}, customized=(i == 3))
+        self.assertEqual(store.get(3), ({'x': 3}, True))
+        self.assertEqual(store.get(4), ({'x': 4}, False))
+
+        for i in range(100):
+            store.final_received(i)
+            if i != 50:
+                store.trial_ended(i)
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.get(50), ({'x': 50}, False))
+        self.assertRaises(KeyError, store.get, 49)
+
+        store.trial_ended(50)
+        self.assertEqual(len(store), 0)
+        self.assertEqual(len(store._params), 0)
+
+    def test_final_after_end(self):
+        store = ParameterStore(awaiting_capacity=2)
+        for i in range(4):
+            store.add(i, i)
+        # the final result of a failed trial may arrive after its end
+        store.trial_ended(0)
+        self.assertEqual(store.get(0), (0, False))
+        store.final_received(0)
+        self.assertNotIn(0, store)
+        # ended trials which never report a final result are evicted once too many wait
+        for i in (1, 2, 3):
+            store.trial_ended(i)
+        self.assertNotIn(1, store)
+        self.assertEqual(len(store), 2)
+        store.final_received(2)
+        self.assertEqual(len(store), 1)
+        self.assertEqual(len(store._awaiting), 1)
+
+    def test_out_of_order(self):
+        store = ParameterStore()
+        store.add(5, 'a')
+        store.add(3, 'b')
+        store.add(8, 'c')
+        self.assertEqual([store.get(i)[0] for i in (3, 5, 8)], ['b', 'a', 'c'])
+        self.assertNotIn(6, store)
+        for i in (3, 5, 8):
+            store.final_received(i)
+            store.trial_ended(i)
+        self.assertEqual(len(store), 0)
+
+    def test_spill(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        store = ParameterStore(os.path.join(directory, 'parameters'))
+        store.add(0, {'x': [1, 2]}, customized=True)
+        store.final_received(0)
+        store.trial_ended(0)
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.get(0), ({'x': [1, 2]}, True))
+        store.close()
+
+    def test_threads(self):
+        # in multi-thread mode parameters are added in the tuner lane, while trials end in their own lanes
+        store = ParameterStore()
+        errors = []
+        def end_trials(ids):
+            try:
+                for i in ids:
+                    while i not in store:
+                        pass
+                    self.assertEqual(store.get(i)[0], i)
+                    store.final_received(i)
+                    store.trial_ended(i)
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+        threads = [threading.Thread(target=end_trials, args=(range(k, 4000, 4),)) for k in range(4)]
+        for thread in threads:
+            thread.start()
+        for i in range(4000):
+            store.add(i, i)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(store), 0)
+
+        store.add(4000, 'x')
+        store = pickle.loads(pickle.dumps(store))
+        store.final_received(4000)
+        store.trial_ended(4000)
+        self.assertEqual(len(store), 0)
+
+
+class RecentSetTestCase(TestCase):
+    def test_capacity(self):
+        recent = RecentSet(3)
+        for item in 'abcd':
+            recent.add(item)
+        self.assertEqual(len(recent), 3)
+        self.assertNotIn('a', recent)
+        self.assertIn('d', recent)
+
+
+if __name__ == '__main__':
+    main()
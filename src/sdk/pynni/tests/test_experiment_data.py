@@ -0,0 +1,146 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import nni
+import nni.msg_dispatcher
+import nni.protocol
+from nni.experiment_data import load_trial_results, export_trial_results
+from nni.evolution_tuner.evolution_tuner import EvolutionTuner
+from nni.msg_dispatcher import MsgDispatcher
+from nni.protocol import CommandType, receive
+from nni.tuner import Tuner
+
+from io import BytesIO
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import TestCase, main
+
+
+def _create_database(path):
+    '''A database as written by NNI manager, see src/nni_manager/core/sqlDatabase.ts'''
+    connection = sqlite3.connect(path)
+    connection.executescript('''
+        create table TrialJobEvent (timestamp integer, trialJobId text, event text, data text, logPath text,
+                                    sequenceId integer);
+        create table MetricData (timestamp integer, trialJobId text, parameterId text, type text, sequence integer,
+                                 data text);
+    ''')
+    for i, (x, final) in enumerate([(1, 0.5), (2, {'default': 0.8, 'loss': 0.1}), (3, None)]):
+        trial = 'trial%d' % i
+        hyper_params = json.dumps({'parameter_id': i, 'parameter_source': 'algorithm', 'parameters': {'x': x}})
+        connection.execute('insert into TrialJobEvent values (?,?,?,?,?,?)', (i, trial, 'WAITING', hyper_params, '', i))
+        connection.execute('insert into TrialJobEvent values (?,?,?,?,?,?)', (i, trial, 'RUNNING', None, None, None))
+        connection.execute('insert into MetricData values (?,?,?,?,?,?)',
+                           (i, trial, str(i), 'PERIODICAL', 0, json.dumps(json.dumps(0.1))))
+        if final is not None:
+            connection.execute('insert into MetricData values (?,?,?,?,?,?)',
+                               (i, trial, str(i), 'FINAL', 0, json.dumps(json.dumps(final))))
+    connection.commit()
+    connection.close()
+
+
+class RecordingTuner(Tuner):
+    def __init__(self):
+        self.imported = None
+
+    def generate_parameters(self, parameter_id):
+        return {'imported': len(self.imported)}
+
+    def receive_trial_result(self, parameter_id, parameters, value):
+        pass
+
+    def update_search_space(self, search_space):
+        pass
+
+    def import_data(self, data):
+        self.imported = data
+
+
+class ExperimentDataTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.db_path = os.path.join(self.directory, 'nni.sqlite')
+        _create_database(self.db_path)
+
+    def test_load(self):
+        expected = [{'parameter': {'x': 1}, 'value': 0.5},
+                    {'parameter': {'x': 2}, 'value': {'default': 0.8, 'loss': 0.1}}]
+        self.assertEqual(load_trial_results(self.db_path), expected)
+
+        path = os.path.join(self.directory, 'results.json')
+        self.assertEqual(export_trial_results(self.db_path, path), 2)
+        self.assertEqual(load_trial_results(path), expected)
+
+        with open(path, 'w') as file:
+            file.write('{"x": 1}')
+        with self.assertRaises(ValueError):
+            load_trial_results(path)
+
+    def test_evolution(self):
+        tuner = EvolutionTuner('maximize', population_size=4)
+        tuner.update_search_space({'x': {'_type': 'choice', '_value': [1, 2, 3]}})
+        tuner.import_data([{'parameter': {'x': 1}, 'value': 0.5}, {'parameter': {'x': 2}, 'value': 0.8},
+                           {'parameter': {'x': 4}, 'value': 0.9}])  # not in search space
+        self.assertEqual(len(tuner.population), 4)
+        self.assertEqual([(indiv.config, indiv.result) for indiv in tuner.population[:2]],
+                         [({'x': {'_index': 1, '_value': 2}}, 0.8), ({'x': {'_index': 0, '_value': 1}}, 0.5)])
+        self.assertEqual([indiv.result for indiv in tuner.population[2:]], [None, None])
+
+    def test_dispatcher(self):
+        saved = {name: getattr(nni.msg_dispatcher, name) for name in ('_next_parameter_id', '_trial_params')}
+        saved_files = [getattr(nni.protocol, name, None) for name in ('_in_file', '_out_file', '_out_version')]
+        def restore():
+            for name, value in saved.items():
+                setattr(nni.msg_dispatcher, name, value)
+            nni.protocol._in_file, nni.protocol._out_file, nni.protocol._out_version = saved_files
+        self.addCleanup(restore)
+        nni.msg_dispatcher._trial_params = nni.msg_dispatcher.ParameterStore()
+        nni.protocol._out_version = 1
+
+        tuner = RecordingTuner()
+        dispatcher = MsgDispatcher(tuner, config_cache='reuse', import_data=self.db_path)
+        out_buf = BytesIO()
+        nni.protocol._out_file = out_buf
+        dispatcher.handle_command(CommandType.Initialize, {'x': {'_type': 'choice', '_value': [1, 2]}})
+        self.assertEqual(len(tuner.imported), 2)
+        self.assertTrue(dispatcher.data_imported)
+        self.assertEqual(dispatcher.config_cache.result(nni.dispatcher_state.fingerprint({'x': 1})), (True, 0.5))
+
+        # not imported again when NNI manager initializes a resumed experiment
+        tuner.imported = []
+        dispatcher.handle_command(CommandType.Initialize, {'x': {'_type': 'choice', '_value': [1, 2]}})
+        self.assertEqual(tuner.imported, [])
+        out_buf.seek(0)
+        nni.protocol._in_file = out_buf
+        self.assertIs(receive()[0], CommandType.Initialized)
+
+        # an unreadable file is logged and the experiment runs without it
+        dispatcher = MsgDispatcher(RecordingTuner(), import_data=os.path.join(self.directory, 'missing'))
+        nni.protocol._out_file = BytesIO()
+        dispatcher.handle_command(CommandType.Initialize, {})
+        self.assertFalse(dispatcher.data_imported)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import nni
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, main
+
+_import_budget = 1.0
+'''Seconds to import the dispatcher in a fresh interpreter, several times more than needed on a slow machine'''
+
+_lazy_modules = [
+    'json_tricks',  # imports NumPy
+    'numpy',
+    'asyncio',
+    'concurrent.futures',
+    'multiprocessing',
+    'dbm',
+    'nni.multi_phase.multi_phase_dispatcher'
+]
+'''Modules only imported by the builtins and modes which need them'''
+
+_script = '''
+import json, sys, time
+start = time.perf_counter()
+import nni.__main__, nni.msg_dispatcher
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds, 'modules': sorted(sys.modules)}))
+'''
+
+
+class ImportTimeTestCase(TestCase):
+    def test_import_dispatcher(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        env = dict(os.environ)
+        env.pop('NNI_PLATFORM', None)
+        env['PYTHONPATH'] = os.pathsep.join([os.path.dirname(os.path.dirname(nni.__file__))] + sys.path)
+        output = subprocess.check_output([sys.executable, '-c', _script], cwd=directory, env=env,
+                                         stderr=subprocess.DEVNULL)
+        result = json.loads(output.decode('utf8').splitlines()[-1])
+
+        for module in _lazy_modules:
+            self.assertNotIn(module, result['modules'])
+        # dispatcher.log is created when the dispatcher runs, not on import
+        self.assertEqual(os.listdir(directory), [])
+        self.assertLess(result['seconds'], _import_budget)
+
+
+if __name__ == '__main__':
+    main()
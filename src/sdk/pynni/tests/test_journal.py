@@ -0,0 +1,257 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import nni.common
+import nni.protocol
+import nni.msg_dispatcher
+from nni.journal import CommandJournal
+from nni.protocol import CommandType, send, receive
+from nni.tuner import Tuner
+from nni.msg_dispatcher import MsgDispatcher
+from nni.msg_dispatcher_base import MsgDispatcherBase
+
+from io import BytesIO
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase, main
+
+
+class RecordingTuner(Tuner):
+    def __init__(self, offset):
+        self.offset = offset
+        self.search_space_updates = 0
+        self.trial_results = []
+
+    def generate_parameters(self, parameter_id):
+        return {'x': self.offset + parameter_id}
+
+    def receive_trial_result(self, parameter_id, parameters, value):
+        self.trial_results.append((parameter_id, parameters['x'], value))
+
+    def update_search_space(self, search_space):
+        self.search_space_updates += 1
+
+
+class LockedTuner(RecordingTuner):
+    def __init__(self, offset):
+        super().__init__(offset)
+        self.lock = threading.Lock()  # cannot be pickled
+
+
+class PrefetchedTuner(RecordingTuner):
+    def __init__(self, offset):
+        super().__init__(offset)
+        self.prefetching_in_replay = False
+
+    def receive_trial_result(self, parameter_id, parameters, value):
+        super().receive_trial_result(parameter_id, parameters, value)
+        if nni.protocol._muted:
+            self.prefetching_in_replay |= any(thread.name == 'ParameterPrefetcher' for thread in threading.enumerate())
+
+
+class CoalescingDispatcher(MsgDispatcherBase):
+    def __init__(self):
+        super().__init__()
+        self.handled = []
+
+    def command_lane(self, command, data):
+        return command
+
+    def coalesce_key(self, command, data):
+        if command is CommandType.ReportMetricData:
+            return data['trial_job_id']
+        return None
+
+    def handle_command(self, command, data):
+        self.handled.append((command, data, False))
+        return True
+
+    def handle_superseded(self, command, data):
+        self.handled.append((command, data, True))
+        return True
+
+
+class CommandJournalTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_replay(self):
+        journal = CommandJournal(self.directory)
+        journal.open(False)
+        journal.append(CommandType.Initialize, '{}')
+        journal.append(CommandType.NewTrialJob, '"abc"', inbound=False)
+        journal.close()
+        # simulate a crash in the middle of writing a record
+        with open(os.path.join(self.directory, 'dispatcher_journal.0'), 'ab') as journal_file:
+            journal_file.write(b'ME\x00\x00\x00\x00\x10{')
+
+        journal = CommandJournal(self.directory)
+        self.assertEqual(list(journal.replay()), [(b'IN', '{}', True, False), (b'TR', '"abc"', False, False)])
+        journal.open(True)
+        journal.append(CommandType.TrialEnd, '{}')
+        journal.close()
+        self.assertEqual(len(list(CommandJournal(self.directory).replay())), 3)
+
+    def test_snapshot(self):
+        journal = CommandJournal(self.directory)
+        journal.open(False)
+        journal.append(CommandType.Initialize, '{}')
+        journal.save_snapshot({'a': 1})
+        journal.append(CommandType.TrialEnd, '{}')
+        journal.close()
+
+        journal = CommandJournal(self.directory)
+        self.assertEqual(journal.load_snapshot(), {'a': 1})
+        self.assertEqual(list(journal.replay()), [(b'EN', '{}', True, False)])
+        journal.open(False)
+        self.assertIsNone(journal.load_snapshot())
+        self.assertEqual(list(journal.replay()), [])
+        journal.close()
+
+
+_in_buf = BytesIO()
+_out_buf = BytesIO()
+
+def _reverse_io():
+    _in_buf.seek(0)
+    _out_buf.seek(0)
+    nni.protocol._out_file = _in_buf
+    nni.protocol._in_file = _out_buf
+
+def _restore_io():
+    _in_buf.seek(0)
+    _out_buf.seek(0)
+    nni.protocol._in_file = _in_buf
+    nni.protocol._out_file = _out_buf
+
+
+class ResumeTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self._environ = os.environ.copy()
+        os.environ['NNI_CHECKPOINT_DIRECTORY'] = self.directory
+        self._state = {name: getattr(nni.msg_dispatcher, name)
+                       for name in ('_next_parameter_id', '_trial_params', '_trial_history', '_ended_trials')}
+        nni.msg_dispatcher._next_parameter_id = 0
+        nni.msg_dispatcher._trial_params = nni.msg_dispatcher.ParameterStore()
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self._environ)
+        for name, value in self._state.items():
+            setattr(nni.msg_dispatcher, name, value)
+
+    def _run(self, tuner, commands, snapshot_interval, **kwargs):
+        dispatcher = MsgDispatcher(tuner, **kwargs)
+        dispatcher.snapshot_interval = snapshot_interval
+        return dispatcher, self._run_dispatcher(dispatcher, commands)
+
+    def _run_dispatcher(self, dispatcher, commands):
+        _in_buf.truncate(0)
+        _out_buf.truncate(0)
+        _reverse_io()
+        for command, data in commands:
+            send(command, data)
+        _restore_io()
+        dispatcher.run()
+        _reverse_io()
+        sent = []
+        while True:
+            command, data = receive()
+            if command is None:
+                break
+            sent.append(command)
+        _restore_io()
+        return sent
+
+    def _test_resume(self, snapshot_interval, tuner_class=RecordingTuner):
+        dispatcher, sent = self._run(tuner_class(0), [
+            (CommandType.Initialize, '{"x": 1}'),
+            (CommandType.RequestTrialJobs, '2'),
+            (CommandType.ReportMetricData, '{"parameter_id":1,"type":"FINAL","value":5}')
+        ], snapshot_interval)
+        self.assertEqual(sent, [CommandType.Initialized, CommandType.NewTrialJob, CommandType.NewTrialJob])
+
+        # the resumed tuner generates different parameters, results are reported with the ones sent before
+        os.environ['NNI_MODE'] = 'resume'
+        dispatcher, sent = self._run(RecordingTuner(100), [
+            (CommandType.Initialize, '{"x": 1}'),
+            (CommandType.ReportMetricData, '{"parameter_id":0,"type":"FINAL","value":7}'),
+            (CommandType.RequestTrialJobs, '1')
+        ], snapshot_interval)
+        self.assertEqual(sent, [CommandType.Initialized, CommandType.NewTrialJob])
+        self.assertEqual(dispatcher.tuner.search_space_updates, 1)
+        self.assertEqual(dispatcher.tuner.trial_results, [(1, 1, 5), (0, 0, 7)])
+
+    def test_resume(self):
+        self._test_resume(float('inf'))
+
+    def test_resume_from_snapshot(self):
+        self._test_resume(1)
+
+    def test_resume_prefetcher(self):
+        # the prefetcher allocates parameter ids, it only starts once the journal is replayed
+        self._run(PrefetchedTuner(0), [
+            (CommandType.Initialize, '{"x": 1}'),
+            (CommandType.RequestTrialJobs, '2'),
+            (CommandType.ReportMetricData, '{"parameter_id":0,"type":"FINAL","value":5}')
+        ], float('inf'), prefetch_size=2)
+        os.environ['NNI_MODE'] = 'resume'
+        tuner = PrefetchedTuner(100)
+        self._run(tuner, [(CommandType.RequestTrialJobs, '1')], float('inf'), prefetch_size=2)
+        self.assertEqual(tuner.trial_results, [(0, 0, 5)])
+        self.assertFalse(tuner.prefetching_in_replay)
+
+    def test_unpicklable_tuner(self):
+        # no snapshot is saved, the whole journal is replayed instead
+        self._test_resume(1, LockedTuner)
+
+    def test_resume_multi_thread(self):
+        self.addCleanup(setattr, nni.common, '_multi_thread', nni.common._multi_thread)
+        nni.common._multi_thread = True
+        self._test_resume(1)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'dispatcher_snapshot.pkl')))
+
+    def test_replay_handling_order(self):
+        # commands are reordered by priority and coalesced, the replay repeats what was handled
+        dispatcher = CoalescingDispatcher()
+        dispatcher.snapshot_interval = float('inf')
+        self._run_dispatcher(dispatcher, [
+            (CommandType.RequestTrialJobs, '1'),
+            (CommandType.ReportMetricData, '{"trial_job_id":"A","type":"PERIODICAL","value":1}'),
+            (CommandType.ReportMetricData, '{"trial_job_id":"A","type":"PERIODICAL","value":2}'),
+            (CommandType.Initialize, '{}')
+        ])
+        self.assertEqual(dispatcher.handled[0][0], CommandType.Initialize)
+        self.assertEqual([superseded for _, _, superseded in dispatcher.handled], [False, False, True, False])
+
+        os.environ['NNI_MODE'] = 'resume'
+        resumed = CoalescingDispatcher()
+        resumed.snapshot_interval = float('inf')
+        self._run_dispatcher(resumed, [])
+        self.assertEqual(resumed.handled, dispatcher.handled)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase, main, skipUnless
+
+import nni
+from nni.common import _LogHandler, _LogWriter, _LoggerFileWrapper, log_level
+
+
+class LoggingTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'test.log')
+
+    def _read(self, path):
+        with open(path) as log_file:
+            return log_file.read()
+
+    def test_write_records_and_prints(self):
+        writer = _LogWriter(self.path)
+        handler = _LogHandler(writer)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        handler.handle(logging.LogRecord('test', logging.INFO, __file__, 1, 'value %d', (1,), None))
+        print('hello', file=_LoggerFileWrapper(writer))
+        writer.close()
+        lines = self._read(self.path).splitlines()
+        self.assertEqual(lines[0], 'INFO value 1')
+        self.assertRegex(lines[1], r'^\[\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\] PRINT hello$')
+        self.assertEqual(len(lines), 2)
+
+    def test_rotation(self):
+        writer = _LogWriter(self.path, max_bytes=100, backup_count=2)
+        wrapper = _LoggerFileWrapper(writer)
+        for i in range(20):
+            wrapper.write('line {}'.format(i))
+        writer.close()
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertTrue(os.path.exists(self.path + '.2'))
+        self.assertFalse(os.path.exists(self.path + '.3'))
+        self.assertIn('line 19', self._read(self.path))
+        for name in os.listdir(self.directory):
+            self.assertLessEqual(os.path.getsize(os.path.join(self.directory, name)), 100)
+
+    def test_synchronous(self):
+        writer = _LogWriter(self.path, background=False)
+        self.addCleanup(writer.close)
+        _LoggerFileWrapper(writer).write('hello')
+        self.assertIn('PRINT hello', self._read(self.path))
+
+    @skipUnless(hasattr(os, 'fork'), 'fork is not supported')
+    def test_fork(self):
+        writer = _LogWriter(self.path)
+        wrapper = _LoggerFileWrapper(writer)
+        wrapper.write('parent')
+        pid = os.fork()
+        if pid == 0:
+            # the child has no writer thread
+            try:
+                wrapper.write('child')
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        writer.close()
+        lines = self._read(self.path).splitlines()
+        self.assertCountEqual([line.split(' PRINT ')[1] for line in lines], ['parent', 'child'])
+
+    def test_log_level(self):
+        old_level = os.environ.get('NNI_LOG_LEVEL')
+        try:
+            os.environ['NNI_LOG_LEVEL'] = 'WARNING'
+            self.assertEqual(log_level(), logging.WARNING)
+            os.environ['NNI_LOG_LEVEL'] = 'verbose'
+            self.assertRaises(ValueError, log_level)
+            del os.environ['NNI_LOG_LEVEL']
+            self.assertEqual(log_level(), logging.INFO)
+        finally:
+            if old_level is None:
+                os.environ.pop('NNI_LOG_LEVEL', None)
+            else:
+                os.environ['NNI_LOG_LEVEL'] = old_level
+
+    def test_flush_on_exit(self):
+        script = (
+            'import logging\n'
+            'from nni.common import init_logger\n'
+            'init_logger("test.log")\n'
+            'print("printed")\n'
+            'logging.getLogger("test").debug("hidden")\n'
+            'logging.getLogger("test").info("logged")\n'
+        )
+        env = dict(os.environ)
+        env['NNI_PLATFORM'] = 'unittest'
+        env.pop('NNI_LOG_LEVEL', None)
+        env['PYTHONPATH'] = os.pathsep.join([os.path.dirname(os.path.dirname(nni.__file__))] + sys.path)
+        subprocess.check_call([sys.executable, '-c', script], cwd=self.directory, env=env)
+        content = self._read(os.path.join(self.directory, 'unittest.log'))
+        self.assertIn('PRINT printed', content)
+        self.assertIn('INFO (test) logged', content)
+        self.assertNotIn('hidden', content)
+
+    def test_killed(self):
+        script = (
+            'import logging, os, signal\n'
+            'from nni.common import init_logger\n'
+            'init_logger("test.log")\n'
+            'print("printed")\n'
+            'logging.getLogger("test").info("logged")\n'
+            'os.kill(os.getpid(), signal.SIGTERM)\n'
+        )
+        env = dict(os.environ)
+        env['NNI_PLATFORM'] = 'unittest'
+        env.pop('NNI_LOG_LEVEL', None)
+        env['PYTHONPATH'] = os.pathsep.join([os.path.dirname(os.path.dirname(nni.__file__))] + sys.path)
+        subprocess.call([sys.executable, '-c', script], cwd=self.directory, env=env)
+        content = self._read(os.path.join(self.directory, 'unittest.log'))
+        self.assertIn('PRINT printed', content)
+        self.assertIn('INFO (test) logged', content)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import logging
+import math
+import pickle
+from unittest import TestCase, main
+
+import numpy as np
+
+from nni.metric_store import MetricStore, metric_store, column_quantile, RUNNING, SUCCEEDED, FAILED
+from nni.msg_dispatcher import MsgDispatcher
+from nni.protocol import CommandType
+
+
+class MetricStoreTestCase(TestCase):
+    def test_record(self):
+        store = MetricStore()
+        self.assertEqual(store.values.shape, (0, 0))
+        store.record('A', 0, 1)
+        store.record('A', 2, {'default': 3})
+        store.record('B', 0, 5, parameter_id=7)
+        for i in range(100):  # grows both dimensions
+            store.record('T%d' % i, i, i)
+        store.trial_ended('A', True)
+        store.trial_ended('B', False)
+
+        self.assertEqual(len(store), 102)
+        self.assertEqual(store.values.shape, (102, 100))
+        np.testing.assert_array_equal(store.history('A'), [1, np.nan, 3])
+        self.assertEqual(store.history('unknown').shape, (0,))
+        self.assertEqual(store.row_of_parameter(7), store.row('B'))
+        self.assertEqual(store.parameter_id(store.row('B')), 7)
+        self.assertEqual(list(store.status[:3]), [SUCCEEDED, FAILED, RUNNING])
+        self.assertEqual(list(store.rows(SUCCEEDED)), [0])
+        self.assertEqual(store.version, 2)
+        self.assertFalse(store.values.flags.writeable)
+        with self.assertRaises(ValueError):
+            store.history('A')[0] = 0
+
+    def test_memory(self):
+        store = MetricStore()
+        store.record_history('long', list(range(10000)))
+        for i in range(1000):
+            store.record('T%d' % i, 0, i)
+        store.record_final(0, 1, trial_job_id='final-only')
+        # a long trial does not make the other trials as long
+        self.assertLess(sum(history.nbytes for history in store._histories if history is not None), 300000)
+        self.assertEqual(store.values.shape, (1001, 10000))
+        self.assertIsNone(store.row('final-only'))
+        np.testing.assert_array_equal(store.latest([store.row('T5')]), [5])
+
+    def test_drop_failed(self):
+        store = MetricStore()
+        for i in range(300):
+            store.record('T%d' % i, 0, i, parameter_id=i)
+        for i in range(300):
+            if i % 10:
+                store.trial_ended('T%d' % i, False)
+            if i == 100:  # not compacted until failed trials are half of the store
+                self.assertEqual(len(store), 300)
+                self.assertEqual(len(store.history('T1')), 0)
+        self.assertLess(len(store), 300)
+        store.trial_ended('T0', True)
+        self.assertEqual(list(store.rows(SUCCEEDED)), [store.row('T0')])
+        self.assertEqual(store.row_of_parameter(290), store.row('T290'))
+        np.testing.assert_array_equal(store.history('T290'), [290])
+        self.assertEqual(len(store.history('T291')), 0)
+        self.assertEqual(store.values.shape[1], 1)
+
+        store = MetricStore()
+        store.keep_failed = True
+        store.record('A', 0, 1)
+        store.trial_ended('A', False)
+        np.testing.assert_array_equal(store.history('A'), [1])
+
+    def test_queries(self):
+        store = MetricStore()
+        store.record_history('A', [1, 3, 2])
+        store.record_history('B', [4, 0])
+        store.record_history('C', [2])
+        np.testing.assert_array_equal(store.latest(), [2, 0, 2])
+        np.testing.assert_array_equal(store.latest([1]), [0])
+        np.testing.assert_array_equal(store.best_so_far(True), [[1, 3, 3], [4, 4, np.nan], [2, np.nan, np.nan]])
+        np.testing.assert_array_equal(store.best_so_far(False)[1], [4, 0, np.nan])
+        np.testing.assert_array_equal(store.running_mean()[0], [1, 2, 2])
+        np.testing.assert_array_equal(store.step_quantile(0.5), [2, 1.5, 2])
+        np.testing.assert_array_equal(store.step_quantile(0.5, method='lower'), [2, 0, 2])
+        np.testing.assert_array_equal(store.step_quantile(0.5, method='higher'), [2, 3, 2])
+        np.testing.assert_array_equal(store.step_quantile(1, rows=[0, 1]), [4, 3, 2])
+
+    def test_column_quantile(self):
+        matrix = np.array([[1, np.nan], [np.nan, np.nan], [3, np.nan]])
+        result = column_quantile(matrix, 0.25)
+        self.assertEqual(result[0], 1.5)
+        self.assertTrue(math.isnan(result[1]))
+        self.assertEqual(column_quantile(np.zeros((0, 2)), 0.5).shape, (2,))
+
+    def test_final_results(self):
+        store = MetricStore()
+        self.assertEqual(store.final_results()[0], [])
+        for i in range(100):
+            store.record('T%d' % i, 0, i)
+            store.record_final(i, i * 2, trial_job_id='T%d' % i)
+        parameter_ids, values = store.final_results()
+        self.assertEqual(parameter_ids, list(range(100)))
+        np.testing.assert_array_equal(values, np.arange(100) * 2)
+        self.assertEqual(store.row_of_parameter(99), store.row('T99'))
+
+    def test_pickle(self):
+        store = MetricStore()
+        store.record('A', 1, 2)
+        restored = MetricStore()
+        restored.load(pickle.loads(pickle.dumps(store)))
+        np.testing.assert_array_equal(restored.history('A'), [np.nan, 2])
+        restored.record('B', 0, 1)
+        self.assertEqual(len(restored), 2)
+        self.assertEqual(len(store), 1)
+
+    def _reset_global_store(self, enabled):
+        saved = metric_store.enabled, metric_store.keep_failed
+        def restore():
+            metric_store.enabled, metric_store.keep_failed = saved
+            metric_store.reset()
+        self.addCleanup(restore)
+        metric_store.reset()
+        metric_store.enabled, metric_store.keep_failed = enabled, False
+
+    def test_dispatcher(self):
+        self._reset_global_store(True)
+        dispatcher = MsgDispatcher(None)
+        dispatcher.handle_command(CommandType.ReportMetricData,
+                                  {'trial_job_id': 'store-A', 'parameter_id': 3, 'type': 'PERIODICAL',
+                                   'sequence': 0, 'value': 0.5})
+        dispatcher.handle_command(CommandType.TrialEnd, {'trial_job_id': 'store-A', 'event': 'SUCCEEDED'})
+        # results after the end of a trial are dropped
+        dispatcher.handle_command(CommandType.ReportMetricData,
+                                  {'trial_job_id': 'store-A', 'parameter_id': 3, 'type': 'PERIODICAL',
+                                   'sequence': 1, 'value': 0.7})
+        np.testing.assert_array_equal(metric_store.history('store-A'), [0.5])
+        self.assertEqual(metric_store.status[metric_store.row_of_parameter(3)], SUCCEEDED)
+
+    def test_dispatcher_without_reader(self):
+        self._reset_global_store(False)
+        dispatcher = MsgDispatcher(None)
+        with self.assertLogs('nni.msg_dispatcher', logging.WARNING):  # there is no tuner to get final results
+            for i in range(100):
+                trial_job_id = 'store-%d' % i
+                dispatcher.handle_command(CommandType.ReportMetricData,
+                                          {'trial_job_id': trial_job_id, 'parameter_id': i, 'type': 'PERIODICAL',
+                                           'sequence': 0, 'value': 0.5})
+                dispatcher.handle_command(CommandType.ReportMetricData,
+                                          {'trial_job_id': trial_job_id, 'parameter_id': i, 'type': 'FINAL',
+                                           'value': 0.5})
+                dispatcher.handle_command(CommandType.TrialEnd, {'trial_job_id': trial_job_id, 'event': 'SUCCEEDED'})
+        # nothing reads the store, so nothing is kept
+        self.assertEqual(len(metric_store), 0)
+        self.assertEqual(metric_store.final_results()[0], [])
+        from nni.medianstop_assessor.medianstop_assessor import MedianstopAssessor
+        MedianstopAssessor()
+        self.assertTrue(metric_store.enabled)
+
+    def test_hyperband_bracket(self):
+        from nni.hyperband_advisor.hyperband_advisor import Bracket, OptimizeMode
+        metric_store.reset()
+        self.addCleanup(metric_store.reset)
+        bracket = Bracket(1, 1, 3, 9, OptimizeMode.Maximize)
+        configs = {'1_0_%d' % i: {'x': i} for i in range(6)}
+        bracket._record_hyper_configs(configs)
+        for i, parameter_id in enumerate(configs):
+            metric_store.record('bracket-%d' % i, 0, 10)
+            metric_store.record('bracket-%d' % i, 1, i % 3, parameter_id)  # the latest result counts
+        for _ in range(5):
+            self.assertIsNone(bracket.inform_trial_end(0))
+        next_configs = bracket.inform_trial_end(0)
+        # n = 3 configs for the first round of this bracket, so 1 goes on, ties are broken by generation order
+        self.assertEqual([params['x'] for _, params in next_configs], [2])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+
+from nni.msg_dispatcher_base import _KeyedWorkQueue, _PriorityInbox
+
+import threading
+import time
+from unittest import TestCase, main
+
+
+class KeyedWorkQueueTestCase(TestCase):
+    def test_order_within_key(self):
+        results = {'A': [], 'B': []}
+        work_queue = _KeyedWorkQueue(4)
+        for i in range(100):
+            work_queue.submit('A', results['A'].append, i)
+            work_queue.submit('B', results['B'].append, i)
+        work_queue.join()
+        self.assertEqual(results['A'], list(range(100)))
+        self.assertEqual(results['B'], list(range(100)))
+
+    def test_parallel_across_keys(self):
+        event = threading.Event()
+        work_queue = _KeyedWorkQueue(2)
+        # the first item blocks until an item of another key runs, which needs a second thread
+        work_queue.submit('A', event.wait, 5)
+        work_queue.submit('B', event.set)
+        start = time.time()
+        work_queue.join()
+        self.assertTrue(event.is_set())
+        self.assertLess(time.time() - start, 5)
+
+    def test_priority(self):
+        results = []
+        event = threading.Event()
+        work_queue = _KeyedWorkQueue(1)
+        work_queue.submit('A', event.wait, 5)  # keep the only thread busy until all items are queued
+        work_queue.submit('B', results.append, 'B', priority=2)
+        work_queue.submit('C', results.append, 'C', priority=1)
+        work_queue.submit('D', results.append, 'D', priority=0)
+        event.set()
+        work_queue.join()
+        self.assertEqual(results, ['D', 'C', 'B'])
+
+
+class PriorityInboxTestCase(TestCase):
+    def _pop_all(self, inbox):
+        ret = []
+        while inbox:
+            ret.append(inbox.pop()[1])
+        return ret
+
+    def test_priority(self):
+        inbox = _PriorityInbox([10, 10, 10])
+        inbox.push(2, 'a', 'ME', 1, None)
+        inbox.push(1, 'tuner', 'GE', 2, None)
+        inbox.push(2, 'b', 'ME', 3, None)
+        inbox.push(0, 'c', 'EN', 4, None)
+        inbox.push(2, 'a', 'ME', 5, None)
+        # the trial end of lane b brings the metric of lane b before it
+        inbox.push(0, 'b', 'EN', 6, None)
+        self.assertEqual(self._pop_all(inbox), [4, 3, 6, 2, 1, 5])
+
+    def test_max_delay(self):
+        inbox = _PriorityInbox([10, 10, 0.01])
+        inbox.push(2, 'a', 'ME', 1, None)
+        time.sleep(0.02)
+        inbox.push(1, 'tuner', 'GE', 2, None)
+        self.assertEqual(self._pop_all(inbox), [1, 2])
+        self.assertGreater(inbox.max_observed_delays[2], 0.01)
+
+    def test_coalesce(self):
+        inbox = _PriorityInbox([10, 10, 10])
+        inbox.push(2, 'a', 'ME', 1, 'a')
+        inbox.push(2, 'b', 'ME', 2, 'b')
+        inbox.push(2, 'a', 'ME', 3, 'a')
+        self.assertEqual([inbox.pop()[2] for _ in range(3)], [True, False, False])
+
+
+if __name__ == '__main__':
+    main()
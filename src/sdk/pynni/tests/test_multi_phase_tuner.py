@@ -1,3 +1,4 @@
+import argparse
 import logging
 import random
 from io import BytesIO
@@ -7,6 +8,7 @@ import nni.protocol
 from nni.protocol import CommandType, send, receive
 from nni.multi_phase.multi_phase_tuner import MultiPhaseTuner
 from nni.multi_phase.multi_phase_dispatcher import MultiPhaseMsgDispatcher
+from nni.__main__ import add_dispatcher_arguments, create_dispatcher
 
 from unittest import TestCase, main
 
@@ -85,5 +87,16 @@ class MultiPhaseTestCase(TestCase):
     def test_tuner(self):
         _test_tuner()
 
+    def test_assessor_processes(self):
+        parser = argparse.ArgumentParser()
+        add_dispatcher_arguments(parser)
+        args = parser.parse_args(['--tuner_class_name', 'BatchTuner', '--assessor_class_name', 'Medianstop',
+                                  '--assessor_processes', '2', '--multi_phase'])
+        with self.assertLogs('nni.main', logging.WARNING) as logs:
+            dispatcher, _, assessor = create_dispatcher(args)
+        self.assertIsInstance(dispatcher, MultiPhaseMsgDispatcher)
+        self.assertIs(dispatcher.assessor, assessor)
+        self.assertIn('Assessor worker processes are not supported', logs.output[0])
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
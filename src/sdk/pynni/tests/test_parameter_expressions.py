@@ -0,0 +1,57 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+from unittest import TestCase, main
+
+import numpy as np
+
+from nni import parameter_expressions
+
+
+class ParameterExpressionsTestCase(TestCase):
+    def test_size(self):
+        random_state = np.random.RandomState(0)
+        for _type, _value in [('choice', [[1, 2, 3]]), ('randint', [5]), ('uniform', [-1, 1]),
+                              ('quniform', [0, 10, 2]), ('loguniform', [1e-3, 1]), ('qloguniform', [1, 100, 5]),
+                              ('normal', [0, 1]), ('qnormal', [0, 1, 0.5]), ('lognormal', [0, 1]),
+                              ('qlognormal', [0, 1, 0.5])]:
+            self.assertTrue(np.isscalar(parameter_expressions.sample(_type, _value, random_state)), _type)
+            samples = parameter_expressions.sample(_type, _value, random_state, size=1000)
+            self.assertIsInstance(samples, np.ndarray)
+            self.assertEqual(samples.shape, (1000,))
+        with self.assertRaises(ValueError):
+            parameter_expressions.sample('unknown', [], random_state)
+
+    def test_bounds(self):
+        random_state = np.random.RandomState(0)
+        samples = parameter_expressions.quniform(0, 10, 2, random_state, size=1000)
+        self.assertEqual(set(samples), {0, 2, 4, 6, 8, 10})
+        samples = parameter_expressions.loguniform(1e-3, 1, random_state, size=1000)
+        self.assertTrue(np.all((samples >= 1e-3) & (samples <= 1)))
+        samples = parameter_expressions.choice(['a', 'b'], random_state, size=100)
+        self.assertEqual(set(samples), {'a', 'b'})
+        # a batch continues the random stream the same way as single samples
+        random_state = np.random.RandomState(1)
+        single = [parameter_expressions.uniform(0, 1, random_state) for _ in range(3)]
+        self.assertEqual(list(parameter_expressions.uniform(0, 1, np.random.RandomState(1), size=3)), single)
+
+
+if __name__ == '__main__':
+    main()
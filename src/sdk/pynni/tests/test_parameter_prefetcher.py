@@ -0,0 +1,113 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+
+import nni
+from nni.parameter_prefetcher import ParameterPrefetcher
+from nni.tuner import Tuner
+
+import itertools
+import threading
+import time
+from unittest import TestCase, main
+
+
+class CountingTuner(Tuner):
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.generated = []
+
+    def generate_parameters(self, parameter_id):
+        if self.limit is not None and len(self.generated) >= self.limit:
+            raise nni.NoMoreTrialError('no more parameters')
+        self.generated.append(parameter_id)
+        return {'id': parameter_id}
+
+    def receive_trial_result(self, parameter_id, parameters, value):
+        pass
+
+    def update_search_space(self, search_space):
+        pass
+
+
+def _wait_until(condition):
+    deadline = time.time() + 5
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class ParameterPrefetcherTestCase(TestCase):
+    def _create(self, tuner, size=3, staleness=0):
+        counter = itertools.count()
+        prefetcher = ParameterPrefetcher(tuner, size, staleness, threading.RLock(), lambda: next(counter))
+        prefetcher.start()
+        self.addCleanup(prefetcher.stop)
+        return prefetcher
+
+    def test_fill_and_take(self):
+        tuner = CountingTuner()
+        prefetcher = self._create(tuner)
+        time.sleep(0.1)
+        self.assertEqual(tuner.generated, [])  # nothing before search space is set
+
+        prefetcher.reset()
+        _wait_until(lambda: len(tuner.generated) == 3)
+        self.assertEqual(prefetcher.take(2), [(0, {'id': 0}), (1, {'id': 1})])
+        _wait_until(lambda: len(tuner.generated) == 5)
+        self.assertEqual([id_ for id_, _ in prefetcher.take(5)], [2, 3, 4])
+        self.assertEqual((prefetcher.hits, prefetcher.misses), (5, 2))
+
+    def test_pause(self):
+        tuner = CountingTuner()
+        prefetcher = self._create(tuner)
+        prefetcher.pause()
+        prefetcher.reset()
+        time.sleep(0.1)
+        self.assertEqual(tuner.generated, [])
+        prefetcher.resume()
+        _wait_until(lambda: len(tuner.generated) == 3)
+        self.assertEqual(len(tuner.generated), 3)
+
+    def test_stale_parameters_dropped(self):
+        tuner = CountingTuner()
+        prefetcher = self._create(tuner, staleness=1)
+        prefetcher.reset()
+        _wait_until(lambda: len(tuner.generated) == 3)
+        prefetcher.pause()
+        prefetcher.receive_result()
+        prefetcher.receive_result()
+        self.assertEqual(prefetcher.take(3), [])
+        prefetcher.resume()
+        _wait_until(lambda: len(tuner.generated) == 6)
+        self.assertEqual([id_ for id_, _ in prefetcher.take(3)], [3, 4, 5])
+
+    def test_exhausted(self):
+        tuner = CountingTuner(limit=2)
+        prefetcher = self._create(tuner)
+        prefetcher.reset()
+        _wait_until(lambda: len(tuner.generated) == 2)
+        time.sleep(0.1)
+        self.assertEqual([id_ for id_, _ in prefetcher.take(3)], [0, 1])
+        time.sleep(0.1)
+        self.assertEqual(len(tuner.generated), 2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import json
+import os
+import shutil
+import signal
+import tempfile
+import time
+from unittest import TestCase, main, skipUnless
+
+from nni.profiler import CONTROL_FILE, Profiler
+
+
+def _busy_function(seconds):
+    end = time.time() + seconds
+    total = 0
+    while time.time() < end:
+        total += sum(range(100))
+    return total
+
+
+class ProfilerTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.profiler = Profiler(self.directory, 'test', poll_interval=0.05)
+        self.profiler.install()
+        self.addCleanup(self._uninstall)
+
+    def _uninstall(self):
+        self.profiler.close()
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+
+    def _wait_reports(self, count):
+        for _ in range(100):
+            if len(self.profiler.reports) >= count:
+                break
+            time.sleep(0.05)
+        self.assertEqual(len(self.profiler.reports), count)
+        for path in self.profiler.reports:
+            self.assertTrue(os.path.basename(path).startswith('test_profile_'))
+            self.assertEqual(os.path.dirname(path), self.directory)
+        return self.profiler.reports
+
+    def _wait_active(self, active):
+        for _ in range(100):
+            if self.profiler.active == active:
+                break
+            time.sleep(0.05)
+        self.assertEqual(self.profiler.active, active)
+
+    def test_sample(self):
+        self.profiler.request('start', 'sample', memory=True)
+        self._wait_active(True)
+        _busy_function(0.2)
+        self.profiler.request('stop')
+        text_path, folded_path, memory_path = self._wait_reports(3)
+        with open(text_path) as text_file:
+            self.assertIn('_busy_function (test_profiler.py:', text_file.read())
+        with open(folded_path) as folded_file:
+            stack, count = folded_file.readline().rsplit(' ', 1)
+        self.assertIn(';', stack)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(memory_path.endswith('_memory.txt'))
+        with open(memory_path) as memory_file:
+            self.assertTrue(memory_file.read().startswith('traced memory: '))
+
+    def _write_control_file(self, request):
+        control_path = os.path.join(self.directory, CONTROL_FILE)
+        with open(control_path + '.tmp', 'w') as control_file:
+            json.dump(request, control_file)
+        os.replace(control_path + '.tmp', control_path)
+        return control_path
+
+    def test_control_file(self):
+        control_path = self._write_control_file({'action': 'start'})
+        self._wait_active(True)
+        self.assertFalse(os.path.exists(control_path))
+        self._write_control_file({'action': 'stop'})
+        self._wait_reports(2)
+
+    @skipUnless(hasattr(signal, 'SIGUSR1'), 'needs SIGUSR1')
+    def test_cprofile(self):
+        self.profiler.request('start', 'cprofile')
+        self._wait_active(True)
+        _busy_function(0.05)
+        self.profiler.request('stop')
+        text_path, stats_path = self._wait_reports(2)
+        self.assertTrue(stats_path.endswith('.prof'))
+        with open(text_path) as text_file:
+            self.assertIn('_busy_function', text_file.read())
+
+    @skipUnless(hasattr(signal, 'SIGUSR1'), 'needs SIGUSR1')
+    def test_signal_toggle(self):
+        os.kill(os.getpid(), signal.SIGUSR1)
+        self._wait_active(True)
+        os.kill(os.getpid(), signal.SIGUSR1)
+        self._wait_reports(2)
+
+
+if __name__ == '__main__':
+    main()
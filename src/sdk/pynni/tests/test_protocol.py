@@ -20,17 +20,20 @@
 
 
 import nni.protocol
-from nni.protocol import CommandType, send, receive
+from nni.protocol import CommandType, send, send_batch, receive, has_input
 
 from io import BytesIO
+import os
 from unittest import TestCase, main
 
 
-def _prepare_send():
+def _prepare_send(version=1):
+    nni.protocol._out_version = version
     nni.protocol._out_file = BytesIO()
     return nni.protocol._out_file
 
 def _prepare_receive(data):
+    nni.protocol._out_version = 1
     nni.protocol._in_file = BytesIO(data)
 
 
@@ -66,6 +69,75 @@ class ProtocolTestCase(TestCase):
         self.assertIs(command, CommandType.Initialize)
         self.assertEqual(data, '世界')
 
+    def test_send_receive_v2(self):
+        out_file = _prepare_send(2)
+        send(CommandType.NewTrialJob, '你好')
+        self.assertEqual(out_file.getvalue(), b'TR\x02\x00\x00\x00\x00\x06' + '你好'.encode('utf8'))
+        _prepare_receive(out_file.getvalue())
+        command, data = receive()
+        self.assertIs(command, CommandType.NewTrialJob)
+        self.assertEqual(data, '你好')
+
+    def test_send_receive_v2_large(self):
+        out_file = _prepare_send(2)
+        payload = ''.join(str(i) for i in range(1_000_000))
+        send(CommandType.NewTrialJob, payload)
+        self.assertLess(len(out_file.getvalue()), len(payload))
+        _prepare_receive(out_file.getvalue())
+        command, data = receive()
+        self.assertIs(command, CommandType.NewTrialJob)
+        self.assertEqual(data, payload)
+
+    def test_send_receive_v2_chunked(self):
+        out_file = _prepare_send(2)
+        chunk_size = nni.protocol._chunk_size
+        compress_threshold = nni.protocol._compress_threshold
+        nni.protocol._chunk_size = 4
+        nni.protocol._compress_threshold = 1 << 30
+        try:
+            send(CommandType.NewTrialJob, 'CONTENT')
+        finally:
+            nni.protocol._chunk_size = chunk_size
+            nni.protocol._compress_threshold = compress_threshold
+        self.assertEqual(out_file.getvalue(), b'TR\x02\x02\x00\x00\x00\x04CONT' + b'TR\x02\x00\x00\x00\x00\x03ENT')
+        _prepare_receive(out_file.getvalue())
+        command, data = receive()
+        self.assertIs(command, CommandType.NewTrialJob)
+        self.assertEqual(data, 'CONTENT')
+
+    def test_negotiate_version(self):
+        _prepare_receive(b'GE000001' + b'1' + b'GE\x02\x00\x00\x00\x00\x01' + b'2')
+        self.assertEqual(receive(), (CommandType.RequestTrialJobs, '1'))
+        self.assertEqual(nni.protocol._out_version, 1)
+        self.assertEqual(receive(), (CommandType.RequestTrialJobs, '2'))
+        self.assertEqual(nni.protocol._out_version, 2)
+
+    def test_send_batch(self):
+        out_file = _prepare_send()
+        send_batch(CommandType.NewTrialJob, ['1', '2'])
+        self.assertEqual(out_file.getvalue(), b'TR0000011TR0000012')
+        out_file = _prepare_send(2)
+        send_batch(CommandType.NewTrialJob, ['1', '2'])
+        self.assertEqual(out_file.getvalue(), b'TB\x02\x00\x00\x00\x00\x05[1,2]')
+
+    def test_has_input_buffered(self):
+        read_fd, write_fd = os.pipe()
+        in_file = getattr(nni.protocol, '_in_file', None)  # not opened when the pipe does not exist
+        nni.protocol._in_file = open(read_fd, 'rb')
+        try:
+            self.assertFalse(has_input())
+            os.write(write_fd, b'IN000001a' + b'IN000001b')
+            self.assertEqual(receive(), (CommandType.Initialize, 'a'))
+            # the second command is in the buffer of the reader, not in the pipe
+            self.assertTrue(has_input())
+            self.assertEqual(receive(), (CommandType.Initialize, 'b'))
+            self.assertFalse(has_input())
+            self.assertTrue(os.get_blocking(read_fd))
+        finally:
+            nni.protocol._in_file.close()
+            os.close(write_fd)
+            nni.protocol._in_file = in_file
+
 
 if __name__ == '__main__':
     main()
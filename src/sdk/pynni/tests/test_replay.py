@@ -0,0 +1,117 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import nni.msg_dispatcher
+import nni.protocol
+from nni.protocol import CommandType, send, receive, initialized_payload, start_trace, stop_trace
+from nni.tuner import Tuner
+from nni.msg_dispatcher import MsgDispatcher
+from nni.replay import replay
+from nni.trace import TraceWriter, read_trace
+
+from io import BytesIO
+import os
+import tempfile
+from unittest import TestCase, main
+
+
+class CountingTuner(Tuner):
+    def __init__(self):
+        self.count = 0
+
+    def generate_parameters(self, parameter_id):
+        self.count += 1
+        return {'x': self.count}
+
+    def receive_trial_result(self, parameter_id, parameters, value):
+        pass
+
+    def update_search_space(self, search_space):
+        pass
+
+
+class ReplayTestCase(TestCase):
+    def setUp(self):
+        fd, self.trace_path = tempfile.mkstemp()
+        os.close(fd)
+        self._state = {name: getattr(nni.msg_dispatcher, name) for name in ('_next_parameter_id', '_trial_params')}
+        nni.msg_dispatcher._next_parameter_id = 0
+        nni.msg_dispatcher._trial_params = nni.msg_dispatcher.ParameterStore()
+
+    def tearDown(self):
+        os.remove(self.trace_path)
+        for name, value in self._state.items():
+            setattr(nni.msg_dispatcher, name, value)
+
+    def test_record(self):
+        in_buf = BytesIO()
+        nni.protocol._out_file = in_buf
+        send(CommandType.RequestTrialJobs, '1')
+        in_buf.seek(0)
+        nni.protocol._in_file = in_buf
+        nni.protocol._out_file = BytesIO()
+
+        start_trace(self.trace_path)
+        self.assertEqual(receive(), (CommandType.RequestTrialJobs, '1'))
+        send(CommandType.NewTrialJob, '{"parameter_id": 0}')
+        nni.protocol.send_batch(CommandType.KillTrialJob, ['"A"', '"B"'])
+        stop_trace()
+        send(CommandType.KillTrialJob, '"C"')
+
+        records = list(read_trace(self.trace_path))
+        self.assertEqual([record[1:] for record in records], [
+            (b'GE', '1', True),
+            (b'TR', '{"parameter_id": 0}', False),
+            (b'KI', '"A"', False),
+            (b'KI', '"B"', False)
+        ])
+        offsets = [record[0] for record in records]
+        self.assertEqual(offsets, sorted(offsets))
+
+    def test_replay(self):
+        trace = TraceWriter(self.trace_path)
+        trace.append(CommandType.Initialize, '{"x": {"_type": "choice", "_value": [1, 2]}}', inbound=True)
+        trace.append(CommandType.Initialized, initialized_payload(), inbound=False)
+        trace.append(CommandType.RequestTrialJobs, '2', inbound=True)
+        trace.append(CommandType.NewTrialJob, nni.msg_dispatcher._pack_parameter(0, {'x': 1}, record=False),
+                     inbound=False)
+        trace.append(CommandType.NewTrialJob, nni.msg_dispatcher._pack_parameter(1, {'x': 3}, record=False),
+                     inbound=False)
+        trace.append(CommandType.Terminate, '', inbound=True)
+        trace.close()
+
+        saved_in_file, saved_out_file = nni.protocol._in_file, nni.protocol._out_file
+        report = replay(MsgDispatcher(CountingTuner()), read_trace(self.trace_path))
+        self.assertIs(nni.protocol._in_file, saved_in_file)
+        self.assertIs(nni.protocol._out_file, saved_out_file)
+
+        self.assertEqual(report.commands, 2)
+        self.assertEqual(report.errors, 0)
+        self.assertEqual(len(report.latencies['Initialize']), 1)
+        self.assertEqual(len(report.latencies['RequestTrialJobs']), 1)
+        self.assertEqual(len(report.suggestion_latencies), 1)
+        self.assertEqual(report.decisions, {'Initialized': (1, 1, 0), 'NewTrialJob': (2, 2, 1)})
+        name, index, _, replayed = report.diffs[0]
+        self.assertEqual((name, index), ('NewTrialJob', 1))
+        self.assertIn('"x": 2', replayed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import time
+from unittest import TestCase, main
+
+import numpy as np
+
+from nni.search_space import compile_search_space, split_index
+from nni.evolution_tuner.evolution_tuner import EvolutionTuner
+from nni.hyperband_advisor.hyperband_advisor import Bracket
+
+
+_search_space = {
+    'lr': {'_type': 'loguniform', '_value': [1e-4, 1e-1]},
+    'batch': {'_type': 'choice', '_value': [16, 32, 64]},
+    'layers': [{'_type': 'randint', '_value': [4]}, 'relu'],
+    'optimizer': {'_type': 'choice', '_value': [
+        {'name': 'sgd', 'momentum': {'_type': 'quniform', '_value': [0, 1, 0.1]}},
+        {'name': 'adam', 'beta': {'_type': 'normal', '_value': [0.9, 0.01]}},
+        'rmsprop'
+    ]}
+}
+
+
+class SearchSpaceTestCase(TestCase):
+    def test_compile(self):
+        plan = compile_search_space(_search_space)
+        self.assertEqual([dim.name for dim in plan.dimensions], [
+            'root[lr]-loguniform',
+            'root[batch]-choice',
+            'root[layers][0]-randint',
+            'root[optimizer]-choice',
+            'root[optimizer]-choice[0][momentum]-quniform',
+            'root[optimizer]-choice[1][beta]-normal'
+        ])
+        momentum = plan.names['root[optimizer]-choice[0][momentum]-quniform']
+        self.assertEqual((momentum.type, momentum.args), ('quniform', [0, 1, 0.1]))
+        self.assertEqual((momentum.parent, momentum.option), (3, 0))
+        self.assertIsNone(plan.names['root[lr]-loguniform'].parent)
+        with self.assertRaises(ValueError):
+            compile_search_space({'x': {'_type': 'unknown', '_value': []}})
+
+    def test_sample(self):
+        plan = compile_search_space(_search_space)
+        configs = plan.sample(1000, np.random.RandomState(0))
+        self.assertEqual(len(configs), 1000)
+        for config in configs:
+            self.assertTrue(1e-4 <= config['lr'] <= 1e-1)
+            self.assertIn(config['batch'], [16, 32, 64])
+            self.assertIn(config['layers'][0], range(4))
+            self.assertEqual(config['layers'][1], 'relu')
+            optimizer = config['optimizer']
+            if optimizer == 'rmsprop':
+                continue
+            if optimizer['name'] == 'sgd':
+                self.assertEqual(set(optimizer), {'name', 'momentum'})
+                self.assertAlmostEqual(optimizer['momentum'] * 10, round(optimizer['momentum'] * 10))
+            else:
+                self.assertEqual(set(optimizer), {'name', 'beta'})
+        names = [config['optimizer'] if config['optimizer'] == 'rmsprop' else config['optimizer']['name']
+                 for config in configs]
+        self.assertEqual(set(names), {'sgd', 'adam', 'rmsprop'})
+        # the constants of the search space are not shared between configs
+        configs[0]['layers'][1] = 'tanh'
+        self.assertEqual(configs[1]['layers'][1], 'relu')
+
+        indexed = plan.sample(1000, np.random.RandomState(0), with_index=True)
+        self.assertEqual([split_index(config)['batch'] for config in indexed],
+                         [config['batch'] for config in configs])
+        self.assertEqual(indexed[0]['batch']['_value'], configs[0]['batch'])
+        self.assertEqual(compile_search_space({'x': 1}).sample(2, np.random.RandomState()), [{'x': 1}, {'x': 1}])
+
+    def test_sample_time(self):
+        plan = compile_search_space(_search_space)
+        start = time.time()
+        columns = plan.sample_columns(10000, np.random.RandomState())
+        self.assertLess(time.time() - start, 0.1)
+        self.assertEqual([len(column) for column in columns], [10000] * len(plan.dimensions))
+
+    def test_encode_decode(self):
+        plan = compile_search_space(_search_space)
+        for config in plan.sample(100, np.random.RandomState(1), with_index=True):
+            values = plan.encode(config)
+            self.assertEqual(plan.decode_values(values, with_index=True), config)
+            active = 5 if config['optimizer']['_index'] < 2 else 4
+            self.assertEqual(len(values), active)
+
+    def test_add_index(self):
+        plan = compile_search_space(_search_space)
+        for config in plan.sample(100, np.random.RandomState(3), with_index=True):
+            self.assertEqual(plan.add_index(plan.decode_values(plan.encode(config))), config)
+        params = {'lr': 0.01, 'batch': 32, 'layers': [3, 'relu'], 'optimizer': {'name': 'adam', 'beta': 0.9}}
+        self.assertEqual(plan.add_index(params)['optimizer'], {'_index': 1, '_value': {'name': 'adam', 'beta': 0.9}})
+        self.assertEqual(plan.add_index(params)['batch'], {'_index': 1, '_value': 32})
+        for key, value in [('lr', 1.0), ('batch', 8), ('layers', [4, 'relu']), ('layers', [1.5, 'relu']),
+                           ('optimizer', 'sgd'), ('optimizer', {'name': 'sgd', 'momentum': 2})]:
+            self.assertIsNone(plan.add_index(dict(params, **{key: value})), key)
+
+    def test_resample(self):
+        plan = compile_search_space(_search_space)
+        random_state = np.random.RandomState(2)
+        config = {'lr': 0.01, 'batch': {'_index': 0, '_value': 16}, 'layers': [1, 'relu'],
+                  'optimizer': {'_index': 0, '_value': {'name': 'sgd', 'momentum': 0.5}}}
+        for _ in range(20):
+            new = plan.resample(config, ['root[lr]-loguniform'], random_state)
+            self.assertNotEqual(new['lr'], 0.01)
+            self.assertEqual({key: new[key] for key in new if key != 'lr'},
+                             {key: config[key] for key in config if key != 'lr'})
+        optimizers = set()
+        momentums = set()
+        for _ in range(50):
+            new = plan.resample(config, ['root[optimizer]-choice'], random_state)
+            self.assertEqual(new['lr'], 0.01)
+            optimizers.add(new['optimizer']['_index'])
+            if new['optimizer']['_index'] == 0:  # nested dimensions are sampled again too
+                momentums.add(new['optimizer']['_value']['momentum'])
+        self.assertEqual(optimizers, {0, 1, 2})
+        self.assertGreater(len(momentums), 1)
+
+
+class TunerSearchSpaceTestCase(TestCase):
+    def test_evolution(self):
+        tuner = EvolutionTuner('maximize', population_size=4)
+        tuner.update_search_space(_search_space)
+        for parameter_id in range(20):
+            params = tuner.generate_parameters(parameter_id)
+            self.assertEqual(set(params), set(_search_space))
+            self.assertIn(params['batch'], [16, 32, 64])
+            tuner.receive_trial_result(parameter_id, params, float(parameter_id))
+
+    def test_hyperband(self):
+        plan = compile_search_space(_search_space)
+        bracket = Bracket(2, 2, 3, 9, None)
+        configs = bracket.get_hyperparameter_configurations(5, 1, plan, np.random.RandomState())
+        self.assertEqual(len(configs), 5)
+        for _, params in configs:
+            self.assertEqual(params['STEPS'], 1)
+            self.assertIn(params['batch'], [16, 32, 64])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import nni.msg_dispatcher
+import nni.protocol
+from nni.protocol import CommandType
+from nni.tuner import Tuner
+from nni.msg_dispatcher import MsgDispatcher
+from nni.transport import SocketTransport, parse_address
+
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from unittest import TestCase, main
+
+
+class CountingTuner(Tuner):
+    def __init__(self):
+        self.count = 0
+
+    def generate_parameters(self, parameter_id):
+        self.count += 1
+        return {'x': self.count}
+
+    def receive_trial_result(self, parameter_id, parameters, value):
+        pass
+
+    def update_search_space(self, search_space):
+        pass
+
+
+def _read_commands(conn):
+    '''Returns the commands sent by the dispatcher until it stops sending for a while'''
+    conn.settimeout(0.5)
+    data = b''
+    try:
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    except socket.timeout:
+        pass
+    commands = []
+    while data:
+        command, _, _, length = nni.protocol._parse_header(data[:8])
+        commands.append((command, data[8:8 + length].decode('utf8')))
+        data = data[8 + length:]
+    return commands
+
+
+class FakeManager:
+    '''Loopback NNI manager, every session accepts a connection, sends commands and collects the replies'''
+    def __init__(self, family, address, sessions):
+        self.server = socket.socket(family, socket.SOCK_STREAM)
+        self.server.bind(address)
+        self.server.listen(1)
+        self.sessions = sessions
+        self.received = []
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+
+    def _serve(self):
+        for commands in self.sessions:
+            conn, _ = self.server.accept()
+            for command, data in commands:
+                conn.sendall(nni.protocol._encode_frames(command, data.encode('utf8')))
+            self.received.append(_read_commands(conn))
+            conn.close()
+        self.server.close()
+
+
+class SocketTransportTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # the pipes are not opened when fds 3 and 4 do not exist
+        self._files = [getattr(nni.protocol, name, None) for name in ('_in_file', '_out_file', '_out_version')]
+        self._state = {name: getattr(nni.msg_dispatcher, name) for name in ('_next_parameter_id', '_trial_params')}
+        nni.msg_dispatcher._next_parameter_id = 0
+        nni.msg_dispatcher._trial_params = nni.msg_dispatcher.ParameterStore()
+
+    def tearDown(self):
+        if getattr(nni.protocol, '_in_file', None) is not None:
+            nni.protocol._in_file.close()
+        nni.protocol._in_file, nni.protocol._out_file, nni.protocol._out_version = self._files
+        for name, value in self._state.items():
+            setattr(nni.msg_dispatcher, name, value)
+
+    def _run_dispatcher(self, address, manager):
+        transport = SocketTransport(address, connect_timeout=1, retry_interval=0.1)
+        nni.protocol._in_file = nni.protocol._out_file = transport
+        MsgDispatcher(CountingTuner()).run()
+        manager.thread.join()
+        return manager.received
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('unix:///tmp/nni.sock'), (socket.AF_UNIX, '/tmp/nni.sock'))
+        self.assertEqual(parse_address('tcp://127.0.0.1:8090'), (socket.AF_INET, ('127.0.0.1', 8090)))
+        self.assertRaises(ValueError, parse_address, 'tcp://127.0.0.1')
+        self.assertRaises(ValueError, parse_address, '/tmp/nni.sock')
+
+    def test_unix_reconnect(self):
+        path = os.path.join(self.directory, 'dispatcher.sock')
+        search_space = '{"x": {"_type": "choice", "_value": [1, 2]}}'
+        manager = FakeManager(socket.AF_UNIX, path, [
+            [(CommandType.Initialize, search_space), (CommandType.RequestTrialJobs, '2')],
+            # NNI manager restarts
+            [(CommandType.Initialize, search_space), (CommandType.RequestTrialJobs, '1')]
+        ])
+        # the dispatcher starts before NNI manager listens
+        threading.Timer(0.3, manager.thread.start).start()
+        received = self._run_dispatcher('unix://' + path, manager)
+
+        self.assertEqual(len(received), 2)
+        self.assertEqual([command for command, _ in received[0]], [b'ID', b'TR', b'TR'])
+        self.assertEqual([command for command, _ in received[1]], [b'ID', b'TR'])
+        self.assertIn('"x": 3', received[1][1][1])
+
+    def test_tcp(self):
+        probe = socket.socket()
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+        probe.close()
+        manager = FakeManager(socket.AF_INET, ('127.0.0.1', port), [
+            [(CommandType.Initialize, '{}'), (CommandType.RequestTrialJobs, '1')]
+        ])
+        manager.thread.start()
+        start = time.time()
+        received = self._run_dispatcher('tcp://127.0.0.1:%d' % port, manager)
+
+        self.assertEqual([command for command, _ in received[0]], [b'ID', b'TR'])
+        # reconnecting is given up after connect_timeout
+        self.assertLess(time.time() - start, 10)
+
+
+if __name__ == '__main__':
+    main()
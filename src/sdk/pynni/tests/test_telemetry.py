@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+import nni.protocol
+from nni.protocol import CommandType, send
+from nni.assessor import Assessor, AssessResult
+from nni.msg_dispatcher import MsgDispatcher
+from nni.telemetry import Telemetry, Histogram, METRICS_FILE, telemetry
+
+from io import BytesIO
+import os
+import shutil
+import tempfile
+from unittest import TestCase, main
+
+
+class NaiveAssessor(Assessor):
+    def assess_trial(self, trial_job_id, trial_history):
+        return AssessResult.Good
+
+
+class TelemetryTestCase(TestCase):
+    def test_histogram(self):
+        histogram = Histogram((1, 10))
+        for value in [0.5, 1, 5, 20]:
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative_counts(), [2, 3, 4])
+        self.assertEqual(histogram.sum, 26.5)
+        self.assertEqual(histogram.count, 4)
+
+    def test_render(self):
+        local_telemetry = Telemetry()
+        local_telemetry.observe_handler(CommandType.TrialEnd, 0.002)
+        local_telemetry.observe_payload('in', CommandType.TrialEnd, 100)
+        local_telemetry.add_time('tuner', 1.5)
+        local_telemetry.set_gauge('input_backlog', lambda: 3)
+        lines = local_telemetry.render().splitlines()
+        self.assertIn('nni_dispatcher_handler_seconds_bucket{command="TrialEnd",le="0.001"} 0', lines)
+        self.assertIn('nni_dispatcher_handler_seconds_bucket{command="TrialEnd",le="0.005"} 1', lines)
+        self.assertIn('nni_dispatcher_handler_seconds_count{command="TrialEnd"} 1', lines)
+        self.assertIn('nni_dispatcher_payload_bytes_bucket{direction="in",command="TrialEnd",le="+Inf"} 1', lines)
+        self.assertIn('nni_dispatcher_phase_seconds_total{phase="tuner"} 1.5', lines)
+        self.assertIn('nni_dispatcher_input_backlog 3', lines)
+
+    def test_dispatcher_export(self):
+        telemetry.reset()
+        log_dir = tempfile.mkdtemp()
+        os.environ['NNI_LOG_DIRECTORY'] = log_dir
+        in_buf = BytesIO()
+        out_buf = BytesIO()
+        nni.protocol._out_file = in_buf
+        send(CommandType.ReportMetricData, '{"trial_job_id":"telemetry","type":"PERIODICAL","sequence":0,"value":2}')
+        in_buf.seek(0)
+        nni.protocol._in_file = in_buf
+        nni.protocol._out_file = out_buf
+        try:
+            MsgDispatcher(None, NaiveAssessor()).run()
+            with open(os.path.join(log_dir, METRICS_FILE)) as metrics_file:
+                content = metrics_file.read()
+        finally:
+            del os.environ['NNI_LOG_DIRECTORY']
+            shutil.rmtree(log_dir)
+        self.assertIn('nni_dispatcher_handler_seconds_count{command="ReportMetricData"} 1', content)
+        self.assertIn('nni_dispatcher_payload_bytes_count{direction="in",command="ReportMetricData"} 1', content)
+        self.assertIn('nni_dispatcher_phase_seconds_total{phase="assessor"}', content)
+        self.assertIn('nni_dispatcher_input_backlog 0', content)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+from nni.trial_history import TrialHistory
+
+import pickle
+from unittest import TestCase, main
+
+
+class TrialHistoryTestCase(TestCase):
+    def test_out_of_order(self):
+        history = TrialHistory()
+        self.assertTrue(history.add(0, 'a'))
+        self.assertFalse(history.add(2, 'c'))
+        self.assertFalse(history.add(3, 'd'))
+        self.assertEqual(list(history.view()), ['a'])
+        self.assertTrue(history.add(1, 'b'))
+        self.assertEqual(list(history.view()), ['a', 'b', 'c', 'd'])
+        self.assertTrue(history.add(1, 'B'))
+        self.assertEqual(len(history), 4)
+
+    def test_view(self):
+        history = TrialHistory()
+        for i in range(3):
+            history.add(i, i)
+        view = history.view()
+        history.add(3, 3)
+        self.assertEqual(len(view), 3)
+        self.assertEqual(view, [0, 1, 2])
+        self.assertEqual(view[-1], 2)
+        self.assertEqual(view[1:], [1, 2])
+        self.assertEqual(sum(view), 3)
+        self.assertRaises(IndexError, view.__getitem__, 3)
+        self.assertEqual(pickle.loads(pickle.dumps(view)), [0, 1, 2])
+
+
+if __name__ == '__main__':
+    main()
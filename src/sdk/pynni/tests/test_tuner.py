@@ -19,7 +19,9 @@
 # ==================================================================================================
 
 
+import nni.msg_dispatcher
 import nni.protocol
+from nni.dispatcher_state import ParameterStore
 from nni.protocol import CommandType, send, receive
 from nni.tuner import Tuner
 from nni.msg_dispatcher import MsgDispatcher
@@ -57,6 +59,23 @@ class NaiveTuner(Tuner):
         self.search_space = search_space
 
 
+class BatchTuner(NaiveTuner):
+    '''Records the calls it receives in order'''
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def generate_parameters(self, parameter_id):
+        self.calls.append(('generate', parameter_id))
+        return {'param': parameter_id}
+
+    def receive_trial_results(self, results):
+        self.calls.append(('results', [parameter_id for parameter_id, _, _ in results]))
+
+    def receive_customized_trial_result(self, parameter_id, parameters, value):
+        self.calls.append(('customized', parameter_id))
+
+
 _in_buf = BytesIO()
 _out_buf = BytesIO()
 
@@ -113,6 +132,83 @@ class TunerTestCase(TestCase):
         self.assertEqual(len(_out_buf.read()), 0)  # no more commands
 
 
+    def test_receive_trial_results(self):
+        saved = nni.msg_dispatcher._next_parameter_id, nni.msg_dispatcher._trial_params
+        def restore():
+            nni.msg_dispatcher._next_parameter_id, nni.msg_dispatcher._trial_params = saved
+            for buf in (_in_buf, _out_buf):
+                buf.seek(0)
+                buf.truncate()
+        self.addCleanup(restore)
+        nni.msg_dispatcher._next_parameter_id = 0
+        nni.msg_dispatcher._trial_params = ParameterStore()
+
+        _reverse_io()
+        send(CommandType.RequestTrialJobs, '3')
+        _restore_io()
+        tuner = BatchTuner()
+        MsgDispatcher(tuner).run()
+
+        # results received in one pass are given at once, in order with customized ones, before generating
+        _reverse_io()
+        send(CommandType.ReportMetricData, '{"parameter_id":0,"type":"FINAL","value":1}')
+        send(CommandType.ReportMetricData, '{"parameter_id":1,"type":"FINAL","value":2}')
+        send(CommandType.AddCustomizedTrialJob, '{"param":-1}')
+        send(CommandType.ReportMetricData, '{"parameter_id":3,"type":"FINAL","value":3}')
+        send(CommandType.ReportMetricData, '{"parameter_id":2,"type":"FINAL","value":4}')
+        send(CommandType.RequestTrialJobs, '1')
+        send(CommandType.ReportMetricData, '{"parameter_id":4,"type":"FINAL","value":5}')
+        _restore_io()
+        dispatcher = MsgDispatcher(tuner)
+        dispatcher.run()
+        self.assertEqual(tuner.calls, [('generate', 0), ('generate', 1), ('generate', 2),
+                                       ('results', [0, 1]), ('customized', 3), ('results', [2]),
+                                       ('generate', 4), ('results', [4])])
+
+        # by default the results are received one by one
+        tuner = NaiveTuner()
+        tuner.receive_trial_results([(0, {'param': 2}, 0.5), (1, {'param': 4}, {'default': 0.7})])
+        self.assertEqual(tuner.trial_results, [(0, 2, 0.5, False), (1, 4, 0.7, False)])
+
+    def test_final_before_trial_end(self):
+        saved = nni.msg_dispatcher._next_parameter_id, nni.msg_dispatcher._trial_params
+        def restore():
+            nni.msg_dispatcher._next_parameter_id, nni.msg_dispatcher._trial_params = saved
+            for buf in (_in_buf, _out_buf):
+                buf.seek(0)
+                buf.truncate()
+        self.addCleanup(restore)
+        nni.msg_dispatcher._next_parameter_id = 0
+        nni.msg_dispatcher._trial_params = ParameterStore()
+
+        _reverse_io()
+        send(CommandType.RequestTrialJobs, '1')
+        _restore_io()
+        tuner = BatchTuner()
+        MsgDispatcher(tuner).run()
+
+        # the trial end goes before other commands, but not before the final result of its trial
+        _reverse_io()
+        send(CommandType.ReportMetricData, '{"parameter_id":0,"trial_job_id":"A","type":"FINAL","value":1}')
+        send(CommandType.TrialEnd, '{"trial_job_id":"A","event":"FAILED","hyper_params":"{\\"parameter_id\\":0}"}')
+        _restore_io()
+        MsgDispatcher(tuner).run()
+        self.assertEqual(tuner.calls, [('generate', 0), ('results', [0])])
+
+        # a trial may report its final result and then fail, the result can arrive after the end
+        for command, data in [
+                (CommandType.RequestTrialJobs, '1'),
+                (CommandType.TrialEnd, '{"trial_job_id":"B","event":"FAILED","hyper_params":"{\\"parameter_id\\":1}"}'),
+                (CommandType.ReportMetricData, '{"parameter_id":1,"trial_job_id":"B","type":"FINAL","value":1}')]:
+            for buf in (_in_buf, _out_buf):
+                buf.seek(0)
+                buf.truncate()
+            _reverse_io()
+            send(command, data)
+            _restore_io()
+            MsgDispatcher(tuner).run()
+        self.assertEqual(tuner.calls[-2:], [('generate', 1), ('results', [1])])
+
     def _assert_params(self, parameter_id, param, trial_results, search_space):
         command, data = receive()
         self.assertIs(command, CommandType.NewTrialJob)
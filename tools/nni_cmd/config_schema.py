@@ -21,6 +21,14 @@
 import os
 from schema import Schema, And, Use, Optional, Regex, Or
 
+tuner_dispatcher_schema = {
+    Optional('importData'): str,
+    Optional('prefetchSize'): And(int, lambda x: 0 <= x <= 99999),
+    Optional('prefetchStaleness'): And(int, lambda x: 0 <= x <= 99999),
+    Optional('stateSpillPath'): str,
+    Optional('configCache'): Or('off', 'reuse', 'resample'),
+}
+
 common_schema = {
 'authorName': str,
 'experimentName': str,
@@ -32,6 +40,10 @@ Optional('maxTrialNum'): And(int, lambda x: 1 <= x <= 99999),
 Optional('searchSpacePath'): os.path.exists,
 Optional('multiPhase'): bool,
 Optional('multiThread'): bool,
+Optional('asyncMode'): bool,
+Optional('executorWorkers'): And(int, lambda x: 1 <= x <= 99999),
+Optional('maxQueueDelays'): And([Or(int, float)], lambda x: len(x) == 3),
+Optional('ipcTrace'): str,
 Optional('nniManagerIp'): str,
 'useAnnotation': bool,
 Optional('advisor'): Or({
@@ -55,15 +67,18 @@ Optional('tuner'): Or({
         'optimize_mode': Or('maximize', 'minimize')
     },
     Optional('gpuNum'): And(int, lambda x: 0 <= x <= 99999),
+    **tuner_dispatcher_schema
 },{
     'builtinTunerName': Or('BatchTuner', 'GridSearch'),
     Optional('gpuNum'): And(int, lambda x: 0 <= x <= 99999),
+    **tuner_dispatcher_schema
 },{
     'codeDir': os.path.exists,
     'classFileName': str,
     'className': str,
     Optional('classArgs'): dict,
     Optional('gpuNum'): And(int, lambda x: 0 <= x <= 99999),
+    **tuner_dispatcher_schema
 }),
 Optional('assessor'): Or({
     'builtinAssessorName': lambda x: x in ['Medianstop'],
@@ -71,13 +86,15 @@ Optional('assessor'): Or({
         Optional('optimize_mode'): Or('maximize', 'minimize'),
         Optional('start_step'): And(int, lambda x: 0 <= x <= 9999)
     },
-    Optional('gpuNum'): And(int, lambda x: 0 <= x <= 99999)
+    Optional('gpuNum'): And(int, lambda x: 0 <= x <= 99999),
+    Optional('processNum'): And(int, lambda x: 0 <= x <= 99999)
 },{
     'codeDir': os.path.exists,
     'classFileName': str,
     'className': str,
     Optional('classArgs'): dict,
     Optional('gpuNum'): And(int, lambda x: 0 <= x <= 99999),
+    Optional('processNum'): And(int, lambda x: 0 <= x <= 99999),
 }),
 }
 
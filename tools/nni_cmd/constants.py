@@ -22,6 +22,14 @@ import os
 
 NNICTL_HOME_DIR = os.path.join(os.environ['HOME'], '.local',  'nni', 'nnictl')
 
+NNI_EXPERIMENTS_DIR = os.path.join(os.environ['HOME'], 'nni', 'experiments')
+
+DISPATCHER_METRICS_FILE = 'dispatcher_metrics.prom'
+
+PROFILE_CONTROL_FILE = 'profile.ctl'
+
+PROFILE_TIMEOUT = 30
+
 ERROR_INFO = 'ERROR: %s'
 
 NORMAL_INFO = 'INFO: %s'
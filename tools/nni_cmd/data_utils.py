@@ -0,0 +1,54 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+
+import os
+from .constants import NNI_EXPERIMENTS_DIR
+from .common_utils import print_normal, print_error
+from .nnictl_utils import check_experiment_id
+
+def get_experiment_database(experiment_id):
+    '''get the path of the database nni manager keeps the trials of the experiment in'''
+    return os.path.join(NNI_EXPERIMENTS_DIR, experiment_id, 'db', 'nni.sqlite')
+
+def resolve_import_data(import_data, root_path):
+    '''importData is the path of a database or exported results, or the id of a previous experiment,
+    return the absolute path of the file, or None if there is no such file or experiment'''
+    path = os.path.join(root_path, os.path.expanduser(import_data))
+    if os.path.isfile(path):
+        return path
+    db_path = get_experiment_database(import_data)
+    if os.path.isfile(db_path):
+        return db_path
+    return None
+
+def export_data(args):
+    '''export the parameters and final results of the trials of an experiment to a json file'''
+    experiment_id = check_experiment_id(args)
+    if not experiment_id:
+        exit(1)
+    db_path = get_experiment_database(experiment_id)
+    if not os.path.isfile(db_path):
+        print_error('Database of experiment %s is not found at %s' % (experiment_id, db_path))
+        exit(1)
+    # nni is imported on demand, it is only needed by this command
+    from nni.experiment_data import export_trial_results
+    count = export_trial_results(db_path, args.filename)
+    print_normal('Exported %d trial results to %s' % (count, args.filename))
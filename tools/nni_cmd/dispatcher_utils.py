@@ -0,0 +1,106 @@
+# Copyright (c) Microsoft Corporation
+# All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge,
+# to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and
+# to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+# BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import os
+import re
+import time
+from collections import defaultdict
+from .constants import NNI_EXPERIMENTS_DIR, DISPATCHER_METRICS_FILE
+from .common_utils import print_normal, print_error
+from .nnictl_utils import check_experiment_id
+
+_sample_pattern = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+_label_pattern = re.compile(r'(\w+)="([^"]*)"')
+
+def get_experiment_log_dir(experiment_id):
+    '''get the log directory of the experiment, which is NNI_LOG_DIRECTORY of the dispatcher'''
+    return os.path.join(NNI_EXPERIMENTS_DIR, experiment_id, 'log')
+
+def parse_metrics(content):
+    '''parse Prometheus text format, return a dict from metric name to list of (labels, value)'''
+    metrics = defaultdict(list)
+    for line in content.splitlines():
+        match = _sample_pattern.match(line.strip())
+        if line.startswith('#') or not match:
+            continue
+        name, labels, value = match.groups()
+        metrics[name].append((dict(_label_pattern.findall(labels or '')), float(value)))
+    return metrics
+
+def histogram_quantile(buckets, quantile):
+    '''estimate a quantile by the upper bound of the bucket containing it, buckets is a list of (le, count)'''
+    total = buckets[-1][1]
+    for bound, count in buckets:
+        if count >= total * quantile:
+            return bound
+    return float('inf')
+
+def summarize_histograms(samples, name, key_label):
+    '''return a list of (key, count, mean, p50, p95) of the histograms in samples'''
+    buckets = defaultdict(list)
+    sums = {}
+    counts = {}
+    for labels, value in samples.get(name + '_bucket', []):
+        buckets[labels[key_label]].append((float(labels['le']), value))
+    for labels, value in samples.get(name + '_sum', []):
+        sums[labels[key_label]] = value
+    for labels, value in samples.get(name + '_count', []):
+        counts[labels[key_label]] = value
+    ret = []
+    for key in sorted(counts):
+        if not counts[key]:
+            continue
+        key_buckets = sorted(buckets[key])
+        ret.append((key, int(counts[key]), sums[key] / counts[key],
+                    histogram_quantile(key_buckets, 0.5), histogram_quantile(key_buckets, 0.95)))
+    return ret
+
+def dispatcher_metrics(args):
+    '''show the telemetry of the dispatcher'''
+    experiment_id = check_experiment_id(args)
+    if experiment_id is None:
+        print_error('Please set the experiment id!')
+        exit(1)
+    metrics_path = os.path.join(get_experiment_log_dir(experiment_id), DISPATCHER_METRICS_FILE)
+    if not os.path.exists(metrics_path):
+        print_error('Dispatcher metrics file %s does not exist, the dispatcher may be just started' % metrics_path)
+        exit(1)
+    with open(metrics_path, 'r') as metrics_file:
+        content = metrics_file.read()
+    if args.raw:
+        print(content)
+        return
+    print_normal('Dispatcher metrics of experiment %s, updated at %s' % \
+                 (experiment_id, time.strftime('%Y/%m/%d %H:%M:%S', time.localtime(os.path.getmtime(metrics_path)))))
+    samples = parse_metrics(content)
+    row_format = '%-26s %10s %12s %12s %12s'
+    print(row_format % ('command', 'count', 'mean (ms)', 'p50 (ms)', 'p95 (ms)'))
+    for command, count, mean, p50, p95 in summarize_histograms(samples, 'nni_dispatcher_handler_seconds', 'command'):
+        print(row_format % (command, count, '%.3f' % (mean * 1000), '<=%g' % (p50 * 1000), '<=%g' % (p95 * 1000)))
+    print()
+    print('%-26s %12s' % ('phase', 'seconds'))
+    for labels, value in samples.get('nni_dispatcher_phase_seconds_total', []):
+        print('%-26s %12.3f' % (labels['phase'], value))
+    print()
+    for name in sorted(samples):
+        if not re.match(r'nni_dispatcher_\w+$', name) or name.endswith(('_bucket', '_sum', '_count', '_total')):
+            continue
+        print('%-26s %12g' % (name[len('nni_dispatcher_'):], samples[name][0][1]))
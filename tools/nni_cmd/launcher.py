@@ -203,6 +203,9 @@ def set_experiment(experiment_config, mode, port, config_file_name):
         request_data['description'] = experiment_config['description']
     if experiment_config.get('multiPhase'):
         request_data['multiPhase'] = experiment_config.get('multiPhase')
+    for key in ('multiThread', 'asyncMode', 'executorWorkers', 'maxQueueDelays', 'ipcTrace'):
+        if experiment_config.get(key):
+            request_data[key] = experiment_config.get(key)
     if experiment_config.get('advisor'):
         request_data['advisor'] = experiment_config['advisor']
     else:
@@ -407,6 +410,12 @@ def create_experiment(args):
         print_error('Please set correct config path!')
         exit(1)
     experiment_config = get_yml_content(config_path)
+    if args.import_data:
+        if not experiment_config.get('tuner'):
+            print_error('Importing data is only supported by tuners!')
+            exit(1)
+        experiment_config['tuner']['importData'] = os.path.abspath(args.import_data) \
+            if os.path.exists(args.import_data) else args.import_data
     validate_all_content(experiment_config, config_path)
 
     nni_config.set_config('experimentConfig', experiment_config)
@@ -22,6 +22,7 @@ import os
 import json
 from .config_schema import LOCAL_CONFIG_SCHEMA, REMOTE_CONFIG_SCHEMA, PAI_CONFIG_SCHEMA, KUBEFLOW_CONFIG_SCHEMA
 from .common_utils import get_json_content, print_error
+from .data_utils import resolve_import_data
 
 def expand_path(experiment_config, key):
     '''Change '~' to user home directory'''
@@ -49,10 +50,12 @@ def parse_time(experiment_config):
 def parse_path(experiment_config, config_path):
     '''Parse path in config file'''
     expand_path(experiment_config, 'searchSpacePath')
+    expand_path(experiment_config, 'ipcTrace')
     if experiment_config.get('trial'):
         expand_path(experiment_config['trial'], 'codeDir')
     if experiment_config.get('tuner'):
         expand_path(experiment_config['tuner'], 'codeDir')
+        expand_path(experiment_config['tuner'], 'stateSpillPath')
     if experiment_config.get('assessor'):
         expand_path(experiment_config['assessor'], 'codeDir')
     if experiment_config.get('advisor'):
@@ -62,14 +65,22 @@ def parse_path(experiment_config, config_path):
     root_path = os.path.dirname(config_path)
     if experiment_config.get('searchSpacePath'):
         parse_relative_path(root_path, experiment_config, 'searchSpacePath')
+    parse_relative_path(root_path, experiment_config, 'ipcTrace')
     if experiment_config.get('trial'):
         parse_relative_path(root_path, experiment_config['trial'], 'codeDir')
     if experiment_config.get('tuner'):
         parse_relative_path(root_path, experiment_config['tuner'], 'codeDir')
+        parse_relative_path(root_path, experiment_config['tuner'], 'stateSpillPath')
     if experiment_config.get('assessor'):
         parse_relative_path(root_path, experiment_config['assessor'], 'codeDir')
     if experiment_config.get('advisor'):
         parse_relative_path(root_path, experiment_config['advisor'], 'codeDir')
+    if experiment_config.get('tuner') and experiment_config['tuner'].get('importData'):
+        import_data = resolve_import_data(experiment_config['tuner']['importData'], root_path)
+        if import_data is None:
+            print_error('importData %s is neither a file nor the id of an experiment!' % experiment_config['tuner']['importData'])
+            exit(1)
+        experiment_config['tuner']['importData'] = import_data
 
 def validate_search_space_content(experiment_config):
     '''Validate searchspace content, 
@@ -26,6 +26,9 @@ from .nnictl_utils import *
 from .package_management import *
 from .constants import *
 from .tensorboard_utils import *
+from .dispatcher_utils import *
+from .profile_utils import *
+from .data_utils import *
 
 def nni_help_info(*args):
     print('please run "nnictl {positional argument} --help" to see nnictl guidance')
@@ -42,6 +45,7 @@ def parse_args():
     parser_start = subparsers.add_parser('create', help='create a new experiment')
     parser_start.add_argument('--config', '-c', required=True, dest='config', help='the path of yaml config file')
     parser_start.add_argument('--port', '-p', default=DEFAULT_REST_PORT, dest='port', help='the port of restful server')
+    parser_start.add_argument('--import_data', dest='import_data', help='the id of a previous experiment, or the file exported from it, to warm-start the tuner with')
     parser_start.set_defaults(func=create_experiment)
 
     # parse resume command
@@ -87,6 +91,14 @@ def parse_args():
     parser_trial_kill.add_argument('id', nargs='?', help='the id of experiment')
     parser_trial_kill.add_argument('--trialid', '-t', required=True, dest='trialid', help='the id of trial to be killed')
     parser_trial_kill.set_defaults(func=trial_kill)
+    parser_trial_profile = parser_trial_subparsers.add_parser('profile', help='profile a running trial')
+    parser_trial_profile.add_argument('action', choices=['start', 'stop'], help='start profiling, or stop and collect the reports')
+    parser_trial_profile.add_argument('id', nargs='?', help='the id of experiment')
+    parser_trial_profile.add_argument('--trialid', '-t', required=True, dest='trialid', help='the id of trial to be profiled')
+    parser_trial_profile.add_argument('--mode', '-m', choices=['sample', 'cprofile'], help='sample stacks of all threads, or trace calls of the main thread with cProfile')
+    parser_trial_profile.add_argument('--memory', action='store_true', default=False, help='also report memory allocations with tracemalloc')
+    parser_trial_profile.add_argument('--output', '-o', help='the directory to copy the reports to')
+    parser_trial_profile.set_defaults(func=trial_profile)
 
     #parse experiment command
     parser_experiment = subparsers.add_parser('experiment', help='get experiment information')
@@ -101,6 +113,10 @@ def parse_args():
     parser_experiment_list = parser_experiment_subparsers.add_parser('list', help='list all of running experiment ids')
     parser_experiment_list.add_argument('all', nargs='?', help='list all of experiments')
     parser_experiment_list.set_defaults(func=experiment_list)
+    parser_experiment_export = parser_experiment_subparsers.add_parser('export', help='export the parameters and final results of trials')
+    parser_experiment_export.add_argument('id', nargs='?', help='the id of experiment')
+    parser_experiment_export.add_argument('--filename', '-f', required=True, help='the json file to write')
+    parser_experiment_export.set_defaults(func=export_data)
 
     #TODO:finish webui function
     #parse board command
@@ -139,6 +155,22 @@ def parse_args():
     parser_log_trial.add_argument('--trialid', '-T', dest='trialid', help='find trial log path by id')
     parser_log_trial.set_defaults(func=log_trial)
 
+    #parse dispatcher command
+    parser_dispatcher = subparsers.add_parser('dispatcher', help='get dispatcher information')
+    # add subparsers for parser_dispatcher
+    parser_dispatcher_subparsers = parser_dispatcher.add_subparsers()
+    parser_dispatcher_metrics = parser_dispatcher_subparsers.add_parser('metrics', help='show dispatcher telemetry')
+    parser_dispatcher_metrics.add_argument('id', nargs='?', help='the id of experiment')
+    parser_dispatcher_metrics.add_argument('--raw', action='store_true', default=False, help='print the metrics file in Prometheus text format')
+    parser_dispatcher_metrics.set_defaults(func=dispatcher_metrics)
+    parser_dispatcher_profile = parser_dispatcher_subparsers.add_parser('profile', help='profile the dispatcher')
+    parser_dispatcher_profile.add_argument('action', choices=['start', 'stop'], help='start profiling, or stop and collect the reports')
+    parser_dispatcher_profile.add_argument('id', nargs='?', help='the id of experiment')
+    parser_dispatcher_profile.add_argument('--mode', '-m', choices=['sample', 'cprofile'], help='sample stacks of all threads, or trace calls of the main thread with cProfile')
+    parser_dispatcher_profile.add_argument('--memory', action='store_true', default=False, help='also report memory allocations with tracemalloc')
+    parser_dispatcher_profile.add_argument('--output', '-o', help='the directory to copy the reports to')
+    parser_dispatcher_profile.set_defaults(func=dispatcher_profile)
+
     #parse package command
     parser_package = subparsers.add_parser('package', help='control nni tuner and assessor packages')
     # add subparsers for parser_package
@@ -0,0 +1,104 @@
+# Copyright (c) Microsoft Corporation. All rights reserved.
+#
+# MIT License
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+# associated documentation files (the "Software"), to deal in the Software without restriction,
+# including without limitation the rights to use, copy, modify, merge, publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED *AS IS*, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+# NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT
+# OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+# ==================================================================================================
+
+
+import glob
+import json
+import os
+import shutil
+import time
+from .constants import NNI_EXPERIMENTS_DIR, PROFILE_CONTROL_FILE, PROFILE_TIMEOUT
+from .common_utils import print_normal, print_error
+from .nnictl_utils import check_experiment_id
+from .dispatcher_utils import get_experiment_log_dir
+
+def write_control_file(directory, request):
+    '''write the profiling request to the control file, renamed into place so it is never read partially'''
+    control_path = os.path.join(directory, PROFILE_CONTROL_FILE)
+    with open(control_path + '.tmp', 'w') as control_file:
+        json.dump(request, control_file)
+    os.replace(control_path + '.tmp', control_path)
+    return control_path
+
+def wait_for(condition, timeout=PROFILE_TIMEOUT):
+    '''wait until condition() is true, return False on timeout'''
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.5)
+    return True
+
+def collect_reports(directory, name, since):
+    '''wait for the reports written after since, return their paths once no more files appear'''
+    pattern = os.path.join(directory, '%s_profile_*' % name)
+    reports = []
+    def stable():
+        new_reports = sorted(path for path in glob.glob(pattern) if os.path.getmtime(path) >= since)
+        done = bool(new_reports) and new_reports == reports
+        reports[:] = new_reports
+        return done
+    wait_for(stable)
+    return reports
+
+def profile(directory, name, args):
+    '''start or stop profiling the process which writes its reports into directory'''
+    if not os.path.isdir(directory):
+        print_error('Directory %s does not exist' % directory)
+        exit(1)
+    since = time.time() - 1  # mtime may be rounded down to seconds
+    control_path = write_control_file(directory, {'action': args.action, 'mode': args.mode, 'memory': args.memory})
+    if not wait_for(lambda: not os.path.exists(control_path)):
+        os.remove(control_path)
+        print_error('The %s did not respond in %d seconds, it may have exited' % (name, PROFILE_TIMEOUT))
+        exit(1)
+    if args.action == 'start':
+        print_normal('Profiling started, run the same command with stop to collect the reports')
+        return
+    reports = collect_reports(directory, name, since)
+    if not reports:
+        print_error('No report is written, check the log of the %s, profiling may be not running' % name)
+        exit(1)
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        reports = [shutil.copy(path, args.output) for path in reports]
+    print_normal('Profiling stopped, reports:')
+    for path in reports:
+        print(path)
+
+def dispatcher_profile(args):
+    '''start or stop profiling the dispatcher'''
+    experiment_id = check_experiment_id(args)
+    if experiment_id is None:
+        print_error('Please set the experiment id!')
+        exit(1)
+    profile(get_experiment_log_dir(experiment_id), 'dispatcher', args)
+
+def trial_profile(args):
+    '''start or stop profiling a trial of local training service'''
+    experiment_id = check_experiment_id(args)
+    if experiment_id is None:
+        print_error('Please set the experiment id!')
+        exit(1)
+    trial_dir = os.path.join(NNI_EXPERIMENTS_DIR, experiment_id, 'trials', args.trialid)
+    if not os.path.isdir(trial_dir):
+        print_error('Trial %s is not found, only trials of local training service can be profiled' % args.trialid)
+        exit(1)
+    profile(trial_dir, 'trial', args)